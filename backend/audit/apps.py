@@ -6,5 +6,7 @@ class AuditConfig(AppConfig):
     name = 'audit'
     
     def ready(self):
-        """Import signals when app is ready."""
-        import audit.signals  # noqa
+        """Connect the audit signals to the audited models."""
+        from audit.signals import connect_signals
+
+        connect_signals()
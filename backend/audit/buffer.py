@@ -0,0 +1,135 @@
+"""
+Request-scoped buffer for audit entries.
+
+Audit entries are not written one by one. Each entry joins the buffer once
+the transaction that produced it commits (entries of rolled back work are
+dropped), and the buffer is written with a single ``bulk_create`` when the
+request (or any ``audit_context`` block) ends.
+
+Entries for the same object and action are merged: saving an object twice
+records one ``update`` with the combined changes, and updates of an object
+created in the same request fold into its ``create`` entry.
+
+Outside a context (shell, management commands), each entry is written when
+its transaction commits. Wrap batch work in ``audit_context()`` to get the
+same single insert. With ``AUDIT_WAL_DIR`` set, entries go to the
+asynchronous write-ahead log instead (see audit.wal).
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.db import transaction
+
+from .models import AuditLog
+from .wal import get_writer
+
+logger = logging.getLogger('backend')
+
+_current_buffer = ContextVar("audit_buffer", default=None)
+
+
+def merge_changes(earlier, later):
+    """Combine two ``{field: {"old", "new"}}`` diffs, keeping the first old value"""
+    merged = {field: dict(change) for field, change in (earlier or {}).items()}
+    for field, change in (later or {}).items():
+        if field in merged:
+            merged[field]["new"] = change.get("new")
+        else:
+            merged[field] = dict(change)
+    # Fields changed and changed back are no change at all
+    return {field: change for field, change in merged.items() if change.get("old") != change.get("new")}
+
+
+class AuditBuffer:
+    """Committed audit entries of one request, de-duplicated by object and action"""
+
+    def __init__(self, request=None):
+        self.request = request
+        self.entries = {}
+
+    def add(self, entry):
+        """Keep ``entry`` once the current transaction commits"""
+        transaction.on_commit(partial(self._keep, entry), robust=True)
+
+    def _keep(self, entry):
+        if entry.object_id is None:
+            self.entries[id(entry)] = entry
+            return
+
+        key = (entry.model_name, entry.object_id, entry.action_type)
+        existing = self.entries.get(key)
+        if existing is None and entry.action_type == "update":
+            existing = self.entries.get((entry.model_name, entry.object_id, "create"))
+        if existing is None:
+            self.entries[key] = entry
+            return
+
+        existing.changes = merge_changes(existing.changes, entry.changes)
+        existing.object_repr = entry.object_repr
+        existing.metadata = {**(existing.metadata or {}), **(entry.metadata or {})}
+        if existing.user_id is None and entry.user_id is not None:
+            existing.user_id = entry.user_id
+
+    def _request_user_id(self):
+        # DRF authenticates inside the view and sets request.user on the way
+        user = getattr(self.request, "user", None)
+        if user is not None and user.is_authenticated:
+            return user.pk
+        return None
+
+    def flush(self):
+        """Write the kept entries with one INSERT"""
+        entries = list(self.entries.values())
+        self.entries = {}
+        if not entries:
+            return
+        user_id = self._request_user_id()
+        for entry in entries:
+            if entry.user_id is None:
+                entry.user_id = user_id
+        write_entries(entries)
+
+
+def write_entries(entries):
+    """Write audit entries: to the WAL when enabled (see audit.wal), else with one INSERT"""
+    try:
+        writer = get_writer()
+        if writer is not None:
+            writer.submit(entries)
+        else:
+            AuditLog.objects.bulk_create(entries)
+    except Exception:
+        # Auditing never fails the request that was audited
+        logger.exception(f'Could not write {len(entries)} audit log entries')
+
+
+def current_buffer():
+    return _current_buffer.get()
+
+
+@contextmanager
+def audit_context(request=None):
+    """
+    Buffer audit entries until the block ends, then write them at once.
+
+    The write happens in ``transaction.on_commit``: right away outside a
+    transaction, after the entries of the enclosing transaction otherwise.
+    """
+    buffer = AuditBuffer(request)
+    token = _current_buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _current_buffer.reset(token)
+        transaction.on_commit(buffer.flush, robust=True)
+
+
+def record(entry):
+    """Queue an unsaved ``AuditLog`` in the current buffer (or write it at commit)"""
+    buffer = current_buffer()
+    if buffer is not None:
+        buffer.add(entry)
+    else:
+        transaction.on_commit(partial(write_entries, [entry]), robust=True)
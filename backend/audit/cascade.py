@@ -0,0 +1,167 @@
+"""
+Cascade deletes summarized in one audit record.
+
+Deleting a property cascades through rooms, tenancies, invoices, lines,
+payments, meter readings and invites. A plain ``delete()`` writes one audit
+entry per cascaded row and runs per-row bookkeeping (invoice recomputes, PDF
+cache invalidation) for rows that are being deleted anyway.
+
+``delete_with_summary`` collects the cascade with Django's ``Collector``,
+deletes it while the deleted keys are published to the signal receivers
+(``is_cascade_deleted``), which then skip their per-row work, and writes a
+single ``delete`` audit record for the root with per-model counts and keys.
+With ``chunk_size`` the root's direct children are deleted first in chunks,
+one short transaction each; ``delete_in_background`` runs that in a thread
+after the request's transaction commits. Every committed chunk is audited
+right away as a ``delete`` record without object id (model: the children's),
+with its own summary and ``metadata.cascade_root``, so a delete interrupted
+halfway still shows what it removed.
+"""
+import logging
+import threading
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import close_old_connections, connection, models, router, transaction
+from django.db.models.deletion import Collector
+
+from .buffer import audit_context
+from .utils import log_action
+
+logger = logging.getLogger('backend')
+
+# Keys listed per model in the summary
+CASCADE_MAX_IDS = 1000
+
+_cascade_keys = ContextVar("audit_cascade_keys", default=None)
+
+
+def is_cascade_deleted(model, pk):
+    """Whether ``pk`` of ``model`` is deleted by the cascade in progress"""
+    keys = _cascade_keys.get()
+    if keys is None or pk is None:
+        return False
+    return pk in keys.get(model._meta.concrete_model._meta.label, ())
+
+
+class CascadeSummary:
+    """Per-model counts and keys of the rows deleted by one or more collected deletes"""
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.ids = defaultdict(list)
+
+    def add(self, counts, keys):
+        for label, count in counts.items():
+            self.counts[label] += count
+        for label, pks in keys.items():
+            room = CASCADE_MAX_IDS - len(self.ids[label])
+            self.ids[label].extend(str(pk) for pk in list(pks)[:max(room, 0)])
+
+    def as_dict(self):
+        return {
+            label: {"count": count, "ids": self.ids.get(label, [])}
+            for label, count in sorted(self.counts.items())
+            if count
+        }
+
+
+def _delete_collected(objs, *summaries):
+    """Collect and delete ``objs`` with their cascade, signal receivers told which keys go"""
+    objs = list(objs)
+    if not objs:
+        return
+    collector = Collector(using=router.db_for_write(objs[0].__class__, instance=objs[0]))
+    collector.collect(objs)
+    keys = {
+        model._meta.concrete_model._meta.label: {obj.pk for obj in instances}
+        for model, instances in collector.data.items()
+    }
+    token = _cascade_keys.set(keys)
+    try:
+        _, counts = collector.delete()
+    finally:
+        _cascade_keys.reset(token)
+    for summary in summaries:
+        summary.add(counts, keys)
+
+
+def _cascade_children(instance):
+    """Querysets of the rows that cascade directly from ``instance``"""
+    for relation in instance._meta.related_objects:
+        if relation.one_to_many and relation.on_delete is models.CASCADE:
+            yield relation.related_model._base_manager.filter(**{relation.field.name: instance})
+
+
+def _log_chunk(user, request, sample, root, summary):
+    """Summarized ``delete`` record of one committed chunk of a cascade"""
+    count = sum(summary.counts.values())
+    entry = log_action(
+        user=user,
+        action_type="delete",
+        instance=sample,
+        request=request,
+        object_repr=f"{root['repr']} - xóa {count} bản ghi liên quan",
+    )
+    # Many objects: kept out of any single object's timeline
+    entry.object_id = None
+    entry.metadata = {"cascade_root": root, "cascade": summary.as_dict()}
+
+
+def delete_with_summary(instance, user=None, request=None, chunk_size=None):
+    """
+    Delete ``instance`` and everything that cascades from it, audited as one record.
+
+    Args:
+        instance: The root object
+        user: User performing the delete (None: the request user)
+        request: Django request (optional, for IP and user agent)
+        chunk_size: Delete the direct children in chunks of this many rows, one
+                    transaction each, before the root (None: one transaction)
+
+    Returns:
+        dict: Per-model ``{"count", "ids"}`` of the deleted rows
+    """
+    summary = CascadeSummary()
+    if chunk_size:
+        root = {"model": instance._meta.label, "id": str(instance.pk), "repr": str(instance)[:200]}
+        for children in _cascade_children(instance):
+            while True:
+                chunk_summary = CascadeSummary()
+                # Own audit context: the chunk's record is written as it commits
+                with audit_context(request=request), transaction.atomic():
+                    chunk = list(children.order_by("pk")[:chunk_size])
+                    _delete_collected(chunk, summary, chunk_summary)
+                    if chunk:
+                        _log_chunk(user, request, chunk[0], root, chunk_summary)
+                if len(chunk) < chunk_size:
+                    break
+
+    with transaction.atomic():
+        # Recorded before the delete clears the primary key
+        entry = log_action(user=user, action_type="delete", instance=instance, request=request)
+        _delete_collected([instance], summary)
+        entry.metadata = {"cascade": summary.as_dict()}
+    return entry.metadata["cascade"]
+
+
+def delete_in_background(instance, user=None, chunk_size=None):
+    """Run ``delete_with_summary`` in chunks in a thread, once the current transaction commits"""
+    if chunk_size is None:
+        chunk_size = getattr(settings, 'AUDIT_CASCADE_CHUNK_SIZE', 500)
+
+    def run():
+        close_old_connections()
+        try:
+            with audit_context():
+                delete_with_summary(instance, user=user, chunk_size=chunk_size)
+        except Exception:
+            logger.exception(f'Background delete of {instance._meta.label} {instance.pk} failed')
+        finally:
+            connection.close()
+
+    transaction.on_commit(
+        lambda: threading.Thread(target=run, name="cascade-delete", daemon=True).start(),
+        robust=True,
+    )
@@ -0,0 +1,104 @@
+"""
+Management command that maintains the monthly audit log partitions.
+
+Usage:
+    python manage.py archive_audit_logs
+    python manage.py archive_audit_logs --keep-months 6 --archive-dir /var/backups/audit
+    python manage.py archive_audit_logs --months-ahead 6 --dry-run
+
+Creates the partitions of the coming months (PostgreSQL), then exports every
+month older than the retention (settings.AUDIT_RETENTION_MONTHS) to
+audit-YYYY-MM.jsonl.gz in the archive directory and drops it: the whole
+partition on PostgreSQL, batched deletes elsewhere. A month is only dropped
+after its archive file is complete. Should be run daily (e.g., via cron).
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from audit.partitions import (
+    add_months,
+    drop_month,
+    ensure_partitions,
+    export_month,
+    is_partitioned,
+    month_rows,
+    month_start,
+    stored_months,
+)
+from backend.metrics import CommandMetricsMixin
+
+
+class Command(CommandMetricsMixin, BaseCommand):
+    help = 'Create upcoming audit log partitions and archive old months'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-months',
+            type=int,
+            default=None,
+            help='Months kept in the database, current month included '
+                 '(default: settings.AUDIT_RETENTION_MONTHS)',
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=3,
+            help='Future month partitions to create (default: 3)',
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=None,
+            help='Directory for the JSONL.gz archives (default: settings.AUDIT_ARCHIVE_DIR)',
+        )
+        parser.add_argument(
+            '--no-archive',
+            action='store_true',
+            help='Drop old months without exporting them',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only list the months that would be archived',
+        )
+
+    def handle(self, *args, **options):
+        keep_months = options['keep_months']
+        if keep_months is None:
+            keep_months = getattr(settings, 'AUDIT_RETENTION_MONTHS', 12)
+        if keep_months < 1:
+            raise CommandError('--keep-months must be at least 1')
+        archive_dir = options['archive_dir'] or getattr(settings, 'AUDIT_ARCHIVE_DIR', '')
+        if not archive_dir and not options['no_archive'] and not options['dry_run']:
+            raise CommandError('No archive directory: set AUDIT_ARCHIVE_DIR, pass --archive-dir or --no-archive')
+
+        now = timezone.now()
+        cutoff = add_months(month_start(now), 1 - keep_months)
+        months = stored_months(cutoff)
+
+        if options['dry_run']:
+            for month in months:
+                self.stdout.write(f'  {month:%Y-%m}: {month_rows(month).count()} rows')
+            self.stdout.write(
+                self.style.SUCCESS(f'Dry run: {len(months)} months before {cutoff:%Y-%m} would be archived')
+            )
+            return
+
+        for month in ensure_partitions(now, options['months_ahead']):
+            self.stdout.write(f'  ✓ Created partition {month:%Y-%m}')
+
+        for month in months:
+            if options['no_archive']:
+                exported = ''
+            else:
+                path, count = export_month(month, archive_dir)
+                exported = f'{count} rows to {path}, '
+            deleted = drop_month(month)
+            dropped = 'partition dropped' if deleted is None else f'{deleted} rows deleted'
+            self.stdout.write(f'  ✓ {month:%Y-%m}: {exported}{dropped}')
+
+        storage = 'monthly partitions' if is_partitioned() else 'single table'
+        self.stdout.write(
+            self.style.SUCCESS(f'Completed: {len(months)} months before {cutoff:%Y-%m} archived ({storage})')
+        )
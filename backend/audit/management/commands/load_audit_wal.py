@@ -0,0 +1,85 @@
+"""
+Management command that loads the audit write-ahead log into AuditLog.
+
+Usage:
+    python manage.py load_audit_wal
+    python manage.py load_audit_wal --once
+    python manage.py load_audit_wal --dir /var/lib/home-easy/audit-wal --batch-size 10000
+
+Runs as a long-lived worker next to each web host (the log is a local
+directory, settings.AUDIT_WAL_DIR) and bulk-inserts finished segments, as
+well as segments left behind by crashed processes. Loading is idempotent, so
+it is safe to run several loaders or to restart one mid-segment.
+"""
+
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from audit.wal import load_pending
+from backend.metrics import CommandMetricsMixin
+
+
+class Command(CommandMetricsMixin, BaseCommand):
+    help = 'Load audit write-ahead log segments into the AuditLog table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            type=str,
+            default=None,
+            help='WAL directory (default: settings.AUDIT_WAL_DIR)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows per INSERT (default: 5000)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Load the pending segments, then exit',
+        )
+        parser.add_argument(
+            '--idle-sleep',
+            type=float,
+            default=5.0,
+            help='Seconds to wait when no segment is pending (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or getattr(settings, 'AUDIT_WAL_DIR', '')
+        if not directory:
+            raise CommandError('No WAL directory: set AUDIT_WAL_DIR or pass --dir')
+
+        self._stopping = False
+        if not options['once']:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+
+        totals = [0, 0]
+        while not self._stopping:
+            close_old_connections()
+            segments, entries = load_pending(
+                directory,
+                batch_size=options['batch_size'],
+                on_segment=lambda path, count: self.stdout.write(f'  ✓ {path}: {count} entries'),
+            )
+            totals[0] += segments
+            totals[1] += entries
+            if options['once']:
+                break
+            if not segments:
+                time.sleep(options['idle_sleep'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Completed: {totals[1]} entries from {totals[0]} segments')
+        )
+
+    def _stop(self, signum, frame):
+        # Finish the current segment, then exit
+        self._stopping = True
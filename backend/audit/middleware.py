@@ -0,0 +1,15 @@
+"""
+Audit middleware: one audit buffer per request.
+"""
+from .buffer import audit_context
+
+
+class AuditMiddleware:
+    """Collect the audit entries of a request and write them with one INSERT"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with audit_context(request=request):
+            return self.get_response(request)
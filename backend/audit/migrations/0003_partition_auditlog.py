@@ -0,0 +1,64 @@
+# Generated by Django 6.0 on 2026-10-16 23:30
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def partition_audit_log(apps, schema_editor):
+    """
+    Rebuild audit_auditlog as a table range-partitioned by month (PostgreSQL only).
+
+    Existing rows are copied into month partitions. The primary key becomes
+    (id, created_at), as PostgreSQL requires the partition key in it.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    from audit.partitions import add_months, create_partition, month_start
+
+    AuditLog = apps.get_model("audit", "AuditLog")
+    User = AuditLog._meta.get_field("user").related_model
+    quote = schema_editor.quote_name
+    table = AuditLog._meta.db_table
+    old = f"{table}_unpartitioned"
+
+    schema_editor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old)}")
+    schema_editor.execute(
+        f"CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"
+    )
+    # The old table still owns the <table>_pkey name until it is dropped
+    schema_editor.execute(
+        f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + '_id_created_at_pk')} PRIMARY KEY (id, created_at)"
+    )
+    schema_editor.execute(
+        f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + '_user_id_fk')} "
+        f"FOREIGN KEY (user_id) REFERENCES {quote(User._meta.db_table)} (id) DEFERRABLE INITIALLY DEFERRED"
+    )
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(created_at), MAX(created_at) FROM {quote(old)}")
+        oldest, newest = cursor.fetchone()
+    now = timezone.now()
+    month = month_start(min(oldest or now, now))
+    last = add_months(month_start(max(newest or now, now)), 3)
+    while month <= last:
+        create_partition(month, schema_editor)
+        month = add_months(month, 1)
+    schema_editor.execute(f"CREATE TABLE {quote(table + '_default')} PARTITION OF {quote(table)} DEFAULT")
+
+    schema_editor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(old)}")
+    schema_editor.execute(f"DROP TABLE {quote(old)}")
+    # Indexes on the parent are created on every partition, present and future
+    for index in AuditLog._meta.indexes:
+        schema_editor.add_index(AuditLog, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_audit_log, migrations.RunPython.noop),
+    ]
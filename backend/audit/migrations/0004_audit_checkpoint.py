@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-16 23:11
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0003_partition_auditlog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditCheckpoint',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('model_name', models.CharField(max_length=100)),
+                ('object_id', models.UUIDField()),
+                ('created_at', models.DateTimeField()),
+                ('audit_log_id', models.UUIDField()),
+                ('exists', models.BooleanField(default=True)),
+                ('state', models.JSONField(default=dict)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['model_name', 'object_id', '-created_at'], name='audit_audit_model_n_ee015e_idx')],
+            },
+        ),
+    ]
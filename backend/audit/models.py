@@ -39,7 +39,7 @@ class AuditLog(models.Model):
     class Meta:
         ordering = ["-created_at"]
         indexes = [
-            models.Index(fields=["-created_at"]),
+            models.Index(fields=["-created_at", "-id"]),
             models.Index(fields=["user"]),
             models.Index(fields=["model_name"]),
             models.Index(fields=["action_type"]),
@@ -49,3 +49,30 @@ class AuditLog(models.Model):
     def __str__(self):
         user_str = self.user.email if self.user else "System"
         return f"{self.action_type} {self.model_name} by {user_str} at {self.created_at}"
+
+
+class AuditCheckpoint(models.Model):
+    """
+    Field state of an audited object as of one audit log entry.
+
+    Written while reconstructing long histories (see audit.timeline), so the
+    next reconstruction starts from the nearest checkpoint instead of the
+    object's creation.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    model_name = models.CharField(max_length=100)
+    object_id = models.UUIDField()
+    # Position of the last folded entry: its (created_at, id)
+    created_at = models.DateTimeField()
+    audit_log_id = models.UUIDField()
+    exists = models.BooleanField(default=True)
+    state = models.JSONField(default=dict)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["model_name", "object_id", "-created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.model_name} {self.object_id} at {self.created_at}"
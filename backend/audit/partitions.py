@@ -0,0 +1,187 @@
+"""
+Monthly partitions of the AuditLog table.
+
+On PostgreSQL ``audit_auditlog`` is range-partitioned by ``created_at``, one
+partition per calendar month (UTC), named ``audit_auditlog_yYYYYmMM``, plus a
+default partition that catches rows outside every month partition. Queries
+with a ``created_at`` range only touch the months they cover, and an old
+month is removed by detaching and dropping its partition: no DELETE, no
+bloat, constant time whatever its size.
+
+Partitions are created ahead of time by ``archive_audit_logs`` (run daily).
+Other databases keep a single table; there, archival deletes the month's rows
+in batches instead.
+"""
+import gzip
+import os
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.db.models.functions import TruncMonth
+
+from .models import AuditLog
+from .wal import serialize_entry
+
+
+def month_start(value):
+    """First instant (UTC) of the month containing ``value``"""
+    value = value.astimezone(dt_timezone.utc) if value.tzinfo else value.replace(tzinfo=dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def table_name():
+    return AuditLog._meta.db_table
+
+
+def partition_name(month):
+    return f"{table_name()}_y{month:%Y}m{month:%m}"
+
+
+def is_partitioned():
+    """True if the AuditLog table is a partitioned PostgreSQL table"""
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s AND c.relnamespace = to_regnamespace(current_schema())",
+            [table_name()],
+        )
+        return cursor.fetchone() is not None
+
+
+def existing_partitions():
+    """Month partitions as ``{month: name}``"""
+    prefix = f"{table_name()}_y"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s AND p.relnamespace = to_regnamespace(current_schema())",
+            [table_name()],
+        )
+        names = [name for (name,) in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        if not name.startswith(prefix):
+            continue
+        try:
+            month = datetime.strptime(name[len(prefix):], "%Ym%m").replace(tzinfo=dt_timezone.utc)
+        except ValueError:
+            continue
+        partitions[month] = name
+    return partitions
+
+
+def create_partition(month, schema_editor=None):
+    """Create the partition of one month (PostgreSQL)"""
+    quote = connection.ops.quote_name
+    # DDL takes no parameters; the bounds are generated here, not user input
+    sql = (
+        f"CREATE TABLE IF NOT EXISTS {quote(partition_name(month))} PARTITION OF {quote(table_name())} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+    if schema_editor is not None:
+        schema_editor.execute(sql)
+    else:
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+
+
+def ensure_partitions(now, months_ahead=3):
+    """
+    Create the partitions of the current month and ``months_ahead`` more.
+
+    Returns:
+        list: Months created
+    """
+    if not is_partitioned():
+        return []
+    existing = existing_partitions()
+    created = []
+    current = month_start(now)
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            create_partition(month)
+            created.append(month)
+    return created
+
+
+def stored_months(before):
+    """Months before ``before`` that still hold audit rows, oldest first"""
+    if is_partitioned():
+        return sorted(month for month in existing_partitions() if month < before)
+    months = (
+        AuditLog.objects.filter(created_at__lt=before)
+        .annotate(month=TruncMonth("created_at", tzinfo=dt_timezone.utc))
+        .values_list("month", flat=True)
+        .distinct()
+        .order_by("month")
+    )
+    return [month_start(month) for month in months]
+
+
+def month_rows(month):
+    return AuditLog.objects.filter(created_at__gte=month, created_at__lt=add_months(month, 1))
+
+
+def archive_path(archive_dir, month):
+    return os.path.join(archive_dir, f"audit-{month:%Y-%m}.jsonl.gz")
+
+
+def export_month(month, archive_dir, chunk_size=2000):
+    """
+    Write one month of audit rows to ``audit-YYYY-MM.jsonl.gz``.
+
+    The file is written under a temporary name and renamed once complete, in
+    the same line format as the audit WAL.
+
+    Returns:
+        tuple: (path, rows written)
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = archive_path(archive_dir, month)
+    partial = path + ".partial"
+    count = 0
+    with gzip.open(partial, "wt", encoding="utf-8") as archive:
+        for entry in month_rows(month).order_by("created_at", "id").iterator(chunk_size=chunk_size):
+            archive.write(serialize_entry(entry) + "\n")
+            count += 1
+    os.replace(partial, path)
+    return path, count
+
+
+def drop_month(month, batch_size=5000):
+    """
+    Remove one month of audit rows.
+
+    PostgreSQL: detach and drop the month's partition. Elsewhere: delete the
+    rows in batches (audit rows have no dependents, so without signals).
+
+    Returns:
+        int or None: Rows deleted (None when a partition was dropped)
+    """
+    if is_partitioned():
+        quote = connection.ops.quote_name
+        name = quote(partition_name(month))
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {quote(table_name())} DETACH PARTITION {name}")
+                cursor.execute(f"DROP TABLE {name}")
+        return None
+
+    deleted = 0
+    rows = month_rows(month)
+    while True:
+        ids = list(rows.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            AuditLog.objects.filter(pk__in=ids)._raw_delete(connection.alias)
+        deleted += len(ids)
@@ -0,0 +1,26 @@
+"""
+Models whose saves and deletes are audited.
+
+The list (``AUDIT_MODELS``, as ``app_label.ModelName``) is resolved to model
+classes once, when the audit app is ready, and the audit receivers are
+connected to exactly those senders. Other models (sessions, notifications,
+audit rows themselves) never reach them. The setting is the only list:
+without it nothing is audited.
+"""
+from django.apps import apps
+from django.conf import settings
+
+_audited_models = None
+
+
+def audited_models():
+    """Audited model classes, resolved on first use"""
+    global _audited_models
+    if _audited_models is None:
+        labels = getattr(settings, 'AUDIT_MODELS', ())
+        _audited_models = frozenset(apps.get_model(label) for label in labels)
+    return _audited_models
+
+
+def is_audited(model):
+    return model._meta.concrete_model in audited_models()
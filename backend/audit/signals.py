@@ -1,52 +1,38 @@
 from django.db.models.signals import post_save, pre_delete
-from django.dispatch import receiver
-from django.utils import timezone
 
-from .utils import get_changes, log_action, get_old_instance
+from .cascade import is_cascade_deleted
+from .registry import audited_models
+from .tracking import ChangeTrackingMixin
+from .utils import log_action
 
 
-@receiver(post_save)
-def log_model_save(sender, instance, created, **kwargs):
+def log_model_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
     """
     Automatically log create and update actions.
-    Only logs models that are registered for auditing.
+    Only connected to the models registered for auditing.
     """
-    # Skip if this is not a model we want to audit
-    model_name = sender._meta.label
-    auditable_models = [
-        'properties.Property',
-        'properties.Room',
-        'tenancies.Tenancy',
-        'billing.Invoice',
-        'billing.InvoiceLine',
-        'payments.Payment',
-        'maintenance.MaintenanceRequest',
-        'metering.MeterReading',
-        'invites.Invite',
-    ]
-    
-    if model_name not in auditable_models:
+    # Fixtures are loaded as-is
+    if raw:
         return
-    
-    # Skip audit logs themselves to avoid recursion
-    if model_name == 'audit.AuditLog':
-        return
-    
+
     # Determine action type
     action_type = "create" if created else "update"
-    
-    # Get user from thread-local storage (set by middleware or viewset)
+
+    # Explicit audit context; the request user is used otherwise
     user = getattr(instance, '_audit_user', None)
     request = getattr(instance, '_audit_request', None)
-    
-    # For updates, get changes
+
+    # Creates record every value (the start of the object's timeline), updates
+    # diff against the values the instance was loaded with
     changes = None
-    if not created:
-        old_instance = get_old_instance(instance)
-        if old_instance:
-            changes = get_changes(old_instance, instance)
-    
-    # Create audit log
+    if isinstance(instance, ChangeTrackingMixin):
+        if created:
+            changes = instance.get_initial_changes()
+        else:
+            changes = instance.get_tracked_changes(update_fields)
+        instance.reset_tracked_changes(update_fields)
+
+    # Buffer audit log
     log_action(
         user=user,
         action_type=action_type,
@@ -56,38 +42,19 @@ def log_model_save(sender, instance, created, **kwargs):
     )
 
 
-@receiver(pre_delete)
 def log_model_delete(sender, instance, **kwargs):
     """
     Automatically log delete actions.
-    Only logs models that are registered for auditing.
+    Only connected to the models registered for auditing.
     """
-    # Skip if this is not a model we want to audit
-    model_name = sender._meta.label
-    auditable_models = [
-        'properties.Property',
-        'properties.Room',
-        'tenancies.Tenancy',
-        'billing.Invoice',
-        'billing.InvoiceLine',
-        'payments.Payment',
-        'maintenance.MaintenanceRequest',
-        'metering.MeterReading',
-        'invites.Invite',
-    ]
-    
-    if model_name not in auditable_models:
+    # Part of a summarized cascade delete (audit.cascade): one record for the root
+    if is_cascade_deleted(sender, instance.pk):
         return
-    
-    # Skip audit logs themselves to avoid recursion
-    if model_name == 'audit.AuditLog':
-        return
-    
-    # Get user from thread-local storage
+
     user = getattr(instance, '_audit_user', None)
     request = getattr(instance, '_audit_request', None)
-    
-    # Create audit log
+
+    # Buffer audit log
     log_action(
         user=user,
         action_type="delete",
@@ -95,3 +62,11 @@ def log_model_delete(sender, instance, **kwargs):
         changes=None,
         request=request,
     )
+
+
+def connect_signals():
+    """Connect the audit receivers to each audited model (called once, from AuditConfig.ready)"""
+    for model in audited_models():
+        label = model._meta.label
+        post_save.connect(log_model_save, sender=model, dispatch_uid=f"audit_save_{label}")
+        pre_delete.connect(log_model_delete, sender=model, dispatch_uid=f"audit_delete_{label}")
@@ -0,0 +1,85 @@
+"""
+Change tracking for audited models.
+
+``ChangeTrackingMixin`` remembers the field values an instance was loaded
+with (``from_db``), so the audit diff of an update is computed from that
+snapshot at save time: no extra SELECT of the old row and no state outside
+the instance itself. The snapshot moves forward after every save, so saving
+the same instance twice diffs each save against the previous one.
+"""
+import copy
+
+# Bookkeeping fields that are never part of a diff
+UNTRACKED_FIELDS = frozenset({"id", "created_at", "updated_at"})
+
+
+def _display(value):
+    return str(value) if value is not None else None
+
+
+class ChangeTrackingMixin:
+    """Model mixin: snapshot loaded values and diff them on save"""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            # JSON values may be edited in place; keep the loaded version
+            name: copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+            for name, value in zip(field_names, values)
+        }
+        return instance
+
+    def _tracked_fields(self, update_fields=None):
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None:
+            return []
+        return [
+            field for field in self._meta.concrete_fields
+            if field.name not in UNTRACKED_FIELDS
+            and field.attname in loaded
+            and (update_fields is None or field.name in update_fields or field.attname in update_fields)
+        ]
+
+    def get_tracked_changes(self, update_fields=None):
+        """
+        Fields changed since the instance was loaded (or last saved).
+
+        Foreign keys are compared (and reported) by key, so no related row is
+        fetched.
+
+        Returns:
+            dict or None: ``{field: {"old": str, "new": str}}``; None when the
+                          instance was not loaded from the database
+        """
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None:
+            return None
+        changes = {}
+        for field in self._tracked_fields(update_fields):
+            old_value = loaded[field.attname]
+            new_value = getattr(self, field.attname)
+            if old_value != new_value:
+                changes[field.name] = {"old": _display(old_value), "new": _display(new_value)}
+        return changes
+
+    def get_initial_changes(self):
+        """All field values of a new instance, as ``{field: {"old": None, "new": str}}``"""
+        return {
+            field.name: {"old": None, "new": _display(getattr(self, field.attname))}
+            for field in self._meta.concrete_fields
+            if field.name not in UNTRACKED_FIELDS and getattr(self, field.attname) is not None
+        }
+
+    def reset_tracked_changes(self, update_fields=None):
+        """Take the current values as the new snapshot (after a save)"""
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None:
+            loaded = self._loaded_values = {}
+            fields = [f for f in self._meta.concrete_fields if f.attname in self.__dict__]
+        else:
+            fields = self._tracked_fields(update_fields)
+        for field in fields:
+            value = getattr(self, field.attname)
+            loaded[field.attname] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
@@ -1,75 +1,41 @@
 from django.utils import timezone
-from django.db import models
 
+from .buffer import current_buffer, record
 from .models import AuditLog
 
 
-def get_changes(old_instance, new_instance):
-    """
-    Compare two model instances and return a dictionary of changed fields.
-    
-    Args:
-        old_instance: The original instance (can be None for create)
-        new_instance: The updated instance
-    
-    Returns:
-        dict: Dictionary with field names as keys and {"old": old_value, "new": new_value} as values
-    """
-    if old_instance is None:
-        # Creating new instance - all fields are "new"
-        changes = {}
-        for field in new_instance._meta.fields:
-            if field.name not in ['id', 'created_at', 'updated_at']:
-                value = getattr(new_instance, field.name, None)
-                if value is not None:
-                    changes[field.name] = {"old": None, "new": str(value)}
-        return changes
-    
-    changes = {}
-    for field in new_instance._meta.fields:
-        if field.name in ['id', 'created_at', 'updated_at']:
-            continue
-        
-        old_value = getattr(old_instance, field.name, None)
-        new_value = getattr(new_instance, field.name, None)
-        
-        # Handle ForeignKey fields
-        if isinstance(field, models.ForeignKey):
-            old_value = str(old_value) if old_value else None
-            new_value = str(new_value) if new_value else None
-        
-        # Only record if value changed
-        if old_value != new_value:
-            changes[field.name] = {
-                "old": str(old_value) if old_value is not None else None,
-                "new": str(new_value) if new_value is not None else None,
-            }
-    
-    return changes
-
-
 def log_action(
     user,
     action_type,
     instance,
     changes=None,
     request=None,
-    metadata=None
+    metadata=None,
+    object_repr=None,
 ):
     """
-    Create an audit log entry.
+    Record an audit log entry.
+    
+    The entry is buffered (see audit.buffer) and written, together with the
+    other entries of the request, once the current transaction commits.
     
     Args:
-        user: User who performed the action (can be None for system actions)
+        user: User who performed the action (None: the request user, or a system action)
         action_type: Type of action (create, update, delete, etc.)
         instance: The model instance being acted upon
-        changes: Dictionary of changes (if None, will be calculated for update actions)
+        changes: Dictionary of changes (optional)
         request: Django request object (optional, for IP and user agent)
         metadata: Additional metadata dictionary (optional)
+        object_repr: Representation of the instance (optional; bulk callers pass
+                     one that needs no related rows)
     
     Returns:
-        AuditLog: The created audit log entry
+        AuditLog: The (not yet saved) audit log entry
     """
+    if request is None:
+        buffer = current_buffer()
+        request = buffer.request if buffer is not None else None
+
     # Get IP address and user agent from request
     ip_address = None
     user_agent = None
@@ -78,7 +44,9 @@ def log_action(
         user_agent = request.META.get('HTTP_USER_AGENT', '')[:500]  # Limit length
     
     # Get object representation
-    object_repr = str(instance) if instance else ""
+    if object_repr is None:
+        object_repr = str(instance) if instance else ""
+    object_repr = object_repr[:255]
     
     # Get model name
     model_name = instance._meta.label if instance else "Unknown"
@@ -86,9 +54,8 @@ def log_action(
     # Get object ID
     object_id = instance.pk if instance and hasattr(instance, 'pk') else None
     
-    # Create audit log
-    audit_log = AuditLog.objects.create(
-        user=user,
+    audit_log = AuditLog(
+        user_id=getattr(user, 'pk', None),
         action_type=action_type,
         model_name=model_name,
         object_id=object_id,
@@ -97,7 +64,9 @@ def log_action(
         ip_address=ip_address,
         user_agent=user_agent,
         metadata=metadata or {},
+        created_at=timezone.now(),
     )
+    record(audit_log)
     
     return audit_log
 
@@ -114,33 +83,3 @@ def get_client_ip(request):
         ip = request.META.get('REMOTE_ADDR')
     return ip
 
-
-# Track old instances for comparison (used by signals)
-_old_instances = {}
-
-
-def store_old_instance(instance):
-    """
-    Store a copy of the instance before update for comparison.
-    Call this in perform_update or before saving.
-    """
-    if instance.pk:
-        model_name = instance._meta.label
-        instance_key = f"{model_name}_{instance.pk}"
-        
-        # Create a copy of the instance
-        # We'll store the current state of all fields
-        old_instance = type(instance).objects.get(pk=instance.pk)
-        _old_instances[instance_key] = old_instance
-
-
-def get_old_instance(instance):
-    """
-    Get stored old instance for comparison.
-    Used by signals to retrieve the old instance.
-    """
-    if instance.pk:
-        model_name = instance._meta.label
-        instance_key = f"{model_name}_{instance.pk}"
-        return _old_instances.pop(instance_key, None)
-    return None
@@ -1,8 +1,37 @@
+import uuid
+from datetime import datetime, time, timedelta
+
+import django_filters
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, permissions, viewsets
+from rest_framework import filters, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
 from .models import AuditLog
 from .serializers import AuditLogSerializer
+from .timeline import object_history, reconstruct, resolve_model_name
+
+
+class AuditLogFilter(django_filters.FilterSet):
+    # A day as a created_at range, so the index (and the month partition) is used
+    created_at__date = django_filters.DateFilter(method="filter_created_on")
+
+    class Meta:
+        model = AuditLog
+        fields = {
+            "action_type": ["exact", "in"],
+            "model_name": ["exact", "icontains"],
+            "user": ["exact"],
+            "created_at": ["gte", "lte"],
+        }
+
+    def filter_created_on(self, queryset, name, value):
+        start = timezone.make_aware(datetime.combine(value, time.min))
+        end = timezone.make_aware(datetime.combine(value + timedelta(days=1), time.min))
+        return queryset.filter(created_at__gte=start, created_at__lt=end)
 
 
 class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
@@ -15,16 +44,16 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     - ?user=<user_id>
     - ?created_at__gte=<date>
     - ?created_at__lte=<date>
+    - ?created_at__date=<date>
+    
+    Audit logs are stored in monthly partitions (PostgreSQL): date filters
+    only read the months they cover. ``?search=`` without a date filter
+    searches the last ``AUDIT_SEARCH_DAYS`` days.
     """
     serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAdminUser]  # Only superusers
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = {
-        "action_type": ["exact", "in"],
-        "model_name": ["exact", "icontains"],
-        "user": ["exact"],
-        "created_at": ["gte", "lte", "date"],
-    }
+    filterset_class = AuditLogFilter
     search_fields = ["model_name", "object_repr", "user__email", "ip_address"]
     ordering_fields = ["created_at", "action_type", "model_name"]
     ordering = ["-created_at"]
@@ -34,3 +63,50 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
         Only superusers can access audit logs.
         """
         return AuditLog.objects.select_related("user").all()
+
+    def filter_queryset(self, queryset):
+        params = self.request.query_params
+        if params.get("search") and not any(key.startswith("created_at") for key in params):
+            # Text search cannot use an index: bound it to the last days
+            since = timezone.now() - timedelta(days=getattr(settings, 'AUDIT_SEARCH_DAYS', 31))
+            queryset = queryset.filter(created_at__gte=since)
+        return super().filter_queryset(queryset)
+
+    @action(detail=False, methods=["get"], url_path=r"timeline/(?P<model>[\w.]+)/(?P<object_id>[0-9a-fA-F-]+)")
+    def timeline(self, request, model=None, object_id=None):
+        """
+        History of one object and its field state at a moment.
+
+        GET /audit-logs/timeline/<model>/<id>/?at=<datetime or date>
+        - model: app_label.ModelName (e.g. billing.Invoice) or the model name
+        - at: optional; history up to and state as of this moment (default: now)
+        """
+        try:
+            model_name = resolve_model_name(model)
+            object_id = uuid.UUID(object_id)
+        except (LookupError, ValueError):
+            return Response({"detail": "Không tìm thấy đối tượng."}, status=status.HTTP_404_NOT_FOUND)
+
+        at = None
+        at_param = request.query_params.get("at")
+        if at_param:
+            at = parse_datetime(at_param)
+            if at is None and (day := parse_date(at_param)) is not None:
+                # A date means the end of that day
+                at = datetime.combine(day, time.max)
+            if at is None:
+                return Response({"detail": "Thời điểm không hợp lệ."}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+
+        state = reconstruct(model_name, object_id, at=at)
+        page = self.paginate_queryset(object_history(model_name, object_id, until=at).select_related("user"))
+        response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        response.data = {
+            "model": model_name,
+            "object_id": str(object_id),
+            "at": at,
+            "state": state,
+            **response.data,
+        }
+        return response
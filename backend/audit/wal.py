@@ -0,0 +1,268 @@
+"""
+Asynchronous, append-only audit sink.
+
+Enabled by ``AUDIT_WAL_DIR``. Requests then only hand their audit entries
+to an in-process bounded queue. A background thread appends them to a local
+write-ahead log of JSONL segments, one fsync per batch, and
+``load_audit_wal`` bulk-inserts finished segments into ``AuditLog`` in large
+batches and removes them.
+
+Segments are written as ``*.jsonl.open`` while a process holds them
+(under an exclusive ``flock``) and renamed to ``*.jsonl`` when they reach
+``AUDIT_WAL_SEGMENT_BYTES`` or ``AUDIT_WAL_SEGMENT_SECONDS``, or the process
+exits. An ``.open`` segment whose lock is free belongs to a process that
+crashed: the loader replays it like a finished one, skipping a torn last
+line. Entries carry their UUID, so loading a segment twice inserts nothing
+new. Timeline checkpoints at or after a loaded entry are dropped (see
+audit.timeline).
+
+Entries are durable once their batch is on disk. A full queue makes the
+request wait briefly, then writes to the database directly, so entries are
+never dropped.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import AuditLog
+from .timeline import invalidate_checkpoints
+
+logger = logging.getLogger('backend')
+
+OPEN_SUFFIX = ".jsonl.open"
+SEALED_SUFFIX = ".jsonl"
+
+_STOP = object()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def serialize_entry(entry):
+    data = {field.attname: getattr(entry, field.attname) for field in AuditLog._meta.concrete_fields}
+    # Full precision (DjangoJSONEncoder rounds to milliseconds)
+    data["created_at"] = entry.created_at.isoformat()
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def deserialize_entry(line):
+    data = json.loads(line)
+    values = {}
+    for field in AuditLog._meta.concrete_fields:
+        if field.attname in data:
+            value = data[field.attname]
+            # JSON columns keep their parsed value; others parse from their text form
+            values[field.attname] = value if field.get_internal_type() == "JSONField" else field.to_python(value)
+    return AuditLog(**values)
+
+
+class Segment:
+    """One segment file being written, locked for the lifetime of the writer"""
+
+    def __init__(self, directory, sequence):
+        stamp = timezone.now().strftime("%Y%m%dT%H%M%S%f")
+        self.name = f"audit-{stamp}-{os.getpid()}-{sequence:06d}"
+        self.path = os.path.join(directory, self.name + OPEN_SUFFIX)
+        self.file = open(self.path, "a", encoding="utf-8")
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.opened_at = time.monotonic()
+        self.size = 0
+
+    def append(self, lines):
+        data = "".join(line + "\n" for line in lines)
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.size += len(data)
+
+    def seal(self):
+        """Rename to the finished name, then release the lock"""
+        sealed = self.path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX
+        os.rename(self.path, sealed)
+        self.file.close()
+        return sealed
+
+
+class WALWriter:
+    """Queue plus background thread appending audit entries to the segment files"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.pid = os.getpid()
+        self.queue = queue.Queue(maxsize=_setting('AUDIT_WAL_QUEUE_SIZE', 10000))
+        self.segment_bytes = _setting('AUDIT_WAL_SEGMENT_BYTES', 16 * 1024 * 1024)
+        self.segment_seconds = _setting('AUDIT_WAL_SEGMENT_SECONDS', 60)
+        self.segment = None
+        self.sequence = 0
+        os.makedirs(directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, name="audit-wal", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def submit(self, entries):
+        """Queue entries for the log; returns without touching the database or disk"""
+        try:
+            self.queue.put(entries, timeout=1)
+        except queue.Full:
+            logger.warning(f'Audit WAL queue full, writing {len(entries)} entries directly')
+            AuditLog.objects.bulk_create(entries, ignore_conflicts=True)
+
+    def close(self, timeout=10):
+        """Write what is queued and seal the current segment (at exit)"""
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                batches = [self.queue.get(timeout=1)]
+            except queue.Empty:
+                batches = []
+            # Everything queued meanwhile goes into the same write
+            while True:
+                try:
+                    batches.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batches:
+                stopping = True
+                batches = [batch for batch in batches if batch is not _STOP]
+
+            try:
+                lines = [serialize_entry(entry) for batch in batches for entry in batch]
+                if lines:
+                    if self.segment is None:
+                        self.sequence += 1
+                        self.segment = Segment(self.directory, self.sequence)
+                    self.segment.append(lines)
+                if self.segment is not None and (
+                    stopping
+                    or self.segment.size >= self.segment_bytes
+                    or time.monotonic() - self.segment.opened_at >= self.segment_seconds
+                ):
+                    self.segment.seal()
+                    self.segment = None
+            except Exception:
+                # Disk trouble: keep the entries by writing them to the database
+                logger.exception('Could not write audit WAL, writing entries directly')
+                self._write_directly([entry for batch in batches for entry in batch])
+                self._abandon_segment()
+
+    def _abandon_segment(self):
+        # Later batches start a fresh segment after a possibly partial write
+        segment, self.segment = self.segment, None
+        if segment is not None:
+            try:
+                segment.seal()
+            except OSError:
+                segment.file.close()
+
+    @staticmethod
+    def _write_directly(entries):
+        try:
+            AuditLog.objects.bulk_create(entries, ignore_conflicts=True)
+        except Exception:
+            logger.exception(f'Lost {len(entries)} audit log entries')
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """The WAL writer of this process, or None when ``AUDIT_WAL_DIR`` is not set"""
+    global _writer
+    directory = _setting('AUDIT_WAL_DIR', '')
+    if not directory:
+        return None
+    with _writer_lock:
+        # A forked worker starts its own thread and segments
+        if _writer is None or _writer.pid != os.getpid():
+            _writer = WALWriter(directory)
+        return _writer
+
+
+def pending_segments(directory):
+    """Finished segments, and segments left open by crashed processes, oldest first"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in names
+        if name.startswith("audit-") and (name.endswith(SEALED_SUFFIX) or name.endswith(OPEN_SUFFIX))
+    )
+
+
+def _read_entries(segment_file):
+    entries = []
+    for number, line in enumerate(segment_file, 1):
+        if not line.endswith("\n"):
+            # Torn write of a crashed process: the entry never completed
+            logger.warning(f'Skipping incomplete audit WAL line {number} in {segment_file.name}')
+            break
+        try:
+            entries.append(deserialize_entry(line))
+        except ValueError:
+            logger.warning(f'Skipping unreadable audit WAL line {number} in {segment_file.name}')
+    return entries
+
+
+def load_segment(path, batch_size=5000):
+    """
+    Insert the entries of one segment into AuditLog and remove the file.
+
+    Returns:
+        int or None: Entries read; None if the segment is still being written
+                     or another loader holds it
+    """
+    try:
+        segment_file = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    with segment_file:
+        try:
+            fcntl.flock(segment_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        if not os.path.exists(path):
+            # Sealed (renamed) or loaded by someone else meanwhile
+            return None
+        entries = _read_entries(segment_file)
+        for start in range(0, len(entries), batch_size):
+            AuditLog.objects.bulk_create(entries[start:start + batch_size], ignore_conflicts=True)
+            # Timelines checkpointed past these entries would skip them
+            invalidate_checkpoints(entries[start:start + batch_size])
+        os.remove(path)
+    return len(entries)
+
+
+def load_pending(directory, batch_size=5000, on_segment=None):
+    """
+    Load every pending segment.
+
+    Returns:
+        tuple: (segments loaded, entries read)
+    """
+    segments = entries = 0
+    for path in pending_segments(directory):
+        count = load_segment(path, batch_size)
+        if count is None:
+            continue
+        segments += 1
+        entries += count
+        if on_segment is not None:
+            on_segment(path, count)
+    return segments, entries
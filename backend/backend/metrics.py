@@ -0,0 +1,394 @@
+"""
+Application metrics in the Prometheus text exposition format.
+
+Counters and histograms are kept in process memory and updated in place
+(a dict update under a lock). ``GET /metrics`` renders them together with
+gauges computed at scrape time (notification outbox depth, cache hit ratios).
+
+Several processes (gunicorn workers, management commands) share their values
+through ``METRICS_DIR``: each process writes ``metrics-<pid>-<start>.json``
+there every ``METRICS_FLUSH_SECONDS`` and at exit (atomic rename), and a
+scrape sums the files of every process with its own live values. Files of
+processes that exited are folded into ``metrics-exited.json``, so counters
+never go backwards when workers are recycled. Empty the directory when the
+whole service is redeployed. Without ``METRICS_DIR`` each process only
+reports itself.
+"""
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+FILE_PREFIX = "metrics-"
+EXITED_FILE = "metrics-exited.json"
+LOCK_FILE = "metrics.lock"
+
+REGISTRY = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY[name] = self
+
+    def _labels(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return labels
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        get_store().add(_key(self.name, self._labels(labels)), amount)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        get_store().observe(_key(self.name, self._labels(labels)), self.buckets, value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block, in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class Values:
+    """Counter values and histogram states, keyed by ``(name, labels)``"""
+
+    def __init__(self):
+        self.counters = {}
+        # key -> [bucket counts (not cumulative, +Inf last), sum, count]
+        self.histograms = {}
+
+    def add(self, key, amount):
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, key, buckets, value):
+        state = self.histograms.get(key)
+        if state is None:
+            state = self.histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+        index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+        state[0][index] += 1
+        state[1] += value
+        state[2] += 1
+
+    def merge(self, other):
+        for key, value in other.counters.items():
+            self.add(key, value)
+        for key, (counts, total, count) in other.histograms.items():
+            state = self.histograms.get(key)
+            if state is None or len(state[0]) != len(counts):
+                # Unknown here, or buckets changed between releases: keep the newest
+                self.histograms[key] = [list(counts), total, count]
+                continue
+            state[0] = [a + b for a, b in zip(state[0], counts)]
+            state[1] += total
+            state[2] += count
+
+    def to_json(self):
+        return json.dumps({
+            "counters": [[name, labels, value] for (name, labels), value in self.counters.items()],
+            "histograms": [[name, labels, *state] for (name, labels), state in self.histograms.items()],
+        })
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        values = cls()
+        for name, labels, value in data.get("counters", []):
+            values.counters[name, tuple(map(tuple, labels))] = value
+        for name, labels, counts, total, count in data.get("histograms", []):
+            values.histograms[name, tuple(map(tuple, labels))] = [counts, total, count]
+        return values
+
+
+class ProcessStore:
+    """Values of this process, written to ``METRICS_DIR`` in the background"""
+
+    def __init__(self, directory):
+        self.pid = os.getpid()
+        self.directory = directory
+        self.values = Values()
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.path = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.path = os.path.join(directory, f"{FILE_PREFIX}{self.pid}-{time.time_ns()}.json")
+            threading.Thread(target=self._run, name="metrics-flush", daemon=True).start()
+            atexit.register(self.flush)
+
+    def add(self, key, amount):
+        with self.lock:
+            self.values.add(key, amount)
+            self.dirty = True
+
+    def observe(self, key, buckets, value):
+        with self.lock:
+            self.values.observe(key, buckets, value)
+            self.dirty = True
+
+    def snapshot(self):
+        with self.lock:
+            copy = Values()
+            copy.merge(self.values)
+            return copy
+
+    def flush(self):
+        if self.path is None or not self.dirty or self.pid != os.getpid():
+            return
+        with self.lock:
+            data = self.values.to_json()
+            self.dirty = False
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        interval = _setting('METRICS_FLUSH_SECONDS', 5)
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Metric values of this process (a forked worker starts its own)"""
+    global _store
+    if _store is None or _store.pid != os.getpid():
+        with _store_lock:
+            if _store is None or _store.pid != os.getpid():
+                _store = ProcessStore(_setting('METRICS_DIR', ''))
+    return _store
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return Values.from_json(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _fold_exited(directory, paths):
+    """Add the files of exited processes to the exited total and remove them"""
+    with open(os.path.join(directory, LOCK_FILE), "a") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        exited_path = os.path.join(directory, EXITED_FILE)
+        exited = _read(exited_path) or Values()
+        folded = []
+        for path in paths:
+            # Checked under the lock: another scrape may have folded it already
+            values = _read(path)
+            if values is not None:
+                exited.merge(values)
+                folded.append(path)
+        if folded:
+            tmp_path = f"{exited_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(exited.to_json())
+            os.replace(tmp_path, exited_path)
+            for path in folded:
+                os.remove(path)
+        return exited
+
+
+def collect():
+    """Values of every process sharing ``METRICS_DIR`` (this process only without it)"""
+    store = get_store()
+    total = store.snapshot()
+    if not store.directory:
+        return total
+
+    exited_paths = []
+    for name in os.listdir(store.directory):
+        if not name.startswith(FILE_PREFIX) or not name.endswith(".json") or name == EXITED_FILE:
+            continue
+        path = os.path.join(store.directory, name)
+        if path == store.path:
+            continue
+        try:
+            pid = int(name[len(FILE_PREFIX):].split("-")[0])
+        except ValueError:
+            continue
+        if not _process_alive(pid):
+            exited_paths.append(path)
+            continue
+        values = _read(path)
+        if values is not None:
+            total.merge(values)
+
+    if exited_paths:
+        total.merge(_fold_exited(store.directory, exited_paths))
+    else:
+        total.merge(_read(os.path.join(store.directory, EXITED_FILE)) or Values())
+    return total
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _gauges(values):
+    """Gauges computed at scrape time: ``(name, help, [(labels, value)])``"""
+    from notifications.models import Notification
+    from notifications.outbox import OUTBOX_CHANNELS, outbox_queryset
+
+    gauges = [
+        ("notification_outbox_due", "Email/push notifications due for delivery", [((), outbox_queryset().count())]),
+        ("notification_outbox_pending", "Email/push notifications not yet delivered or failed", [(
+            (),
+            Notification.objects.filter(
+                channel__in=OUTBOX_CHANNELS, sent_at__isnull=True, failed_at__isnull=True,
+            ).count(),
+        )]),
+    ]
+
+    requests = {}
+    for (name, labels), value in values.counters.items():
+        if name == cache_requests.name:
+            labels = dict(labels)
+            hits_total = requests.setdefault(labels["cache"], [0, 0])
+            hits_total[0] += value if labels["result"] == "hit" else 0
+            hits_total[1] += value
+    gauges.append((
+        "cache_hit_ratio",
+        "Share of cache lookups that hit, since the metrics were reset",
+        [((("cache", cache),), hits / total) for cache, (hits, total) in sorted(requests.items()) if total],
+    ))
+    return gauges
+
+
+def render_metrics():
+    """The text exposition of every metric"""
+    values = collect()
+    lines = []
+    for metric in REGISTRY.values():
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        if metric.type == "counter":
+            for (name, labels), value in sorted(values.counters.items()):
+                if name == metric.name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            continue
+        for (name, labels), (counts, total, count) in sorted(values.histograms.items()):
+            if name != metric.name:
+                continue
+            cumulative = 0
+            for bound, bucket in zip(metric.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+    for name, documentation, samples in _gauges(values):
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in samples:
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests by route and status", ["method", "view", "status"],
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "view"],
+)
+http_request_queries = Histogram(
+    "http_request_queries", "SQL queries per HTTP request by route", ["method", "view"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250, 500),
+)
+cache_requests = Counter(
+    "cache_requests_total", "Cache lookups by cache and result (hit/miss)", ["cache", "result"],
+)
+invoice_pdf_render = Histogram(
+    "invoice_pdf_render_seconds", "Time to render one invoice PDF",
+)
+command_duration = Histogram(
+    "management_command_duration_seconds", "Management command run time by command and outcome",
+    ["command", "status"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 1800, 3600),
+)
+
+
+def count_cache_lookup(cache, hit):
+    cache_requests.inc(cache=cache, result="hit" if hit else "miss")
+
+
+class CommandMetricsMixin:
+    """Record the run time of a management command (``management_command_duration_seconds``)"""
+
+    def execute(self, *args, **options):
+        command = self.__module__.rsplit(".", 1)[-1]
+        start = time.perf_counter()
+        status = "error"
+        try:
+            result = super().execute(*args, **options)
+            status = "success"
+            return result
+        finally:
+            command_duration.observe(time.perf_counter() - start, command=command, status=status)
+            get_store().flush()
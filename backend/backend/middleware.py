@@ -1,40 +1,195 @@
 """
-Performance monitoring middleware to log slow requests.
+Performance monitoring middleware: per-request SQL instrumentation.
+
+Every query of the request goes through ``QueryRecorder`` (installed with
+``connection.execute_wrapper`` on each database), which counts queries, sums
+their time and groups them by shape: the SQL with its parameters left out
+and ``IN (%s, %s, ...)`` lists collapsed. A shape run
+``PERFORMANCE_N_PLUS_ONE_THRESHOLD`` times or more in one request is an N+1:
+it is logged with the view and the application stack of its second run.
+
+Responses carry a ``Server-Timing`` header with the phases ``db`` (SQL),
+``serialize`` (view code outside SQL: queryset building and serialization),
+``render`` (response rendering) and ``total``.
+
+Slow requests are logged as warnings (``PERFORMANCE_SLOW_REQUEST_SECONDS``)
+or errors (``PERFORMANCE_VERY_SLOW_REQUEST_SECONDS``), every request at
+DEBUG with ``PERFORMANCE_LOG_ALL_REQUESTS``; ``PERFORMANCE_LOG_FORMAT = 'json'``
+writes the records as one JSON object per line.
 """
-import time
+import json
 import logging
-from django.utils.deprecation import MiddlewareMixin
+import os
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import http_request_duration, http_request_queries, http_requests
 
 logger = logging.getLogger('backend')
 
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def query_shape(sql):
+    """SQL without parameters, ``IN`` lists of any length alike"""
+    return _IN_LIST.sub("IN (...)", sql)
+
+
+def application_stack(limit=8):
+    """Innermost frames of the project's own code (no Django, no libraries)"""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-1]
+        if frame.filename.startswith(base_dir)
+        and "site-packages" not in frame.filename
+        and os.path.abspath(frame.filename) != _THIS_FILE
+    ]
+    return [f"{frame.filename[len(base_dir) + 1:]}:{frame.lineno} in {frame.name}" for frame in frames[-limit:]]
+
+
+class QueryRecorder:
+    """``execute_wrapper`` collecting the count, time and shapes of the queries of one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.stacks = {}
 
-class PerformanceMiddleware(MiddlewareMixin):
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            shape = query_shape(sql)
+            self.shapes[shape] += 1
+            # The first repeat is where a loop shows
+            if self.shapes[shape] == 2:
+                self.stacks[shape] = application_stack()
+
+    def repeated(self, threshold):
+        """Shapes run at least ``threshold`` times, most frequent first"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+class PerformanceMiddleware:
     """
-    Middleware to log slow requests for performance monitoring.
-    Logs requests that take longer than 1 second.
+    Instrument each request: SQL count and time, N+1 detection, Server-Timing
+    header, slow request logging and the request metrics (backend.metrics).
     """
-    def process_request(self, request):
-        """Record start time for request"""
-        request._start_time = time.time()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request._query_recorder = recorder
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        # Responses without a render step end with the view
+        end = start + total
+        view_start = getattr(request, '_view_start', end)
+        view_end = getattr(request, '_view_end', end)
+        view = view_end - view_start
+        render = end - view_end
+        timings = {
+            "db": recorder.duration,
+            "serialize": max(view - recorder.duration, 0.0),
+            "render": max(render, 0.0),
+            "total": total,
+        }
+        if _setting('PERFORMANCE_SERVER_TIMING', True):
+            response['Server-Timing'] = ", ".join(
+                f'{name};dur={seconds * 1000:.1f}' + (f';desc="{recorder.count} queries"' if name == "db" else "")
+                for name, seconds in timings.items()
+            )
+        self._log(request, response, recorder, timings)
+        self._count(request, response, recorder, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._view_start = time.perf_counter()
         return None
-    
-    def process_response(self, request, response):
-        """Log slow requests"""
-        if hasattr(request, '_start_time'):
-            duration = time.time() - request._start_time
-            
-            # Log requests that take longer than 1 second
-            if duration > 1.0:
-                logger.warning(
-                    f'Slow request: {request.method} {request.path} '
-                    f'took {duration:.2f}s (status: {response.status_code})'
-                )
-            # Log very slow requests (>3 seconds) as errors
-            elif duration > 3.0:
-                logger.error(
-                    f'Very slow request: {request.method} {request.path} '
-                    f'took {duration:.2f}s (status: {response.status_code})'
-                )
-        
+
+    def process_template_response(self, request, response):
+        # Called between the view and rendering (DRF responses too)
+        request._view_end = time.perf_counter()
         return response
 
+    def process_exception(self, request, exception):
+        request._view_end = time.perf_counter()
+        return None
+
+    @staticmethod
+    def _count(request, response, recorder, duration):
+        # Route names, not paths: one series per endpoint whatever the ids
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match._func_path) if match else "unmatched"
+        http_requests.inc(method=request.method, view=view, status=response.status_code)
+        http_request_duration.observe(duration, method=request.method, view=view)
+        http_request_queries.observe(recorder.count, method=request.method, view=view)
+
+    def _log(self, request, response, recorder, timings):
+        match = getattr(request, 'resolver_match', None)
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": (match.view_name or match._func_path) if match else None,
+            "status": response.status_code,
+            "duration_ms": round(timings["total"] * 1000, 1),
+            "db_ms": round(timings["db"] * 1000, 1),
+            "serialize_ms": round(timings["serialize"] * 1000, 1),
+            "render_ms": round(timings["render"] * 1000, 1),
+            "queries": recorder.count,
+        }
+
+        for shape, count in recorder.repeated(_setting('PERFORMANCE_N_PLUS_ONE_THRESHOLD', 10)):
+            self._emit(logging.WARNING, 'Repeated query (N+1)', {
+                **record,
+                "repeats": count,
+                "sql": shape,
+                "stack": recorder.stacks.get(shape, []),
+            })
+
+        duration = timings["total"]
+        if duration > _setting('PERFORMANCE_VERY_SLOW_REQUEST_SECONDS', 3.0):
+            self._emit(logging.ERROR, 'Very slow request', record)
+        elif duration > _setting('PERFORMANCE_SLOW_REQUEST_SECONDS', 1.0):
+            self._emit(logging.WARNING, 'Slow request', record)
+        elif _setting('PERFORMANCE_LOG_ALL_REQUESTS', False):
+            self._emit(logging.DEBUG, 'Request', record)
+
+    @staticmethod
+    def _emit(level, event, record):
+        if not logger.isEnabledFor(level):
+            return
+        if _setting('PERFORMANCE_LOG_FORMAT', 'text') == 'json':
+            logger.log(level, json.dumps({"event": event, **record}, ensure_ascii=False))
+            return
+        message = (
+            f'{event}: {record["method"]} {record["path"]} ({record["view"]}) '
+            f'took {record["duration_ms"]:.0f}ms, {record["queries"]} queries in {record["db_ms"]:.0f}ms '
+            f'(status: {record["status"]})'
+        )
+        if "sql" in record:
+            message += f'\n  {record["repeats"]}x {record["sql"]}'
+            message += "".join(f'\n    {frame}' for frame in record["stack"])
+        logger.log(level, message)
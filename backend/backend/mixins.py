@@ -1,8 +1,18 @@
 """
-Mixin for field selection support in DRF viewsets.
-Allows clients to request only specific fields using ?fields=id,name,status
+Mixins for DRF viewsets.
+- FieldSelectionMixin: request only specific fields using ?fields=id,name,status
+- ExportMixin: stream the filtered list as CSV/XLSX via .../export/
+- CascadeDeleteMixin: delete an object and its cascade under one audit record
 """
-from rest_framework import serializers
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from audit.cascade import delete_in_background, delete_with_summary
+
+from .exports import stream_csv, stream_xlsx
 
 
 class FieldSelectionMixin:
@@ -29,3 +39,108 @@ class FieldSelectionMixin:
         
         return serializer
 
+
+class ExportMixin:
+    """
+    Mixin adding ``GET .../export/?file_format=csv|xlsx`` to a list viewset.
+
+    The export honours the same role scoping (``get_queryset``), filters,
+    search and ordering as the list endpoint, but is not paginated: rows are
+    read with ``values_list().iterator()`` and streamed, so a year of data
+    costs one query and constant memory.
+
+    Subclasses set ``export_fields`` to ``(header, lookup)`` pairs. Fields with
+    choices are exported with their display label.
+    """
+    export_fields = ()
+    export_filename = "export"
+    export_chunk_size = 2000
+
+    EXPORT_FORMATS = {
+        "csv": (stream_csv, "text/csv; charset=utf-8"),
+        "xlsx": (stream_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    }
+
+    def _export_converters(self, model):
+        """Map column index -> choice labels for lookups that end on a field with choices"""
+        converters = {}
+        for index, (_, lookup) in enumerate(self.export_fields):
+            field = None
+            current = model
+            for part in lookup.split("__"):
+                field = current._meta.get_field(part)
+                current = field.related_model
+            if field is not None and field.choices:
+                converters[index] = dict(field.flatchoices)
+        return converters
+
+    def _export_rows(self, queryset):
+        converters = self._export_converters(queryset.model)
+        # Related objects are read through the lookups, not instances
+        rows = queryset.select_related(None).prefetch_related(None).values_list(
+            *[lookup for _, lookup in self.export_fields]
+        ).iterator(chunk_size=self.export_chunk_size)
+        if not converters:
+            yield from rows
+            return
+        for row in rows:
+            row = list(row)
+            for index, labels in converters.items():
+                row[index] = labels.get(row[index], row[index])
+            yield row
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """
+        Stream the filtered list as a file.
+
+        Query params:
+        - file_format: csv (default) or xlsx
+        - any filter/search/ordering parameter accepted by the list endpoint
+        """
+        file_format = request.query_params.get("file_format", "csv").lower()
+        if file_format not in self.EXPORT_FORMATS:
+            return Response(
+                {"detail": "Định dạng không hợp lệ. Chọn csv hoặc xlsx."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        streamer, content_type = self.EXPORT_FORMATS[file_format]
+
+        queryset = self.filter_queryset(self.get_queryset())
+        headers = [header for header, _ in self.export_fields]
+        kwargs = {"chunk_size": self.export_chunk_size}
+        if file_format == "xlsx":
+            kwargs["sheet_name"] = self.export_filename
+
+        response = StreamingHttpResponse(
+            streamer(headers, self._export_rows(queryset), **kwargs),
+            content_type=content_type,
+        )
+        filename = f"{self.export_filename}-{timezone.localdate():%Y%m%d}.{file_format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class CascadeDeleteMixin:
+    """
+    Mixin for viewsets whose objects own large cascades (a property, a room).
+
+    ``DELETE`` removes the object and everything that cascades from it through
+    ``audit.cascade``: one summarized audit record with per-model counts and
+    keys instead of one per row, and no per-row invoice recompute or PDF
+    cache work for rows deleted together.
+
+    ``DELETE ...?background=true`` answers 202 at once and deletes in chunks,
+    one transaction each, in a background thread.
+    """
+
+    def destroy(self, request, *args, **kwargs):
+        instance = self.get_object()
+        if request.query_params.get("background", "").lower() in ("1", "true"):
+            delete_in_background(instance, user=request.user)
+            return Response(
+                {"detail": "Đang xóa dữ liệu ở chế độ nền."},
+                status=status.HTTP_202_ACCEPTED,
+            )
+        delete_with_summary(instance, user=request.user, request=request)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,277 @@
+"""
+Pagination for all list endpoints.
+
+``HybridPagination`` keeps page-number pagination (``?page=``, with a total
+``count``) for existing clients. Clients opt in to keyset pagination with
+``?cursor=`` (empty for the first page), ``?pagination=cursor`` or the
+``X-Pagination: cursor`` header. Cursor pages return ``next``/``previous``
+links and ``results`` only: no ``COUNT(*)`` and no ``OFFSET``, so page 500
+costs the same as page 1.
+
+``KeysetPagination`` pages on the queryset's ordering (the viewset ordering
+or ``?ordering=``), made unique with ``id`` as the last key, e.g.
+``(-created_at, -id)``. The cursor holds the ordering values of the last row
+and the next page is ``WHERE (created_at, id) < (:created_at, :id)``, which
+walks the ``(created_at, id)`` indexes. Rows inserted meanwhile never shift
+or duplicate the following pages.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _rest_setting(name, default):
+    return getattr(settings, 'REST_FRAMEWORK', {}).get(name, default)
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination on a composite, unique ordering"""
+
+    cursor_query_param = "cursor"
+    page_size_query_param = _rest_setting('PAGE_SIZE_QUERY_PARAM', 'page_size')
+    max_page_size = _rest_setting('MAX_PAGE_SIZE', 200)
+    default_ordering = ("-created_at",)
+
+    def get_page_size(self, request):
+        page_size = api_settings.PAGE_SIZE or 20
+        try:
+            requested = int(request.query_params.get(self.page_size_query_param, page_size))
+        except (TypeError, ValueError):
+            return page_size
+        return max(1, min(requested, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        """
+        Ordering terms as ``(path, descending, nullable)``, ending with the primary key.
+
+        Foreign keys order by their key column. Expression orderings fall back
+        to ``default_ordering``.
+        """
+        model = queryset.model
+        ordering = list(queryset.query.order_by) or list(model._meta.ordering)
+        if not ordering or not all(isinstance(term, str) and term != "?" for term in ordering):
+            ordering = [term for term in self.default_ordering if self._resolve(model, term.lstrip("-"))]
+
+        terms = []
+        for term in ordering:
+            descending = term.startswith("-")
+            path = term.lstrip("-")
+            if path == "pk":
+                path = model._meta.pk.name
+            resolved = self._resolve(model, path)
+            if resolved is None:
+                continue
+            path, nullable = resolved
+            if path not in {t[0] for t in terms}:
+                terms.append((path, descending, nullable))
+            if path == model._meta.pk.attname:
+                break
+        else:
+            # Make the ordering unique with the primary key
+            descending = terms[-1][1] if terms else True
+            terms.append((model._meta.pk.attname, descending, False))
+        return terms
+
+    @staticmethod
+    def _resolve(model, path):
+        """``(orderable path, nullable)`` for a field path, None if it is not a field"""
+        parts = path.split("__")
+        nullable = False
+        for index, name in enumerate(parts):
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            nullable = nullable or field.null
+            if field.is_relation:
+                if field.many_to_many or field.one_to_many:
+                    return None
+                if index == len(parts) - 1:
+                    parts[index] = field.attname
+                    break
+                model = field.related_model
+        return "__".join(parts), nullable
+
+    @staticmethod
+    def _order_by(terms, reverse):
+        expressions = []
+        for path, descending, nullable in terms:
+            descending = descending != reverse
+            # Nulls sort after values when paging forward, before when paging back
+            nulls = {"nulls_first": True} if reverse else {"nulls_last": True}
+            expression = F(path).desc if descending else F(path).asc
+            expressions.append(expression(**nulls) if nullable else expression())
+        return expressions
+
+    @staticmethod
+    def _after(terms, values, reverse):
+        """Rows strictly after ``values`` in the (possibly reversed) ordering"""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (path, descending, nullable), value in zip(terms, values):
+            descending = descending != reverse
+            if value is None:
+                # Values follow the null block only when paging back
+                after = Q(**{f"{path}__isnull": False}) if reverse else Q(pk__in=[])
+                same = Q(**{f"{path}__isnull": True})
+            else:
+                after = Q(**{f"{path}__{'lt' if descending else 'gt'}": value})
+                if nullable and not reverse:
+                    after |= Q(**{f"{path}__isnull": True})
+                same = Q(**{path: value})
+            condition |= equal & after
+            equal &= same
+
+        first_path, first_descending, _ = terms[0]
+        first_value = values[0]
+        if first_value is not None:
+            # Redundant range on the leading key lets the index bound the scan
+            lookup = "lte" if first_descending != reverse else "gte"
+            first_range = Q(**{f"{first_path}__{lookup}": first_value})
+            if terms[0][2] and not reverse:
+                first_range |= Q(**{f"{first_path}__isnull": True})
+            condition = first_range & condition
+        return condition
+
+    @staticmethod
+    def _values(obj, terms):
+        values = []
+        for path, _, _ in terms:
+            value = obj
+            for name in path.split("__"):
+                value = getattr(value, name, None) if value is not None else None
+            values.append(_encode_value(value))
+        return values
+
+    def encode_cursor(self, values, reverse):
+        payload = json.dumps({"v": values, "r": int(reverse)}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, request, terms):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            values, reverse = payload["v"], bool(payload["r"])
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise NotFound("Invalid cursor")
+        if not isinstance(values, list) or len(values) != len(terms):
+            # The ordering changed since the cursor was issued
+            raise NotFound("Invalid cursor")
+        return values, reverse
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.terms = self.get_ordering(queryset)
+        values, reverse = self.decode_cursor(request, self.terms)
+
+        queryset = queryset.order_by(*self._order_by(self.terms, reverse))
+        try:
+            if values is not None:
+                queryset = queryset.filter(self._after(self.terms, values, reverse))
+            rows = list(queryset[:self.page_size + 1])
+        except (ValidationError, ValueError, TypeError):
+            # Cursor values that do not fit the ordering fields
+            raise NotFound("Invalid cursor")
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Going back, there is a next page (we came from it); going forward,
+        # there is a previous one whenever a cursor was given
+        self.has_next = has_more if not reverse else values is not None
+        self.has_previous = has_more if reverse else values is not None
+        # An empty page links back from the requested position
+        self.first_values = self._values(rows[0], self.terms) if rows else values
+        self.last_values = self._values(rows[-1], self.terms) if rows else values
+        return rows
+
+    def _link(self, values, reverse):
+        url = self.request.build_absolute_uri()
+        if values is None:
+            return remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(values, reverse))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self._link(self.last_values, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self._link(self.first_values, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class HybridPagination(PageNumberPagination):
+    """
+    Page-number pagination by default, keyset pagination on request.
+
+    Opt in with ``?cursor=`` (first page: empty), ``?pagination=cursor`` or
+    the ``X-Pagination: cursor`` header.
+    """
+
+    page_size_query_param = _rest_setting('PAGE_SIZE_QUERY_PARAM', 'page_size')
+    max_page_size = _rest_setting('MAX_PAGE_SIZE', 200)
+    cursor_class = KeysetPagination
+
+    def wants_cursor(self, request):
+        return (
+            self.cursor_class.cursor_query_param in request.query_params
+            or request.query_params.get("pagination") == "cursor"
+            or request.headers.get("X-Pagination", "").lower() == "cursor"
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.wants_cursor(request):
+            self.cursor_paginator = self.cursor_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
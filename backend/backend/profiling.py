@@ -0,0 +1,317 @@
+"""
+On-demand request profiling for superusers.
+
+A request from a superuser with ``?__profile=1`` or the header
+``X-Profile: 1`` runs under ``cProfile`` while a sampler thread records the
+request thread's stack every ``PROFILE_SAMPLE_INTERVAL`` seconds, and every
+SQL statement is captured with its parameters and time. Afterwards the
+``PROFILE_EXPLAIN_QUERIES`` slowest SELECTs are run again under ``EXPLAIN``
+(plain EXPLAIN: nothing is executed twice).
+
+The profile is stored in ``PROFILE_DIR`` as ``<id>.json`` (summary: timings,
+queries, plans, top functions), ``<id>.prof`` (pstats, for snakeviz or
+``python -m pstats``) and ``<id>.collapsed`` (collapsed stacks for
+flamegraph.pl / speedscope); the response names it in ``X-Profile-Id``. Only
+the ``PROFILE_KEEP`` newest profiles are kept. Streaming responses are
+profiled up to the first byte.
+
+One request per process runs under ``cProfile`` at a time (Python 3.12+
+allows a single active profiler per interpreter). A profile requested
+meanwhile, or while another profiling tool is active, records the sampled
+stacks and SQL only: ``"cprofile": false`` in its summary and no pstats file.
+
+Other requests pay one substring test on the query string and one header
+lookup.
+"""
+import cProfile
+import json
+import os
+import pstats
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+PROFILE_PARAM = "__profile"
+PROFILE_HEADER = "HTTP_X_PROFILE"
+PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+PROFILE_FILES = {
+    "json": ("application/json", ".json"),
+    "pstats": ("application/octet-stream", ".prof"),
+    "collapsed": ("text/plain; charset=utf-8", ".collapsed"),
+}
+
+# Captured statements kept in the summary
+MAX_QUERIES = 1000
+
+# Held while a request runs under cProfile
+_profiler_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def profile_dir():
+    return _setting('PROFILE_DIR', '') or os.path.join(tempfile.gettempdir(), 'home-easy-profiles')
+
+
+def profile_path(profile_id, kind):
+    """Path of one file of a stored profile (``kind``: json, pstats or collapsed)"""
+    if not PROFILE_ID.match(profile_id) or kind not in PROFILE_FILES:
+        raise FileNotFoundError(profile_id)
+    return os.path.join(profile_dir(), profile_id + PROFILE_FILES[kind][1])
+
+
+def _short_path(filename):
+    base_dir = str(settings.BASE_DIR)
+    if filename.startswith(base_dir):
+        return filename[len(base_dir) + 1:]
+    marker = filename.rfind("site-packages")
+    return filename[marker + len("site-packages") + 1:] if marker >= 0 else filename
+
+
+class StackSampler(threading.Thread):
+    """Samples the stack of one thread, for a collapsed-stack flame graph"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class QueryCapture:
+    """``execute_wrapper`` keeping every statement with its parameters and time"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "alias": context["connection"].alias,
+                "sql": sql,
+                "params": None if many else params,
+                "many": many,
+                "duration_ms": (time.perf_counter() - start) * 1000,
+            })
+
+
+def explain(query):
+    """Plan of a captured SELECT, as text lines (or the error)"""
+    connection = connections[query["alias"]]
+    try:
+        with transaction.atomic(using=query["alias"]):
+            with connection.cursor() as cursor:
+                cursor.execute(f'{connection.ops.explain_query_prefix()} {query["sql"]}', query["params"])
+                return [" ".join(str(value) for value in row) for row in cursor.fetchall()]
+    except DatabaseError as exc:
+        return [f"EXPLAIN failed: {exc}"]
+
+
+def top_functions(profiler, limit=30):
+    """Functions with the most cumulative time"""
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            "function": f"{name} ({_short_path(filename)}:{line})",
+            "calls": calls,
+            "total_ms": round(total * 1000, 2),
+            "cumulative_ms": round(cumulative * 1000, 2),
+        }
+        for (filename, line, name), (_, calls, total, cumulative, _) in rows
+    ]
+
+
+def _json_params(params):
+    if params is None:
+        return None
+    values = params.values() if isinstance(params, dict) else params
+    return [str(value) for value in values]
+
+
+def prune_profiles(keep):
+    """Remove all but the ``keep`` newest profiles"""
+    directory = profile_dir()
+    summaries = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith(".json")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in summaries[keep:]:
+        profile_id = entry.name[:-len(".json")]
+        for kind in PROFILE_FILES:
+            try:
+                os.remove(profile_path(profile_id, kind))
+            except OSError:
+                pass
+
+
+def list_profiles():
+    """Summaries of the stored profiles, newest first (without queries and functions)"""
+    profiles = []
+    try:
+        entries = list(os.scandir(profile_dir()))
+    except FileNotFoundError:
+        return []
+    for entry in entries:
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path, encoding="utf-8") as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        profiles.append({key: summary.get(key) for key in (
+            "id", "created_at", "method", "path", "user", "status", "duration_ms", "query_count", "db_ms",
+        )})
+    return sorted(profiles, key=lambda profile: profile["created_at"] or "", reverse=True)
+
+
+def _profiling_user(request):
+    """The superuser asking for a profile, authenticated by session or JWT"""
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        try:
+            result = JWTAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        user = result[0] if result else None
+    if user is not None and user.is_active and user.is_superuser:
+        return user
+    return None
+
+
+class ProfilingMiddleware:
+    """Profile requests that ask for it (superusers only), see module docstring"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        wanted = (
+            PROFILE_HEADER in request.META
+            or PROFILE_PARAM in request.META.get("QUERY_STRING", "")
+        )
+        if not wanted:
+            return self.get_response(request)
+        flag = request.META.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM)
+        if flag not in ("1", "true") or (user := _profiling_user(request)) is None:
+            return self.get_response(request)
+        return self._profile(request, user)
+
+    def _profile(self, request, user):
+        capture = QueryCapture()
+        sampler = StackSampler(threading.get_ident(), _setting('PROFILE_SAMPLE_INTERVAL', 0.005))
+        profiler = cProfile.Profile() if _profiler_lock.acquire(blocking=False) else None
+        locked = profiler is not None
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(capture))
+                sampler.start()
+                start = time.perf_counter()
+                if profiler is not None:
+                    try:
+                        profiler.enable()
+                    except ValueError:
+                        # Another profiling tool is active (Python 3.12+): sampler only
+                        profiler = None
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+                    duration = time.perf_counter() - start
+                    sampler.stop()
+        finally:
+            if locked:
+                _profiler_lock.release()
+
+        profile_id = uuid.uuid4().hex
+        queries = capture.queries
+        slowest = sorted(
+            (query for query in queries if not query["many"] and query["sql"].lstrip().upper().startswith("SELECT")),
+            key=lambda query: query["duration_ms"],
+            reverse=True,
+        )[:_setting('PROFILE_EXPLAIN_QUERIES', 5)]
+        summary = {
+            "id": profile_id,
+            "created_at": timezone.now().isoformat(),
+            "method": request.method,
+            "path": request.path,
+            "query_string": request.META.get("QUERY_STRING", ""),
+            "user": user.email,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 2),
+            "query_count": len(queries),
+            "db_ms": round(sum(query["duration_ms"] for query in queries), 2),
+            "samples": sum(sampler.stacks.values()),
+            "cprofile": profiler is not None,
+            "slowest_queries": [
+                {
+                    "sql": query["sql"],
+                    "params": _json_params(query["params"]),
+                    "duration_ms": round(query["duration_ms"], 2),
+                    "explain": explain(query),
+                }
+                for query in slowest
+            ],
+            "queries": [
+                {
+                    "alias": query["alias"],
+                    "sql": query["sql"],
+                    "params": _json_params(query["params"]),
+                    "duration_ms": round(query["duration_ms"], 2),
+                }
+                for query in queries[:MAX_QUERIES]
+            ],
+            "top_functions": top_functions(profiler) if profiler is not None else [],
+        }
+
+        os.makedirs(profile_dir(), exist_ok=True)
+        if profiler is not None:
+            profiler.dump_stats(profile_path(profile_id, "pstats"))
+        with open(profile_path(profile_id, "collapsed"), "w", encoding="utf-8") as f:
+            f.write(sampler.collapsed())
+        # Written last: a listed profile has all its files
+        with open(profile_path(profile_id, "json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False)
+        prune_profiles(_setting('PROFILE_KEEP', 50))
+
+        response['X-Profile-Id'] = profile_id
+        return response
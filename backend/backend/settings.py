@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
@@ -62,13 +63,16 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files in production
+    'backend.middleware.PerformanceMiddleware',  # SQL count/time, N+1 detection, Server-Timing
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS - must be before CommonMiddleware
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'backend.profiling.ProfilingMiddleware',  # ?__profile=1 for superusers
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'audit.middleware.AuditMiddleware',  # One batched audit insert per request
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -102,6 +106,21 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/ref/settings/#caches
+# Shared Redis cache when REDIS_URL is set (needed with several workers, e.g.
+# for the unread notification counters); per-process memory otherwise
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -164,8 +183,9 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
-    # Page-number pagination for all list endpoints
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # Page-number pagination for all list endpoints; keyset (cursor) pages
+    # on request with ?cursor= or X-Pagination: cursor (see backend.pagination)
+    'DEFAULT_PAGINATION_CLASS': 'backend.pagination.HybridPagination',
     'PAGE_SIZE': 20,
     'PAGE_SIZE_QUERY_PARAM': 'page_size',
     'MAX_PAGE_SIZE': 200,
@@ -186,6 +206,113 @@ SIMPLE_JWT = {
 # Google OAuth client IDs (used for token verification)
 GOOGLE_CLIENT_ID_WEB = os.getenv('GOOGLE_CLIENT_ID_WEB', '')
 
+# Billing
+# Days between repeated overdue reminders for the same invoice (0 = notify once)
+OVERDUE_REMINDER_DAYS = int(os.getenv('OVERDUE_REMINDER_DAYS', '7'))
+
+# Rendered invoice PDF cache (local disk, LRU-evicted; 0 bytes disables it)
+INVOICE_PDF_CACHE_DIR = os.getenv('INVOICE_PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'home-easy-invoice-pdfs'))
+INVOICE_PDF_CACHE_MAX_BYTES = int(os.getenv('INVOICE_PDF_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+# Processes rendering PDFs for bulk ZIP exports (0 = one per CPU core)
+INVOICE_PDF_EXPORT_WORKERS = int(os.getenv('INVOICE_PDF_EXPORT_WORKERS', '0'))
+
+# Notifications
+# Delivery backend per outbox channel (see notifications.delivery)
+NOTIFICATION_BACKENDS = {
+    'email': os.getenv('NOTIFICATION_EMAIL_BACKEND', 'notifications.delivery.EmailBackend'),
+    'push': os.getenv('NOTIFICATION_PUSH_BACKEND', 'notifications.delivery.LocalPushBackend'),
+}
+# Delivery attempts before an email/push notification is given up
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', '5'))
+# First retry delay, doubled after every failed attempt
+NOTIFICATION_RETRY_BASE_SECONDS = int(os.getenv('NOTIFICATION_RETRY_BASE_SECONDS', '60'))
+# How long a dispatcher worker owns claimed rows before others may retry them
+NOTIFICATION_CLAIM_SECONDS = int(os.getenv('NOTIFICATION_CLAIM_SECONDS', '300'))
+# In-app events merged into one digest notification per user and window
+# (template -> window in seconds); other templates notify once per event
+NOTIFICATION_DIGEST_WINDOWS = {
+    'invoice.overdue': int(os.getenv('NOTIFICATION_DIGEST_OVERDUE_SECONDS', '86400')),
+    'meter_reading.submitted': int(os.getenv('NOTIFICATION_DIGEST_METER_READING_SECONDS', '3600')),
+    'payment.created': int(os.getenv('NOTIFICATION_DIGEST_PAYMENT_CREATED_SECONDS', '0')),
+}
+# Read notifications older than this are deleted by purge_notifications,
+# after being archived to monthly JSONL.gz files when an archive dir is set
+NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', '180'))
+NOTIFICATION_ARCHIVE_DIR = os.getenv('NOTIFICATION_ARCHIVE_DIR', '')
+# Lifetime of a cached unread counter; it is recounted from the database after expiry
+NOTIFICATION_UNREAD_CACHE_TIMEOUT = int(os.getenv('NOTIFICATION_UNREAD_CACHE_TIMEOUT', '300'))
+# Live event fan-out between processes (see notifications.events); the local
+# stand-in only reaches streams served by the publishing process
+NOTIFICATION_BROADCASTER = os.getenv(
+    'NOTIFICATION_BROADCASTER',
+    'notifications.events.RedisBroadcaster' if REDIS_URL else 'notifications.events.LocalBroadcaster',
+)
+# SSE stream: heartbeat interval, lifetime before the client must reconnect,
+# events buffered per slow client and missed events replayed on reconnect
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = int(os.getenv('NOTIFICATION_STREAM_HEARTBEAT_SECONDS', '15'))
+NOTIFICATION_STREAM_MAX_SECONDS = int(os.getenv('NOTIFICATION_STREAM_MAX_SECONDS', '600'))
+NOTIFICATION_STREAM_QUEUE_SIZE = int(os.getenv('NOTIFICATION_STREAM_QUEUE_SIZE', '100'))
+NOTIFICATION_STREAM_REPLAY_LIMIT = int(os.getenv('NOTIFICATION_STREAM_REPLAY_LIMIT', '100'))
+# Lifetime of the signed ticket accepted as ?ticket= by the stream (seconds)
+NOTIFICATION_STREAM_TICKET_SECONDS = int(os.getenv('NOTIFICATION_STREAM_TICKET_SECONDS', '30'))
+
+# Audit
+# Models whose creates, updates and deletes are logged (see audit.registry)
+AUDIT_MODELS = [
+    'properties.Property',
+    'properties.Room',
+    'tenancies.Tenancy',
+    'billing.Invoice',
+    'billing.InvoiceLine',
+    'payments.Payment',
+    'maintenance.MaintenanceRequest',
+    'metering.MeterReading',
+    'invites.Invite',
+]
+# Asynchronous audit sink: when set, requests queue audit entries to a local
+# write-ahead log that load_audit_wal bulk-inserts (see audit.wal)
+AUDIT_WAL_DIR = os.getenv('AUDIT_WAL_DIR', '')
+# Request batches waiting for the writer thread, and when a segment is handed to the loader
+AUDIT_WAL_QUEUE_SIZE = int(os.getenv('AUDIT_WAL_QUEUE_SIZE', '10000'))
+AUDIT_WAL_SEGMENT_BYTES = int(os.getenv('AUDIT_WAL_SEGMENT_BYTES', str(16 * 1024 * 1024)))
+AUDIT_WAL_SEGMENT_SECONDS = int(os.getenv('AUDIT_WAL_SEGMENT_SECONDS', '60'))
+# Months of audit logs kept in the database (monthly partitions on PostgreSQL);
+# archive_audit_logs exports older months to AUDIT_ARCHIVE_DIR and drops them
+AUDIT_RETENTION_MONTHS = int(os.getenv('AUDIT_RETENTION_MONTHS', '12'))
+AUDIT_ARCHIVE_DIR = os.getenv('AUDIT_ARCHIVE_DIR', '')
+# Days searched by the audit log screen when ?search= comes without a date range
+AUDIT_SEARCH_DAYS = int(os.getenv('AUDIT_SEARCH_DAYS', '31'))
+# Object timelines: a state checkpoint is stored every this many folded entries
+AUDIT_CHECKPOINT_INTERVAL = int(os.getenv('AUDIT_CHECKPOINT_INTERVAL', '50'))
+# ... but only at entries older than this (seconds): later inserts of older
+# entries (WAL, transaction commit) must not fall behind a checkpoint
+AUDIT_CHECKPOINT_DELAY_SECONDS = int(os.getenv('AUDIT_CHECKPOINT_DELAY_SECONDS', '600'))
+# Rows per transaction when a property or room is deleted in the background (see audit.cascade)
+AUDIT_CASCADE_CHUNK_SIZE = int(os.getenv('AUDIT_CASCADE_CHUNK_SIZE', '500'))
+
+# Performance monitoring (see backend.middleware)
+PERFORMANCE_SLOW_REQUEST_SECONDS = float(os.getenv('PERFORMANCE_SLOW_REQUEST_SECONDS', '1.0'))
+PERFORMANCE_VERY_SLOW_REQUEST_SECONDS = float(os.getenv('PERFORMANCE_VERY_SLOW_REQUEST_SECONDS', '3.0'))
+# Runs of the same query shape in one request logged as an N+1
+PERFORMANCE_N_PLUS_ONE_THRESHOLD = int(os.getenv('PERFORMANCE_N_PLUS_ONE_THRESHOLD', '10'))
+PERFORMANCE_SERVER_TIMING = os.getenv('PERFORMANCE_SERVER_TIMING', 'True') == 'True'
+# 'text' or 'json' (one object per line); every request is logged at DEBUG when enabled
+PERFORMANCE_LOG_FORMAT = os.getenv('PERFORMANCE_LOG_FORMAT', 'text')
+PERFORMANCE_LOG_ALL_REQUESTS = os.getenv('PERFORMANCE_LOG_ALL_REQUESTS', 'False') == 'True'
+
+# Metrics (see backend.metrics): GET /metrics with "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# Directory shared by the processes of one host (gunicorn workers, commands); empty: per process
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+
+# Request profiling for superusers (?__profile=1 or X-Profile: 1, see backend.profiling)
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'home-easy-profiles'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.005'))
+# Slowest SELECTs of a profiled request shown with their EXPLAIN plan
+PROFILE_EXPLAIN_QUERIES = int(os.getenv('PROFILE_EXPLAIN_QUERIES', '5'))
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # Next.js dev server
@@ -19,9 +19,16 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from rest_framework.routers import DefaultRouter
+
+from .views import ProfileViewSet, metrics
+
+router = DefaultRouter()
+router.register(r'profiles', ProfileViewSet, basename='profile')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='docs'),
     path('api/', include('identity.urls')),
@@ -36,6 +43,7 @@ urlpatterns = [
     path('api/', include('invites.urls')),
     path('api/', include('notifications.urls')),
     path('api/', include('audit.urls')),
+    path('api/', include(router.urls)),
 ]
 
 # Serve media files in development
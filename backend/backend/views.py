@@ -0,0 +1,74 @@
+"""
+Project-level views.
+"""
+import hmac
+import json
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from identity.permissions import IsSuperuser
+
+from .metrics import render_metrics
+from .profiling import PROFILE_FILES, list_profiles, profile_path
+
+
+@require_GET
+def metrics(request):
+    """
+    Prometheus text exposition of the application metrics (see backend.metrics).
+
+    Requires ``Authorization: Bearer <METRICS_TOKEN>``; without a token
+    configured the endpoint only exists in DEBUG.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        if not settings.DEBUG:
+            raise Http404
+    elif not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class ProfileViewSet(viewsets.ViewSet):
+    """
+    Request profiles recorded with ``?__profile=1`` (see backend.profiling), superusers only.
+
+    - GET /profiles/: stored profiles, newest first
+    - GET /profiles/<id>/: summary (timings, SQL with plans, top functions)
+    - GET /profiles/<id>/download/?file=pstats|collapsed|json
+    """
+    permission_classes = [IsSuperuser]
+    lookup_value_regex = "[0-9a-f]{32}"
+
+    def list(self, request):
+        return Response(list_profiles())
+
+    def retrieve(self, request, pk=None):
+        try:
+            with open(profile_path(pk, "json"), encoding="utf-8") as f:
+                return Response(json.load(f))
+        except FileNotFoundError:
+            return Response({"detail": "Không tìm thấy profile."}, status=status.HTTP_404_NOT_FOUND)
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        kind = request.query_params.get("file", "pstats")
+        if kind not in PROFILE_FILES:
+            return Response(
+                {"detail": "Loại tệp không hợp lệ. Chọn pstats, collapsed hoặc json."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            path = profile_path(pk, kind)
+            profile_file = open(path, "rb")
+        except FileNotFoundError:
+            return Response({"detail": "Không tìm thấy profile."}, status=status.HTTP_404_NOT_FOUND)
+        content_type, suffix = PROFILE_FILES[kind]
+        return FileResponse(
+            profile_file, as_attachment=True, filename=f"profile-{pk}{suffix}", content_type=content_type,
+        )
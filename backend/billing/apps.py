@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class BillingConfig(AppConfig):
     name = 'billing'
+
+    def ready(self):
+        """Register the bundled PDF fonts once per process and connect signals."""
+        import billing.signals  # noqa
+        from .pdf import register_fonts
+        register_fonts()
@@ -3,20 +3,38 @@ Management command to check for overdue invoices and send notifications.
 
 Usage:
     python manage.py check_overdue_invoices
+    python manage.py check_overdue_invoices --batch-size 1000 --workers 4
+    python manage.py check_overdue_invoices --reminder-days 3
 
 This command should be run daily (e.g., via cron) to check for invoices
 that are past their due date and notify tenants and landlords.
+
+Statuses are flipped to overdue with a single UPDATE, each flip audited as a
+status_change (written with one insert). Notifications are only
+sent for invoices that were never notified, or whose last reminder is older
+than the reminder cadence (settings.OVERDUE_REMINDER_DAYS), and are written
+with bulk_create in batches streamed from the database (or merged into one
+digest per user when settings.NOTIFICATION_DIGEST_WINDOWS includes them).
 """
 
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, timedelta
+
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Q
 from django.utils import timezone
-from datetime import date
 
+from audit.buffer import audit_context
+from audit.utils import log_action
+from backend.metrics import CommandMetricsMixin
 from billing.models import Invoice
-from notifications.services import notify_invoice_overdue
+from notifications.constants import INVOICE_OVERDUE
+from notifications.services import fan_out, invoice_notification_entries, invoice_notification_rows
 
 
-class Command(BaseCommand):
+class Command(CommandMetricsMixin, BaseCommand):
     help = 'Check for overdue invoices and send notifications'
 
     def add_arguments(self, parser):
@@ -25,73 +43,107 @@ class Command(BaseCommand):
             action='store_true',
             help='Run without actually sending notifications',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of invoices notified per bulk insert (default: 500)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of threads writing notification batches (default: 1)',
+        )
+        parser.add_argument(
+            '--reminder-days',
+            type=int,
+            default=None,
+            help='Days between repeated reminders, 0 to notify only once '
+                 '(default: settings.OVERDUE_REMINDER_DAYS)',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
+        batch_size = max(1, options['batch_size'])
+        workers = max(1, options['workers'])
+        reminder_days = options['reminder_days']
+        if reminder_days is None:
+            reminder_days = getattr(settings, 'OVERDUE_REMINDER_DAYS', 7)
+
         today = date.today()
-        
-        # Find invoices that are overdue
+        now = timezone.now()
+
         # Overdue = due_date < today AND status not in ['paid']
-        overdue_invoices = Invoice.objects.filter(
+        newly_overdue = Invoice.objects.filter(
             due_date__lt=today,
-            status__in=['pending', 'partial', 'overdue'],
-        ).select_related(
-            'tenancy__tenant',
-            'tenancy__room__building__owner',
+            status__in=['pending', 'partial'],
         )
-        
-        count = overdue_invoices.count()
-        
-        if count == 0:
-            self.stdout.write(
-                self.style.SUCCESS('No overdue invoices found.')
-            )
-            return
-        
-        self.stdout.write(
-            f'Found {count} overdue invoice(s).'
+
+        # Invoices never notified, or whose last reminder is due again
+        needs_notification = Q(overdue_notified_at__isnull=True)
+        if reminder_days > 0:
+            needs_notification |= Q(overdue_notified_at__lte=now - timedelta(days=reminder_days))
+        to_notify = Invoice.objects.filter(
+            needs_notification,
+            due_date__lt=today,
+            status__in=['pending', 'partial', 'overdue'],
         )
-        
+
         if dry_run:
             self.stdout.write(
                 self.style.WARNING('DRY RUN: Notifications will not be sent.')
             )
-            for invoice in overdue_invoices:
-                self.stdout.write(
-                    f'  - Invoice {invoice.id} for {invoice.tenancy.tenant.email} '
-                    f'(Period: {invoice.period}, Due: {invoice.due_date})'
-                )
+            self.stdout.write(f'{newly_overdue.count()} invoice(s) would be marked overdue.')
+            self.stdout.write(f'{to_notify.count()} invoice(s) would be notified.')
             return
-        
-        # Send notifications
+
+        # Flip statuses in one UPDATE ... WHERE due_date < today AND status IN (...);
+        # the rows are locked first so the audit names exactly the flipped invoices
+        with audit_context(), transaction.atomic():
+            flipped_invoices = list(newly_overdue.select_for_update().only('id', 'period', 'status'))
+            flipped = newly_overdue.update(status='overdue', updated_at=now)
+            for invoice in flipped_invoices:
+                invoice.status = 'overdue'
+                log_action(
+                    user=None,
+                    action_type='status_change',
+                    instance=invoice,
+                    changes=invoice.get_tracked_changes(['status']),
+                    object_repr=f'Hóa đơn {invoice.period}',
+                )
+        self.stdout.write(f'Marked {flipped} invoice(s) as overdue.')
+
+        # Recipients and payload fields only, no model instances
+        invoices = invoice_notification_rows(
+            to_notify.order_by('due_date', 'id')
+        ).iterator(chunk_size=batch_size)
+
         notified_count = 0
         error_count = 0
-        
-        for invoice in overdue_invoices:
-            try:
-                # Update status to overdue if not already
-                if invoice.status != 'overdue':
-                    invoice.status = 'overdue'
-                    invoice.save(update_fields=['status', 'updated_at'])
-                
-                # Send notifications
-                notify_invoice_overdue(invoice)
-                notified_count += 1
-                
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'✓ Notified for invoice {invoice.id} '
-                        f'(Period: {invoice.period})'
-                    )
-                )
-            except Exception as e:
-                error_count += 1
-                self.stdout.write(
-                    self.style.ERROR(
-                        f'✗ Error notifying for invoice {invoice.id}: {str(e)}'
-                    )
-                )
-        
+
+        if workers == 1:
+            for batch in self._batches(invoices, batch_size):
+                sent, failed = self._notify_batch(batch, now)
+                notified_count += sent
+                error_count += failed
+        else:
+            # Keep a bounded number of batches in flight so memory stays flat
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = set()
+                for batch in self._batches(invoices, batch_size):
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            sent, failed = future.result()
+                            notified_count += sent
+                            error_count += failed
+                    pending.add(executor.submit(self._notify_batch_in_thread, batch, now))
+                for future in pending:
+                    sent, failed = future.result()
+                    notified_count += sent
+                    error_count += failed
+
         # Summary
         self.stdout.write('')
         self.stdout.write(
@@ -99,3 +151,54 @@ class Command(BaseCommand):
                 f'Completed: {notified_count} notified, {error_count} errors'
             )
         )
+
+    @staticmethod
+    def _batches(iterable, size):
+        batch = []
+        for item in iterable:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _notify_batch(self, invoices, now):
+        """Bulk insert notifications for a batch and stamp the reminder marker."""
+        entries = []
+        invoice_ids = []
+        failed = 0
+        for row in invoices:
+            try:
+                entries.extend(
+                    invoice_notification_entries([row], INVOICE_OVERDUE, recipients=('tenant', 'landlord'))
+                )
+                invoice_ids.append(row['id'])
+            except Exception as e:
+                failed += 1
+                self.stderr.write(
+                    self.style.ERROR(
+                        f"✗ Error notifying for invoice {row['id']}: {str(e)}"
+                    )
+                )
+
+        try:
+            with transaction.atomic():
+                # Merged into per-user digests when overdue reminders are digested
+                fan_out(entries, batch_size=max(len(entries), 1))
+                Invoice.objects.filter(id__in=invoice_ids).update(overdue_notified_at=now)
+        except Exception as e:
+            self.stderr.write(
+                self.style.ERROR(f'✗ Error writing batch of {len(invoice_ids)} invoice(s): {str(e)}')
+            )
+            return 0, failed + len(invoice_ids)
+
+        self.stdout.write(f'  ✓ Notified batch of {len(invoice_ids)} invoice(s)')
+        return len(invoice_ids), failed
+
+    def _notify_batch_in_thread(self, invoices, now):
+        close_old_connections()
+        try:
+            return self._notify_batch(invoices, now)
+        finally:
+            connections.close_all()
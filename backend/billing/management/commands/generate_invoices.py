@@ -0,0 +1,101 @@
+"""
+Management command to generate monthly invoices in bulk.
+
+Usage:
+    python manage.py generate_invoices 2025-01
+    python manage.py generate_invoices 2025-01 --property <property_id>
+    python manage.py generate_invoices 2025-01 --owner landlord@example.com --issue
+
+Builds rent, electricity, water and recurring service lines for every active
+tenancy and writes all invoices and lines in one transaction.
+"""
+
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from audit.buffer import audit_context
+from backend.metrics import CommandMetricsMixin
+from billing.services import generate_invoices
+
+
+class Command(CommandMetricsMixin, BaseCommand):
+    help = 'Generate invoices for all active tenancies of a billing period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'period',
+            help='Billing period in YYYY-MM format',
+        )
+        parser.add_argument(
+            '--property',
+            action='append',
+            dest='properties',
+            help='Property id to bill (repeatable). Defaults to all properties',
+        )
+        parser.add_argument(
+            '--owner',
+            help='Only bill properties owned by this landlord (email)',
+        )
+        parser.add_argument(
+            '--due-date',
+            help='Due date for generated invoices (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--issue',
+            action='store_true',
+            help='Create invoices as pending (issued) instead of draft',
+        )
+        parser.add_argument(
+            '--overwrite',
+            action='store_true',
+            help='Rebuild lines of existing draft invoices for the period',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compute invoices without writing them',
+        )
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['owner']:
+            User = get_user_model()
+            try:
+                owner = User.objects.get(email=options['owner'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['owner']} does not exist")
+
+        due_date = None
+        if options['due_date']:
+            try:
+                due_date = date.fromisoformat(options['due_date'])
+            except ValueError:
+                raise CommandError(f"Invalid due date '{options['due_date']}', expected YYYY-MM-DD")
+
+        try:
+            with audit_context():
+                result = generate_invoices(
+                    period=options['period'],
+                    properties=options['properties'],
+                    owner=owner,
+                    due_date=due_date,
+                    issue=options['issue'],
+                    overwrite=options['overwrite'],
+                    dry_run=options['dry_run'],
+                )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING('DRY RUN: No invoices were written.')
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Period {result['period']}: {result['created']} created, "
+                f"{result['updated']} updated, {result['skipped']} skipped"
+            )
+        )
@@ -0,0 +1,59 @@
+"""
+Management command to repair the payment totals maintained on invoices.
+
+Usage:
+    python manage.py recompute_invoice_totals
+    python manage.py recompute_invoice_totals --invoice <invoice_id> --dry-run
+
+Recomputes total_paid, completed_payment_count, amount_due and status from
+completed payments with one grouped aggregate per batch and bulk_update.
+"""
+
+from django.core.management.base import BaseCommand
+
+from audit.buffer import audit_context
+from backend.metrics import CommandMetricsMixin
+from billing.services import recompute_invoice_totals
+
+
+class Command(CommandMetricsMixin, BaseCommand):
+    help = 'Recompute invoice payment totals and status from completed payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--invoice',
+            action='append',
+            dest='invoices',
+            help='Invoice id to repair (repeatable). Defaults to all invoices',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of invoices per batch (default: 500)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report invoices that would be repaired without writing',
+        )
+
+    def handle(self, *args, **options):
+        # Audit entries of the repaired invoices are written with one insert
+        with audit_context():
+            result = recompute_invoice_totals(
+                invoice_ids=options['invoices'],
+                batch_size=max(1, options['batch_size']),
+                dry_run=options['dry_run'],
+            )
+
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING('DRY RUN: No invoices were written.')
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Checked {result['checked']} invoice(s), repaired {result['repaired']}"
+            )
+        )
@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-16 22:36
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_payment_totals(apps, schema_editor):
+    """Populate total_paid/completed_payment_count from completed payments."""
+    Invoice = apps.get_model('billing', 'Invoice')
+    Payment = apps.get_model('payments', 'Payment')
+
+    totals = (
+        Payment.objects.filter(status='completed')
+        .values('invoice_id')
+        .annotate(total=Sum('amount'), count=Count('id'))
+    )
+    invoices = []
+    for row in totals.iterator():
+        invoices.append(Invoice(pk=row['invoice_id'], total_paid=row['total'], completed_payment_count=row['count']))
+        if len(invoices) >= 500:
+            Invoice.objects.bulk_update(invoices, ['total_paid', 'completed_payment_count'])
+            invoices = []
+    if invoices:
+        Invoice.objects.bulk_update(invoices, ['total_paid', 'completed_payment_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0006_invoice_overdue_notified_at'),
+        ('payments', '0002_payment_payments_pa_status_7ad4af_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='completed_payment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='total_paid',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_payment_totals, migrations.RunPython.noop),
+    ]
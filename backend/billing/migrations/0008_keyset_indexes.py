@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-16 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0007_invoice_payment_totals'),
+        ('tenancies', '0004_remove_tenancy_tenancies_room_status_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='invoice',
+            name='billing_inv_created_42771e_idx',
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['-created_at', '-id'], name='billing_inv_created_654716_idx'),
+        ),
+    ]
@@ -3,10 +3,11 @@ import uuid
 from django.db import models
 from django.utils import timezone
 
+from audit.tracking import ChangeTrackingMixin
 from tenancies.models import Tenancy
 
 
-class Invoice(models.Model):
+class Invoice(ChangeTrackingMixin, models.Model):
     STATUS_CHOICES = (
         ("draft", "Nháp"),
         ("pending", "Chờ thanh toán"),
@@ -20,10 +21,14 @@ class Invoice(models.Model):
     period = models.CharField(max_length=7)  # Format: YYYY-MM
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     amount_due = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Maintained from completed payments (see payments.models signals)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    completed_payment_count = models.PositiveIntegerField(default=0)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="draft")
     due_date = models.DateField(null=True, blank=True)
     issued_at = models.DateTimeField(null=True, blank=True)
     paid_at = models.DateTimeField(null=True, blank=True)
+    overdue_notified_at = models.DateTimeField(null=True, blank=True)  # Last overdue reminder sent
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
@@ -35,7 +40,7 @@ class Invoice(models.Model):
             models.Index(fields=["status"]),
             models.Index(fields=["period"]),
             models.Index(fields=["due_date"]),
-            models.Index(fields=["-created_at"]),
+            models.Index(fields=["-created_at", "-id"]),
         ]
 
     def __str__(self):
@@ -48,27 +53,20 @@ class Invoice(models.Model):
             return date.today() > self.due_date
         return False
 
-    def update_status_from_payments(self):
-        """Update invoice status and amount_due based on payments"""
-        from django.db.models import Sum
+    def apply_total_paid(self):
+        """Derive amount_due, status and paid_at from total_paid (does not save)"""
         from datetime import date
         
-        # Calculate total paid from completed payments
-        total_paid = self.payments.filter(status="completed").aggregate(
-            total=Sum("amount")
-        )["total"] or 0
-        
         # Update amount_due
-        self.amount_due = self.total_amount - total_paid
+        self.amount_due = self.total_amount - self.total_paid
         
         # Update status based on payment amount
-        if total_paid >= self.total_amount:
+        if self.total_paid >= self.total_amount:
             # Fully paid
             self.status = "paid"
             if not self.paid_at:
-                from django.utils import timezone
                 self.paid_at = timezone.now()
-        elif total_paid > 0:
+        elif self.total_paid > 0:
             # Partially paid
             self.status = "partial"
             self.paid_at = None
@@ -84,12 +82,9 @@ class Invoice(models.Model):
                 else:
                     self.status = "pending"
             self.paid_at = None
-        
-        # Save the invoice
-        self.save(update_fields=["amount_due", "status", "paid_at", "updated_at"])
 
 
-class InvoiceLine(models.Model):
+class InvoiceLine(ChangeTrackingMixin, models.Model):
     ITEM_CHOICES = (
         ("rent", "Tiền phòng"),
         ("deposit", "Tiền cọc"),
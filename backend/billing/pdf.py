@@ -0,0 +1,311 @@
+"""
+Invoice PDF rendering.
+
+Fonts are registered once per process (from ``BillingConfig.ready``) using the
+DejaVu Sans files bundled in ``billing/fonts``, so no filesystem probing or
+network download ever happens inside a request. Paragraph and table styles are
+built once and shared read-only between renders.
+
+Callers build a plain data snapshot with ``invoice_snapshot`` and pass it to
+``render_invoice_pdf`` to get PDF bytes back. The snapshot holds only
+builtins/Decimal/date values, so rendering needs no database access and can
+run in another process. ``snapshot_fingerprint`` hashes a snapshot to key
+cached renders (see ``billing.pdf_cache``).
+"""
+import hashlib
+import json
+import threading
+import time
+from io import BytesIO
+from pathlib import Path
+from types import MappingProxyType
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+FONT_DIR = Path(__file__).resolve().parent / "fonts"
+FONT_NAME = "Vietnamese"
+BOLD_FONT_NAME = "Vietnamese-Bold"
+FALLBACK_FONT_NAME = "Helvetica"
+
+# Bump when the layout changes so cached PDFs are re-rendered
+LAYOUT_VERSION = 1
+
+ITEM_TYPE_LABELS = MappingProxyType({
+    "rent": "Tiền phòng",
+    "electricity": "Tiền điện",
+    "water": "Tiền nước",
+    "internet": "Internet",
+    "cleaning": "Vệ sinh",
+    "service": "Dịch vụ khác",
+    "adjustment": "Điều chỉnh",
+    "deposit": "Tiền cọc",
+})
+
+_lock = threading.Lock()
+_templates = None
+
+
+def register_fonts():
+    """
+    Register the bundled Vietnamese fonts with ReportLab (idempotent).
+
+    Returns:
+        str: Font name to use, Helvetica if the bundled font cannot be loaded
+    """
+    return _get_templates()["font_name"]
+
+
+def _register_font_files():
+    try:
+        if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(FONT_NAME, str(FONT_DIR / "DejaVuSans.ttf")))
+        if BOLD_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(BOLD_FONT_NAME, str(FONT_DIR / "DejaVuSans-Bold.ttf")))
+        return FONT_NAME
+    except Exception:
+        # Fallback: Helvetica (does not support Vietnamese diacritics well)
+        return FALLBACK_FONT_NAME
+
+
+def _build_templates(font_name):
+    """Build the immutable paragraph and table styles used by every render"""
+    styles = getSampleStyleSheet()
+    info_style = TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), font_name),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#666666')),
+        ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#1a1a1a')),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ])
+    return MappingProxyType({
+        "font_name": font_name,
+        "title": ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontName=font_name,
+            fontSize=20,
+            textColor=colors.HexColor('#1a1a1a'),
+            spaceAfter=30,
+        ),
+        "heading": ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontName=font_name,
+            fontSize=14,
+            textColor=colors.HexColor('#1a1a1a'),
+            spaceAfter=12,
+        ),
+        "normal": ParagraphStyle(
+            'CustomNormal',
+            parent=styles['Normal'],
+            fontName=font_name,
+            fontSize=10,
+        ),
+        "info_table": info_style,
+        "lines_table": TableStyle([
+            # Header
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f0f0f0')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#1a1a1a')),
+            ('FONTNAME', (0, 0), (-1, 0), font_name),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            # Body
+            ('FONTNAME', (0, 1), (-1, -1), font_name),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#1a1a1a')),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e0e0e0')),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ]),
+        "summary_table": TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), font_name),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('FONTNAME', (1, 0), (1, -1), font_name),
+            ('FONTSIZE', (1, 0), (1, -1), 11),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#666666')),
+            ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#1a1a1a')),
+            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ]),
+    })
+
+
+def _get_templates():
+    global _templates
+    if _templates is None:
+        with _lock:
+            if _templates is None:
+                _templates = _build_templates(_register_font_files())
+    return _templates
+
+
+def invoice_snapshot(invoice):
+    """
+    Capture everything the PDF shows as plain data.
+
+    Expects ``tenancy__room__building``, ``tenancy__tenant`` and ``lines`` to be
+    loaded (as in ``InvoiceViewSet.get_queryset``) to avoid extra queries.
+    """
+    tenancy = invoice.tenancy
+    tenant = tenancy.tenant
+    room = tenancy.room
+    property_obj = room.building
+    return {
+        "id": str(invoice.id),
+        "period": invoice.period,
+        "created_at": invoice.created_at.date(),
+        "due_date": invoice.due_date,
+        "status_display": invoice.get_status_display(),
+        "tenant": {
+            "full_name": tenant.full_name,
+            "email": tenant.email,
+            "phone": tenant.phone,
+        },
+        "property": {
+            "name": property_obj.name,
+            "address": property_obj.address,
+        },
+        "room_number": room.room_number,
+        "lines": [
+            {
+                "item_type": line.item_type,
+                "quantity": line.quantity,
+                "unit_price": line.unit_price,
+                "amount": line.amount,
+            }
+            for line in invoice.lines.all()
+        ],
+        "total_amount": invoice.total_amount,
+        "total_paid": invoice.total_paid,
+        "amount_due": invoice.amount_due,
+        "notes": invoice.notes,
+        "updated_at": invoice.updated_at,
+    }
+
+
+def snapshot_fingerprint(snapshot):
+    """Stable hash of everything a render depends on (content plus layout version)"""
+    payload = json.dumps([LAYOUT_VERSION, snapshot], sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def invoice_pdf_filename(snapshot):
+    return f"Hoa-don-{snapshot['period']}-{snapshot['id'][:8]}.pdf"
+
+
+def render_invoice_pdf_timed(snapshot):
+    """``render_invoice_pdf`` plus its duration in seconds (measured where it runs)"""
+    start = time.perf_counter()
+    data = render_invoice_pdf(snapshot)
+    return data, time.perf_counter() - start
+
+
+def render_invoice_pdf(snapshot):
+    """
+    Render an invoice snapshot to PDF.
+
+    Args:
+        snapshot: Dict produced by ``invoice_snapshot``
+
+    Returns:
+        bytes: PDF document
+    """
+    templates = _get_templates()
+    col_label, col_value = 5*cm, 10*cm
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
+    story = []
+
+    # Title
+    story.append(Paragraph("HÓA ĐƠN THANH TOÁN", templates["title"]))
+    story.append(Spacer(1, 0.5*cm))
+
+    # Invoice Info
+    invoice_data = [
+        ["Kỳ thanh toán:", snapshot["period"]],
+        ["Mã hóa đơn:", snapshot["id"][:8].upper()],
+        ["Ngày tạo:", snapshot["created_at"].strftime("%d/%m/%Y")],
+    ]
+    if snapshot["due_date"]:
+        invoice_data.append(["Hạn thanh toán:", snapshot["due_date"].strftime("%d/%m/%Y")])
+    invoice_data.append(["Trạng thái:", snapshot["status_display"]])
+
+    invoice_table = Table(invoice_data, colWidths=[col_label, col_value])
+    invoice_table.setStyle(templates["info_table"])
+    story.append(invoice_table)
+    story.append(Spacer(1, 0.5*cm))
+
+    # Tenant Info
+    tenant = snapshot["tenant"]
+    property_info = snapshot["property"]
+    story.append(Paragraph("THÔNG TIN KHÁCH THUÊ", templates["heading"]))
+    tenant_data = [
+        ["Họ và tên:", tenant["full_name"]],
+        ["Email:", tenant["email"]],
+    ]
+    if tenant["phone"]:
+        tenant_data.append(["Số điện thoại:", tenant["phone"]])
+    tenant_data.extend([
+        ["Địa chỉ:", f"{property_info['name']} - Phòng {snapshot['room_number']}"],
+        ["", property_info["address"] or ""],
+    ])
+
+    tenant_table = Table(tenant_data, colWidths=[col_label, col_value])
+    tenant_table.setStyle(templates["info_table"])
+    story.append(tenant_table)
+    story.append(Spacer(1, 0.5*cm))
+
+    # Invoice Lines
+    story.append(Paragraph("CHI TIẾT HÓA ĐƠN", templates["heading"]))
+    lines_data = [["Khoản mục", "Số lượng", "Đơn giá", "Thành tiền"]]
+    for line in snapshot["lines"]:
+        lines_data.append([
+            ITEM_TYPE_LABELS.get(line["item_type"], line["item_type"]),
+            f"{line['quantity']:,.0f}",
+            f"{line['unit_price']:,.0f}đ",
+            f"{line['amount']:,.0f}đ",
+        ])
+
+    lines_table = Table(lines_data, colWidths=[7*cm, 3*cm, 3*cm, 2*cm])
+    lines_table.setStyle(templates["lines_table"])
+    story.append(lines_table)
+    story.append(Spacer(1, 0.3*cm))
+
+    # Summary
+    summary_data = [
+        ["Tổng cộng:", f"{snapshot['total_amount']:,.0f}đ"],
+    ]
+    if snapshot["total_paid"] > 0:
+        summary_data.append(["Đã thanh toán:", f"{snapshot['total_paid']:,.0f}đ"])
+    summary_data.append(["Còn lại:", f"{snapshot['amount_due']:,.0f}đ"])
+
+    summary_table = Table(summary_data, colWidths=[10*cm, 5*cm])
+    summary_table.setStyle(templates["summary_table"])
+    story.append(summary_table)
+
+    # Notes
+    if snapshot["notes"]:
+        story.append(Spacer(1, 0.5*cm))
+        story.append(Paragraph("Ghi chú:", templates["heading"]))
+        story.append(Paragraph(escape(snapshot["notes"]), templates["normal"]))
+
+    doc.build(story)
+    return buffer.getvalue()
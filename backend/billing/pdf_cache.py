@@ -0,0 +1,138 @@
+"""
+Content-addressed cache for rendered invoice PDFs.
+
+Files are stored on local disk as ``<shard>/<invoice_id>-<fingerprint>.pdf``,
+where the fingerprint hashes the invoice snapshot (see
+``billing.pdf.snapshot_fingerprint``). Any change to the invoice, its lines or
+its payment totals yields a new fingerprint, so stale renders are never
+served. Older renders of an invoice are removed when a new one is stored, and
+signals in ``billing.signals`` drop them as soon as the invoice changes.
+
+The cache directory is bounded by ``INVOICE_PDF_CACHE_MAX_BYTES`` with
+least-recently-used eviction (file mtime is bumped on every hit). Workers on
+the same host share the directory; writes are atomic renames.
+"""
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+from backend.metrics import count_cache_lookup
+
+logger = logging.getLogger('backend')
+
+
+class InvoicePDFCache:
+    """Size-bounded LRU cache of PDF files keyed by invoice id and fingerprint"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Bytes written since the last eviction scan
+        self._written = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _shard(self, invoice_id):
+        return self.directory / str(invoice_id)[:2]
+
+    def path_for(self, invoice_id, fingerprint):
+        return self._shard(invoice_id) / f"{invoice_id}-{fingerprint}.pdf"
+
+    def get(self, invoice_id, fingerprint):
+        """Return the cached file path, or None on a miss"""
+        if not self.enabled:
+            return None
+        path = self.path_for(invoice_id, fingerprint)
+        try:
+            # Mark as recently used for LRU eviction
+            os.utime(path)
+        except OSError:
+            count_cache_lookup("invoice_pdf", hit=False)
+            return None
+        count_cache_lookup("invoice_pdf", hit=True)
+        return path
+
+    def put(self, invoice_id, fingerprint, data):
+        """Store a render and drop older renders of the same invoice"""
+        if not self.enabled:
+            return None
+        path = self.path_for(invoice_id, fingerprint)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.warning(f'Could not write invoice PDF cache file {path}', exc_info=True)
+            return None
+
+        self.invalidate(invoice_id, keep=path)
+        with self._lock:
+            self._written += len(data)
+            # Scan the directory only after ~10% of the budget was written
+            should_evict = self._written >= self.max_bytes // 10
+            if should_evict:
+                self._written = 0
+        if should_evict:
+            self.evict()
+        return path
+
+    def invalidate(self, invoice_id, keep=None):
+        """Remove cached renders of an invoice (except ``keep``)"""
+        if not self.enabled:
+            return
+        for path in self._shard(invoice_id).glob(f"{invoice_id}-*.pdf"):
+            if path != keep:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def evict(self):
+        """Delete least recently used files until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for path in self.directory.glob("*/*.pdf"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+_cache = None
+
+
+def get_invoice_pdf_cache():
+    """Process-wide cache configured from settings"""
+    global _cache
+    if _cache is None:
+        _cache = InvoicePDFCache(
+            directory=getattr(
+                settings, 'INVOICE_PDF_CACHE_DIR',
+                os.path.join(tempfile.gettempdir(), 'home-easy-invoice-pdfs'),
+            ),
+            max_bytes=getattr(settings, 'INVOICE_PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024),
+        )
+    return _cache
@@ -0,0 +1,132 @@
+"""
+Streaming ZIP export of invoice PDFs.
+
+Invoices are read from the database in chunks, turned into plain snapshots
+and rendered in a process pool shared by the whole worker process
+(``INVOICE_PDF_EXPORT_WORKERS``, defaults to one process per core). Rendered
+PDFs are written into a ZIP archive that is yielded chunk by chunk as each
+render completes. At most a few renders per pool process are in flight, so
+memory stays flat no matter how many invoices are exported. Renders already
+in the PDF cache are reused and fresh renders are stored in it.
+"""
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.utils.text import get_valid_filename
+
+from backend.exports import ZipStreamSink
+from backend.metrics import invoice_pdf_render
+
+from .pdf import invoice_pdf_filename, invoice_snapshot, render_invoice_pdf_timed, snapshot_fingerprint
+from .pdf_cache import get_invoice_pdf_cache
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def render_workers():
+    return getattr(settings, 'INVOICE_PDF_EXPORT_WORKERS', 0) or os.cpu_count() or 1
+
+
+def get_render_pool():
+    """Process pool used for PDF rendering, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # billing.pdf has no Django dependency, so spawned workers start cheaply
+            _executor = ProcessPoolExecutor(
+                max_workers=render_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _reset_render_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _archive_name(snapshot, used_names):
+    name = get_valid_filename(f"{snapshot['room_number']}_{invoice_pdf_filename(snapshot)}")
+    if name in used_names:
+        name = f"{snapshot['id']}_{name}"
+    used_names.add(name)
+    return name
+
+
+def stream_invoice_pdf_zip(queryset, chunk_size=100):
+    """
+    Yield a ZIP archive containing one PDF per invoice of ``queryset``.
+
+    Args:
+        queryset: Invoice queryset (role scoping and filters already applied)
+        chunk_size: Invoices fetched from the database per round trip
+
+    Yields:
+        bytes: Consecutive chunks of the ZIP file
+    """
+    cache = get_invoice_pdf_cache()
+    pool = get_render_pool()
+    max_in_flight = render_workers() * 2
+    invoices = queryset.select_related(
+        "tenancy__room__building",
+        "tenancy__tenant",
+    ).prefetch_related("lines").iterator(chunk_size=chunk_size)
+
+    sink = ZipStreamSink()
+    used_names = set()
+    in_flight = {}
+
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+
+        def add(snapshot, data):
+            archive.writestr(_archive_name(snapshot, used_names), data)
+            return sink.drain()
+
+        def collect(done):
+            for future in done:
+                snapshot, fingerprint = in_flight.pop(future)
+                data, seconds = future.result()
+                invoice_pdf_render.observe(seconds)
+                cache.put(snapshot["id"], fingerprint, data)
+                yield add(snapshot, data)
+
+        try:
+            for invoice in invoices:
+                snapshot = invoice_snapshot(invoice)
+                fingerprint = snapshot_fingerprint(snapshot)
+                path = cache.get(snapshot["id"], fingerprint)
+                if path is not None:
+                    try:
+                        yield add(snapshot, path.read_bytes())
+                        continue
+                    except OSError:
+                        # Evicted between lookup and read: render it again
+                        pass
+
+                if len(in_flight) >= max_in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    yield from collect(done)
+                in_flight[pool.submit(render_invoice_pdf_timed, snapshot)] = (snapshot, fingerprint)
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                yield from collect(done)
+        except BrokenProcessPool:
+            _reset_render_pool()
+            raise
+        finally:
+            # Client disconnected or error: do not leave queued renders behind
+            for future in in_flight:
+                future.cancel()
+
+    # Central directory
+    yield sink.drain()
@@ -70,9 +70,8 @@ class InvoiceSerializer(serializers.ModelSerializer):
     # Expanded nested data for list/detail views
     tenancy_detail = TenancyNestedSerializer(source="tenancy", read_only=True)
     
-    # Computed fields
-    total_paid = serializers.SerializerMethodField()
-    payment_count = serializers.SerializerMethodField()
+    # Maintained from completed payments
+    payment_count = serializers.IntegerField(source="completed_payment_count", read_only=True)
 
     class Meta:
         model = Invoice
@@ -98,20 +97,6 @@ class InvoiceSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "created_at", "updated_at", "status_display", "is_overdue", "tenancy_detail", "total_paid", "payment_count"]
 
-    def get_total_paid(self, obj):
-        """Calculate total paid amount from payments"""
-        if hasattr(obj, "_prefetched_objects_cache") and "payments" in obj._prefetched_objects_cache:
-            return sum(p.amount for p in obj.payments.all() if p.status == "completed")
-        return obj.payments.filter(status="completed").aggregate(
-            total=serializers.models.Sum("amount")
-        )["total"] or 0
-
-    def get_payment_count(self, obj):
-        """Count completed payments"""
-        if hasattr(obj, "_prefetched_objects_cache") and "payments" in obj._prefetched_objects_cache:
-            return sum(1 for p in obj.payments.all() if p.status == "completed")
-        return obj.payments.filter(status="completed").count()
-
     def create(self, validated_data):
         lines_data = validated_data.pop("lines", [])
         
@@ -139,3 +124,12 @@ class InvoiceSerializer(serializers.ModelSerializer):
             InvoiceLine.objects.create(invoice=invoice, **line_data)
         return invoice
 
+
+class InvoiceGenerateSerializer(serializers.Serializer):
+    """Input for bulk invoice generation of one billing period"""
+    period = serializers.RegexField(r"^\d{4}-(0[1-9]|1[0-2])$", error_messages={"invalid": "Kỳ thanh toán phải có dạng YYYY-MM."})
+    property = serializers.UUIDField(required=False, allow_null=True)
+    due_date = serializers.DateField(required=False, allow_null=True)
+    issue = serializers.BooleanField(default=False)
+    overwrite = serializers.BooleanField(default=False)
+    dry_run = serializers.BooleanField(default=False)
@@ -0,0 +1,398 @@
+"""
+Billing services.
+
+Bulk invoice generation for a billing period. Everything an invoice needs
+(tenancies, meter readings, service prices, existing invoices) is loaded with
+a handful of set-based queries, lines are built in memory, and invoices plus
+lines are written with ``bulk_create`` inside a single transaction that
+first locks the tenancies, so concurrent runs for a period never collide.
+
+Also hosts the bulk recompute of the payment totals maintained on Invoice,
+and the per-transaction queue that coalesces those recomputes at commit.
+"""
+import calendar
+import logging
+import re
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from audit.utils import log_action
+from metering.models import MeterReading
+from notifications.constants import INVOICE_ISSUED
+from notifications.services import notify_invoices
+from pricing.models import ServicePrice
+from properties.models import Property
+from tenancies.models import Tenancy
+
+from .models import Invoice, InvoiceLine
+
+logger = logging.getLogger('backend')
+
+PERIOD_RE = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+# Recurring service prices are billed once per period with these item types
+SERVICE_ITEM_TYPES = {
+    "internet": "internet",
+    "cleaning": "cleaning",
+    "parking": "service",
+    "other": "service",
+}
+
+
+def parse_period(period):
+    """
+    Validate a ``YYYY-MM`` period string.
+
+    Returns:
+        tuple: (first_day, last_day) of the period as ``date`` objects
+
+    Raises:
+        ValueError: If the period is not a valid ``YYYY-MM`` string
+    """
+    if not period or not PERIOD_RE.match(period):
+        raise ValueError(f"Invalid period '{period}', expected YYYY-MM")
+    year, month = int(period[:4]), int(period[5:7])
+    last_day = calendar.monthrange(year, month)[1]
+    return date(year, month, 1), date(year, month, last_day)
+
+
+def _usage_line(item_type, usage, price, reading, old_field, new_field):
+    """Build a metered line (electricity/water) from a reading and its unit price."""
+    return {
+        "item_type": item_type,
+        "description": f"{price.get_display_name()} ({getattr(reading, old_field)} - {getattr(reading, new_field)} {price.unit})".strip(),
+        "quantity": usage,
+        "unit_price": price.unit_price,
+        "amount": usage * price.unit_price,
+        "meta": {
+            "reading_id": str(reading.id),
+            "old": str(getattr(reading, old_field)),
+            "new": str(getattr(reading, new_field)),
+        },
+    }
+
+
+def build_invoice_lines(tenancy, reading=None, prices=None):
+    """
+    Build invoice line dicts for one tenancy.
+
+    Args:
+        tenancy: Tenancy with ``room`` loaded
+        reading: MeterReading of the room for the period (optional)
+        prices: Dict of ``service_type -> ServicePrice`` for the room's property
+
+    Returns:
+        list: Line dicts with InvoiceLine field values
+    """
+    prices = prices or {}
+    lines = [{
+        "item_type": "rent",
+        "description": f"Phòng {tenancy.room.room_number}",
+        "quantity": Decimal("1"),
+        "unit_price": tenancy.base_rent,
+        "amount": tenancy.base_rent,
+        "meta": None,
+    }]
+
+    if reading is not None:
+        electricity_price = prices.get("electricity")
+        usage = reading.electricity_usage
+        if electricity_price and usage is not None and usage > 0:
+            lines.append(_usage_line("electricity", usage, electricity_price, reading, "electricity_old", "electricity_new"))
+
+        water_price = prices.get("water")
+        usage = reading.water_usage
+        if water_price and usage is not None and usage > 0:
+            lines.append(_usage_line("water", usage, water_price, reading, "water_old", "water_new"))
+
+    for service_type, price in prices.items():
+        if service_type not in SERVICE_ITEM_TYPES or not price.is_recurring:
+            continue
+        lines.append({
+            "item_type": SERVICE_ITEM_TYPES[service_type],
+            "description": price.get_display_name(),
+            "quantity": Decimal("1"),
+            "unit_price": price.unit_price,
+            "amount": price.unit_price,
+            "meta": {"service_price_id": str(price.id)},
+        })
+
+    return lines
+
+
+def generate_invoices(period, properties=None, owner=None, due_date=None, issue=False, overwrite=False, dry_run=False):
+    """
+    Generate invoices for every active tenancy of the given properties.
+
+    Existing invoices for ``(tenancy, period)`` are skipped, unless
+    ``overwrite`` is set and the invoice is still a draft, in which case its
+    lines and totals are rebuilt.
+
+    Args:
+        period: Billing period (YYYY-MM)
+        properties: Iterable of Property instances or ids (optional)
+        owner: Landlord whose properties are billed (optional)
+        due_date: Due date set on generated invoices (optional)
+        issue: Create invoices as ``pending`` with ``issued_at`` instead of ``draft``
+            and notify their tenants
+        overwrite: Rebuild existing draft invoices of the period
+        dry_run: Compute everything but write nothing
+
+    Returns:
+        dict: Counts of created/updated/skipped invoices and the affected invoice ids
+    """
+    period_start, period_end = parse_period(period)
+
+    property_qs = Property.objects.all()
+    if properties is not None:
+        property_qs = property_qs.filter(pk__in=[getattr(p, "pk", p) for p in properties])
+    if owner is not None:
+        property_qs = property_qs.filter(owner=owner)
+    property_ids = list(property_qs.values_list("pk", flat=True))
+
+    # Active tenancies overlapping the period
+    tenancies = list(
+        Tenancy.objects.filter(
+            room__building_id__in=property_ids,
+            status="active",
+            start_date__lte=period_end,
+        ).filter(
+            Q(end_date__isnull=True) | Q(end_date__gte=period_start)
+        ).select_related("room__building", "tenant")
+    )
+    result = {"period": period, "created": 0, "updated": 0, "skipped": 0, "invoice_ids": []}
+    if not tenancies:
+        return result
+
+    room_ids = {t.room_id for t in tenancies}
+    readings = {
+        r.room_id: r
+        for r in MeterReading.objects.filter(room_id__in=room_ids, period=period)
+    }
+    prices_by_property = {}
+    for price in ServicePrice.objects.filter(property_id__in=property_ids):
+        prices_by_property.setdefault(price.property_id, {})[price.service_type] = price
+
+    with transaction.atomic():
+        if not dry_run:
+            # Concurrent runs over the same tenancies queue here, so the later
+            # one sees the invoices of the earlier one as existing
+            list(
+                Tenancy.objects.select_for_update()
+                .filter(pk__in=[t.pk for t in tenancies])
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+        existing = {
+            inv.tenancy_id: inv
+            for inv in Invoice.objects.filter(tenancy__in=tenancies, period=period).only(
+                "id", "tenancy_id", "period", "status", "total_amount", "amount_due", "total_paid"
+            )
+        }
+
+        now = timezone.now()
+        new_invoices = []
+        rebuilt_invoices = []
+        lines_to_create = []
+
+        for tenancy in tenancies:
+            lines = build_invoice_lines(
+                tenancy,
+                reading=readings.get(tenancy.room_id),
+                prices=prices_by_property.get(tenancy.room.building_id),
+            )
+            total = sum((line["amount"] for line in lines), Decimal("0"))
+
+            invoice = existing.get(tenancy.id)
+            if invoice is not None:
+                if not overwrite or invoice.status != "draft":
+                    result["skipped"] += 1
+                    continue
+                invoice.total_amount = total
+                rebuilt_invoices.append(invoice)
+            else:
+                invoice = Invoice(
+                    tenancy=tenancy,
+                    period=period,
+                    total_amount=total,
+                    amount_due=total,
+                    status="pending" if issue else "draft",
+                    due_date=due_date,
+                    issued_at=now if issue else None,
+                    created_at=now,
+                )
+                new_invoices.append(invoice)
+
+            lines_to_create.extend(InvoiceLine(invoice=invoice, **line) for line in lines)
+
+        result["created"] = len(new_invoices)
+        result["updated"] = len(rebuilt_invoices)
+        result["invoice_ids"] = [str(inv.id) for inv in new_invoices + rebuilt_invoices]
+        if dry_run:
+            return result
+
+        if rebuilt_invoices:
+            rebuilt_ids = [inv.id for inv in rebuilt_invoices]
+            for invoice in rebuilt_invoices:
+                invoice.amount_due = invoice.total_amount - invoice.total_paid
+                invoice.updated_at = now
+            InvoiceLine.objects.filter(invoice_id__in=rebuilt_ids).delete()
+            Invoice.objects.bulk_update(rebuilt_invoices, ["total_amount", "amount_due", "updated_at"])
+        Invoice.objects.bulk_create(new_invoices)
+        InvoiceLine.objects.bulk_create(lines_to_create)
+        _audit_generated(new_invoices, rebuilt_invoices, lines_to_create)
+        if issue and new_invoices:
+            # One recipient query and bulk insert for the whole run
+            transaction.on_commit(
+                lambda: notify_invoices([inv.id for inv in new_invoices], INVOICE_ISSUED),
+                robust=True,
+            )
+
+    return result
+
+
+def _audit_generated(new_invoices, rebuilt_invoices, lines):
+    """Audit entries for bulk-written invoices and lines (bulk writes send no signals)"""
+    for invoice in new_invoices:
+        log_action(user=None, action_type="create", instance=invoice, changes=invoice.get_initial_changes())
+    for invoice in rebuilt_invoices:
+        log_action(
+            user=None,
+            action_type="update",
+            instance=invoice,
+            changes=invoice.get_tracked_changes(["total_amount", "amount_due"]),
+            object_repr=f"Hóa đơn {invoice.period}",
+        )
+        invoice.reset_tracked_changes(["total_amount", "amount_due"])
+    for line in lines:
+        log_action(user=None, action_type="create", instance=line, changes=line.get_initial_changes())
+
+
+def recompute_invoice_totals(invoice_ids=None, batch_size=500, dry_run=False):
+    """
+    Recompute ``total_paid``/``completed_payment_count`` and derived status in bulk.
+
+    Completed payment totals come from one grouped aggregate per batch and
+    changed invoices are written back with ``bulk_update``; their changes are
+    audited from the values they were loaded with. When
+    ``invoice_ids`` is given, each batch locks its invoice rows with
+    ``select_for_update`` so concurrent recomputes of the same invoice are
+    serialized and always aggregate the latest committed payments.
+
+    Args:
+        invoice_ids: Restrict to these invoices (optional, defaults to all)
+        batch_size: Invoices per aggregate/bulk_update round trip
+        dry_run: Compute changes without writing them
+
+    Returns:
+        dict: Number of invoices checked and repaired
+    """
+    from payments.models import Payment
+
+    queryset = Invoice.objects.only(
+        "id", "period", "total_amount", "amount_due", "total_paid", "completed_payment_count",
+        "status", "due_date", "paid_at",
+    ).order_by("pk")
+
+    fields = ["total_paid", "completed_payment_count", "amount_due", "status", "paid_at", "updated_at"]
+    result = {"checked": 0, "repaired": 0}
+
+    def flush(invoices):
+        totals = {
+            row["invoice_id"]: row
+            for row in Payment.objects.filter(invoice_id__in=[inv.id for inv in invoices], status="completed")
+            .values("invoice_id")
+            .annotate(total=Sum("amount"), count=Count("id"))
+        }
+        now = timezone.now()
+        changed = []
+        for invoice in invoices:
+            before = tuple(getattr(invoice, f) for f in fields[:-1])
+            row = totals.get(invoice.id)
+            invoice.total_paid = row["total"] if row else Decimal("0")
+            invoice.completed_payment_count = row["count"] if row else 0
+            invoice.apply_total_paid()
+            if tuple(getattr(invoice, f) for f in fields[:-1]) != before:
+                invoice.updated_at = now
+                changed.append(invoice)
+        if changed and not dry_run:
+            Invoice.objects.bulk_update(changed, fields)
+            # bulk_update sends no signals: audit the changes from the loaded values
+            for invoice in changed:
+                log_action(
+                    user=None,
+                    action_type="update",
+                    instance=invoice,
+                    changes=invoice.get_tracked_changes(fields),
+                    object_repr=f"Hóa đơn {invoice.period}",
+                )
+                invoice.reset_tracked_changes(fields)
+        result["checked"] += len(invoices)
+        result["repaired"] += len(changed)
+
+    if invoice_ids is not None:
+        invoice_ids = sorted(set(invoice_ids), key=str)
+        for i in range(0, len(invoice_ids), batch_size):
+            with transaction.atomic():
+                invoices = list(queryset.select_for_update().filter(pk__in=invoice_ids[i:i + batch_size]))
+                if invoices:
+                    flush(invoices)
+        return result
+
+    batch = []
+    for invoice in queryset.iterator(chunk_size=batch_size):
+        batch.append(invoice)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    return result
+
+
+class InvoiceRecompute:
+    """``on_commit`` callback recomputing the invoices queued in one transaction"""
+
+    def __init__(self):
+        self.invoice_ids = set()
+
+    def __call__(self):
+        try:
+            recompute_invoice_totals(invoice_ids=self.invoice_ids)
+        except Exception:
+            # The payments are committed: only the totals are stale until repaired
+            logger.exception(
+                f'Invoice recompute failed for {len(self.invoice_ids)} invoice(s), '
+                f'run "manage.py recompute_invoice_totals" to repair: '
+                f'{", ".join(str(pk) for pk in sorted(self.invoice_ids, key=str))}'
+            )
+
+
+def schedule_invoice_recompute(invoice_ids):
+    """
+    Queue invoices for a payment totals/status recompute when the current transaction commits.
+
+    All invoices marked dirty inside one transaction are recomputed together
+    by a single ``recompute_invoice_totals`` call from ``transaction.on_commit``,
+    so writing N payments costs one aggregate per batch of invoices instead
+    of one per payment. Outside a transaction the recompute runs immediately.
+    The queue lives in the transaction's own callback, so a rollback drops it;
+    a failing recompute is logged and never fails the committed payment.
+    """
+    invoice_ids = {i for i in invoice_ids if i is not None}
+    if not invoice_ids:
+        return
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        for _, callback, _ in connection.run_on_commit:
+            if isinstance(callback, InvoiceRecompute):
+                callback.invoice_ids.update(invoice_ids)
+                return
+    callback = InvoiceRecompute()
+    callback.invoice_ids.update(invoice_ids)
+    transaction.on_commit(callback, robust=True)
@@ -0,0 +1,30 @@
+"""
+Drop cached invoice PDFs as soon as anything they render changes.
+
+Cache keys are content fingerprints, so this is not needed for correctness;
+it frees disk space for stale renders without waiting for LRU eviction.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from audit.cascade import is_cascade_deleted
+
+from .models import Invoice, InvoiceLine
+from .pdf_cache import get_invoice_pdf_cache
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def invalidate_pdf_on_invoice_change(sender, instance, **kwargs):
+    get_invoice_pdf_cache().invalidate(instance.pk)
+
+
+@receiver(post_save, sender=InvoiceLine)
+@receiver(post_delete, sender=InvoiceLine)
+@receiver(post_save, sender='payments.Payment')
+@receiver(post_delete, sender='payments.Payment')
+def invalidate_pdf_on_related_change(sender, instance, **kwargs):
+    # Deleted with its invoice: the invoice's own receiver drops the PDF
+    if kwargs.get("signal") is post_delete and is_cascade_deleted(Invoice, instance.invoice_id):
+        return
+    get_invoice_pdf_cache().invalidate(instance.invoice_id)
@@ -81,3 +81,16 @@ class CanAccessWebPortal(permissions.BasePermission):
             return False
         return request.user.can_access_web()
 
+
+class IsSuperuser(permissions.BasePermission):
+    """
+    Only superusers (profiling and other diagnostics).
+    """
+    message = "Chỉ quản trị viên mới có quyền truy cập."
+
+    def has_permission(self, request, view):
+        return bool(
+            request.user
+            and request.user.is_authenticated
+            and request.user.is_superuser
+        )
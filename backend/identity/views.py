@@ -9,6 +9,8 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from backend.metrics import count_cache_lookup
+
 from .serializers import (
     RegisterSerializer,
     LandlordRegisterSerializer,
@@ -203,6 +205,7 @@ class BanksListView(APIView):
         # Cache for 1 hour
         cache_key = 'vietqr_banks_list'
         cached_data = cache.get(cache_key)
+        count_cache_lookup("vietqr_banks", hit=bool(cached_data))
         
         if cached_data:
             return Response(cached_data, status=status.HTTP_200_OK)
@@ -345,6 +348,7 @@ class QRCodeGenerateView(APIView):
         try:
             cache_key = 'vietqr_banks_list'
             banks_data = cache.get(cache_key)
+            count_cache_lookup("vietqr_banks", hit=bool(banks_data))
             if not banks_data:
                 response = requests.get('https://api.vietqr.io/v2/banks', timeout=5)
                 if response.status_code == 200:
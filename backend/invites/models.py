@@ -3,11 +3,12 @@ import uuid
 from django.db import models
 from django.utils import timezone
 
+from audit.tracking import ChangeTrackingMixin
 from properties.models import Property, Room
 from files.models import FileAsset
 
 
-class Invite(models.Model):
+class Invite(ChangeTrackingMixin, models.Model):
     STATUS_CHOICES = (
         ("pending", "Pending"),
         ("accepted", "Accepted"),
@@ -9,7 +9,6 @@ from notifications.services import (
     notify_invite_accepted,
     notify_invite_rejected,
 )
-from audit.utils import log_action, store_old_instance
 
 
 class InviteViewSet(viewsets.ModelViewSet):
@@ -67,21 +66,8 @@ class InviteViewSet(viewsets.ModelViewSet):
         return queryset.none()
 
     def perform_create(self, serializer):
-        """Create invite, log audit, and send notification."""
+        """Create invite and send notification."""
         invite = serializer.save()
-        invite._audit_user = self.request.user
-        invite._audit_request = self.request
-        
-        # Log audit
-        try:
-            log_action(
-                user=self.request.user,
-                action_type="create",
-                instance=invite,
-                request=self.request,
-            )
-        except Exception:
-            pass
         
         # Notify landlord when invite is sent
         try:
@@ -91,34 +77,18 @@ class InviteViewSet(viewsets.ModelViewSet):
             pass
 
     def perform_update(self, serializer):
-        """Update invite, log audit, and send notifications for status changes."""
+        """Update invite and send notifications for status changes."""
         from django.contrib.auth import get_user_model
         from django.utils import timezone
         from tenancies.models import Tenancy
         
         User = get_user_model()
-        old_instance = self.get_object()
-        old_status = old_instance.status
-        
-        # Store old instance for comparison
-        store_old_instance(old_instance)
+        # The instance as loaded by get_object(), before the update is applied
+        old_status = serializer.instance.status
         
         invite = serializer.save()
-        invite._audit_user = self.request.user
-        invite._audit_request = self.request
         new_status = invite.status
         
-        # Log audit
-        try:
-            log_action(
-                user=self.request.user,
-                action_type="update",
-                instance=invite,
-                request=self.request,
-            )
-        except Exception:
-            pass
-        
         # When invite is accepted, create tenancy and update room status
         if old_status != new_status and new_status == "accepted":
             # Prevent accepting already accepted/rejected invite
@@ -208,19 +178,5 @@ class InviteViewSet(viewsets.ModelViewSet):
                 pass
 
     def perform_destroy(self, instance):
-        """Delete invite and log audit."""
-        instance._audit_user = self.request.user
-        instance._audit_request = self.request
-        
-        # Log audit
-        try:
-            log_action(
-                user=self.request.user,
-                action_type="delete",
-                instance=instance,
-                request=self.request,
-            )
-        except Exception:
-            pass
-        
+        """Delete invite."""
         instance.delete()
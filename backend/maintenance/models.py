@@ -4,11 +4,12 @@ from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from audit.tracking import ChangeTrackingMixin
 from files.models import FileAsset
 from properties.models import Room
 
 
-class MaintenanceRequest(models.Model):
+class MaintenanceRequest(ChangeTrackingMixin, models.Model):
     CATEGORY_CHOICES = (
         ("electricity", "Điện"),
         ("plumbing", "Nước/Ống"),
@@ -8,7 +8,6 @@ from notifications.services import (
     notify_maintenance_assigned,
     notify_maintenance_status_changed,
 )
-from audit.utils import log_action, store_old_instance
 
 
 class MaintenanceRequestViewSet(viewsets.ModelViewSet):
@@ -71,21 +70,8 @@ class MaintenanceRequestViewSet(viewsets.ModelViewSet):
         return queryset.none()
 
     def perform_create(self, serializer):
-        """Create maintenance request, log audit, and send notification."""
+        """Create maintenance request and send notification."""
         maintenance_request = serializer.save(requester=self.request.user)
-        maintenance_request._audit_user = self.request.user
-        maintenance_request._audit_request = self.request
-        
-        # Log audit
-        try:
-            log_action(
-                user=self.request.user,
-                action_type="create",
-                instance=maintenance_request,
-                request=self.request,
-            )
-        except Exception:
-            pass
         
         # Notify landlord when maintenance request is created
         try:
@@ -95,33 +81,17 @@ class MaintenanceRequestViewSet(viewsets.ModelViewSet):
             pass
 
     def perform_update(self, serializer):
-        """Update maintenance request, log audit, and send notifications for changes."""
-        old_instance = self.get_object()
-        old_status = old_instance.status
-        old_assignee = old_instance.assignee
-        
-        # Store old instance for comparison
-        store_old_instance(old_instance)
+        """Update maintenance request and send notifications for changes."""
+        # The instance as loaded by get_object(), before the update is applied
+        old_status = serializer.instance.status
+        old_assignee_id = serializer.instance.assignee_id
         
         maintenance_request = serializer.save()
-        maintenance_request._audit_user = self.request.user
-        maintenance_request._audit_request = self.request
         new_status = maintenance_request.status
-        new_assignee = maintenance_request.assignee
-        
-        # Log audit
-        try:
-            log_action(
-                user=self.request.user,
-                action_type="update",
-                instance=maintenance_request,
-                request=self.request,
-            )
-        except Exception:
-            pass
+        new_assignee_id = maintenance_request.assignee_id
         
         # Notify when assignee is assigned
-        if old_assignee != new_assignee and new_assignee is not None:
+        if old_assignee_id != new_assignee_id and new_assignee_id is not None:
             try:
                 notify_maintenance_assigned(maintenance_request)
             except Exception:
@@ -135,21 +105,7 @@ class MaintenanceRequestViewSet(viewsets.ModelViewSet):
                 pass
 
     def perform_destroy(self, instance):
-        """Delete maintenance request and log audit."""
-        instance._audit_user = self.request.user
-        instance._audit_request = self.request
-        
-        # Log audit
-        try:
-            log_action(
-                user=self.request.user,
-                action_type="delete",
-                instance=instance,
-                request=self.request,
-            )
-        except Exception:
-            pass
-        
+        """Delete maintenance request."""
         instance.delete()
 
 
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-16 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0002_alter_fileasset_options_remove_fileasset_path_and_more'),
+        ('metering', '0004_remove_meterreading_metering_room_period_idx_and_more'),
+        ('properties', '0002_room_properties__status_2b3c4f_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='meterreading',
+            name='metering_me_created_1647b1_idx',
+        ),
+        migrations.AddIndex(
+            model_name='meterreading',
+            index=models.Index(fields=['-created_at', '-id'], name='metering_me_created_aedee2_idx'),
+        ),
+    ]
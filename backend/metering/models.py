@@ -3,11 +3,12 @@ import uuid
 from django.db import models
 from django.utils import timezone
 
+from audit.tracking import ChangeTrackingMixin
 from files.models import FileAsset
 from properties.models import Room
 
 
-class MeterReading(models.Model):
+class MeterReading(ChangeTrackingMixin, models.Model):
     SOURCE_CHOICES = (
         ("manual", "Nhập tay"),
         ("ocr", "OCR"),
@@ -38,7 +39,7 @@ class MeterReading(models.Model):
         indexes = [
             models.Index(fields=["period"]),
             models.Index(fields=["source"]),
-            models.Index(fields=["-created_at"]),
+            models.Index(fields=["-created_at", "-id"]),
         ]
 
     def __str__(self):
@@ -1,13 +1,13 @@
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, permissions, viewsets
+from backend.mixins import ExportMixin
 
 from .models import MeterReading
 from .serializers import MeterReadingSerializer
 from notifications.services import notify_meter_reading_submitted
-from audit.utils import log_action, store_old_instance
 
 
-class MeterReadingViewSet(viewsets.ModelViewSet):
+class MeterReadingViewSet(ExportMixin, viewsets.ModelViewSet):
     """
     Meter Reading ViewSet with optimized queries and user-based filtering.
     
@@ -16,6 +16,8 @@ class MeterReadingViewSet(viewsets.ModelViewSet):
     - ?room__building=<property_id>
     - ?period=2024-01
     - ?source=manual,ocr
+
+    Export: GET /meter-readings/export/?file_format=csv|xlsx (same filters)
     
     Automatic filtering by user role:
     - Tenants: Only see readings for rooms in their active tenancies
@@ -32,6 +34,20 @@ class MeterReadingViewSet(viewsets.ModelViewSet):
     }
     search_fields = ["room__room_number", "period"]
     ordering_fields = ["created_at", "period"]
+    export_filename = "chi-so-dien-nuoc"
+    export_fields = [
+        ("Mã", "id"),
+        ("Kỳ", "period"),
+        ("Tòa nhà", "room__building__name"),
+        ("Phòng", "room__room_number"),
+        ("Điện cũ", "electricity_old"),
+        ("Điện mới", "electricity_new"),
+        ("Nước cũ", "water_old"),
+        ("Nước mới", "water_new"),
+        ("Nguồn", "source"),
+        ("Ghi chú", "notes"),
+        ("Ngày tạo", "created_at"),
+    ]
 
     def get_queryset(self):
         """
@@ -66,21 +82,8 @@ class MeterReadingViewSet(viewsets.ModelViewSet):
         return queryset.none()
 
     def perform_create(self, serializer):
-        """Create meter reading, log audit, and send notification."""
+        """Create meter reading and send notification."""
         meter_reading = serializer.save()
-        meter_reading._audit_user = self.request.user
-        meter_reading._audit_request = self.request
-        
-        # Log audit
-        try:
-            log_action(
-                user=self.request.user,
-                action_type="create",
-                instance=meter_reading,
-                request=self.request,
-            )
-        except Exception:
-            pass
         
         # Notify tenant when meter reading is submitted
         try:
@@ -89,40 +92,6 @@ class MeterReadingViewSet(viewsets.ModelViewSet):
             # Don't fail reading creation if notification fails
             pass
 
-    def perform_update(self, serializer):
-        """Update meter reading and log audit."""
-        old_instance = self.get_object()
-        store_old_instance(old_instance)
-        
-        meter_reading = serializer.save()
-        meter_reading._audit_user = self.request.user
-        meter_reading._audit_request = self.request
-        
-        # Log audit
-        try:
-            log_action(
-                user=self.request.user,
-                action_type="update",
-                instance=meter_reading,
-                request=self.request,
-            )
-        except Exception:
-            pass
-
     def perform_destroy(self, instance):
-        """Delete meter reading and log audit."""
-        instance._audit_user = self.request.user
-        instance._audit_request = self.request
-        
-        # Log audit
-        try:
-            log_action(
-                user=self.request.user,
-                action_type="delete",
-                instance=instance,
-                request=self.request,
-            )
-        except Exception:
-            pass
-        
+        """Delete meter reading."""
         instance.delete()
@@ -30,6 +30,12 @@ METER_READING_SUBMITTED = "meter_reading.submitted"
 # Tenancy notifications
 TENANCY_CREATED = "tenancy.created"
 
+# Landlord announcements to tenants
+ANNOUNCEMENT = "announcement"
+
+# Several events of one template merged per user (payload["template"])
+DIGEST = "digest"
+
 # All notification templates
 NOTIFICATION_TEMPLATES = [
     INVOICE_CREATED,
@@ -47,6 +53,8 @@ NOTIFICATION_TEMPLATES = [
     INVITE_REJECTED,
     METER_READING_SUBMITTED,
     TENANCY_CREATED,
+    ANNOUNCEMENT,
+    DIGEST,
 ]
 
 # Priority mapping for different notification types
@@ -66,4 +74,6 @@ TEMPLATE_PRIORITY = {
     INVITE_REJECTED: "normal",
     METER_READING_SUBMITTED: "low",
     TENANCY_CREATED: "normal",
+    ANNOUNCEMENT: "normal",
+    DIGEST: "normal",  # Digests take the priority of the merged template
 }
@@ -0,0 +1,83 @@
+"""
+Per-user unread notification counters kept in the Django cache.
+
+``unread_count`` is the most polled endpoint (every open tab polls it), so it
+reads a cached counter instead of running ``COUNT(*)``. Writes go through:
+creating notifications increments the counter and marking them read/unread
+adjusts it, always after the transaction commits. A missing counter is
+recounted from the database and stored with a short timeout
+(``NOTIFICATION_UNREAD_CACHE_TIMEOUT``), so a counter that drifted (lost
+update, cache restart, raw SQL) heals itself on the next expiry. Changes that
+are hard to track as a delta simply drop the counter. Every change is also
+published to the live notification streams (see notifications.events).
+
+Use a shared cache backend (``REDIS_URL``) when running several workers,
+otherwise each process keeps its own counters.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from backend.metrics import count_cache_lookup
+
+from .events import publish_unread_changed
+
+
+def _key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def get_unread_count(user_id):
+    """Unread notifications of a user, recounted from the database on a cache miss"""
+    count = cache.get(_key(user_id))
+    count_cache_lookup("notification_unread", hit=count is not None)
+    if count is None:
+        from .models import Notification
+
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        # add() keeps a value another request stored meanwhile
+        cache.add(_key(user_id), count, getattr(settings, 'NOTIFICATION_UNREAD_CACHE_TIMEOUT', 300))
+    return count
+
+
+def _apply(deltas):
+    try:
+        _apply_deltas(deltas)
+    finally:
+        publish_unread_changed(deltas)
+
+
+def _apply_deltas(deltas):
+    for user_id, delta in deltas.items():
+        key = _key(user_id)
+        try:
+            value = cache.incr(key, delta)
+        except ValueError:
+            # Not cached: the next read recounts from the database
+            continue
+        if value < 0:
+            cache.delete(key)
+
+
+def adjust_unread_counts(deltas):
+    """
+    Add ``{user_id: delta}`` to the cached counters once the current transaction commits.
+
+    Counters that are not cached are left alone.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if deltas:
+        transaction.on_commit(lambda: _apply(deltas), robust=True)
+
+
+def invalidate_unread_counts(user_ids):
+    """Drop cached counters so they are recounted on the next read"""
+    user_ids = set(user_ids)
+    keys = [_key(user_id) for user_id in user_ids]
+    if keys:
+
+        def drop():
+            cache.delete_many(keys)
+            publish_unread_changed(user_ids)
+
+        transaction.on_commit(drop, robust=True)
@@ -0,0 +1,162 @@
+"""
+Delivery backends for email and push notifications.
+
+A backend is opened once per dispatched batch, so the SMTP backend reuses a
+single connection for every message of the batch. ``send`` returns the error
+message of every notification that could not be delivered; everything else
+counts as sent. Backends are configured per channel with the
+``NOTIFICATION_BACKENDS`` setting.
+"""
+import logging
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils.module_loading import import_string
+
+from .constants import (
+    ANNOUNCEMENT,
+    DIGEST,
+    INVITE_ACCEPTED,
+    INVITE_RECEIVED,
+    INVITE_REJECTED,
+    INVITE_SENT,
+    INVOICE_CREATED,
+    INVOICE_ISSUED,
+    INVOICE_OVERDUE,
+    MAINTENANCE_ASSIGNED,
+    MAINTENANCE_CREATED,
+    MAINTENANCE_STATUS_CHANGED,
+    METER_READING_SUBMITTED,
+    PAYMENT_CREATED,
+    PAYMENT_FAILED,
+    PAYMENT_RECEIVED,
+    TENANCY_CREATED,
+)
+
+logger = logging.getLogger('backend')
+
+DEFAULT_BACKENDS = {
+    "email": "notifications.delivery.EmailBackend",
+    "push": "notifications.delivery.LocalPushBackend",
+}
+
+# Title and body per template, formatted with the notification payload
+TEMPLATE_MESSAGES = {
+    INVOICE_CREATED: ("Hóa đơn mới", "Hóa đơn mới cho phòng {room_number} kỳ {period}: {amount}đ"),
+    INVOICE_ISSUED: ("Hóa đơn đã phát hành", "Hóa đơn {period} đã được phát hành: {amount}đ, hạn thanh toán {due_date}"),
+    INVOICE_OVERDUE: ("Hóa đơn quá hạn", "Hóa đơn {period} phòng {room_number} đã quá hạn, còn lại {amount}đ"),
+    PAYMENT_CREATED: ("Thanh toán mới", "{tenant_name} đã thanh toán {amount}đ cho phòng {room_number} kỳ {period}"),
+    PAYMENT_RECEIVED: ("Đã nhận thanh toán", "Đã nhận thanh toán {amount}đ từ {tenant_name} phòng {room_number} kỳ {period}"),
+    PAYMENT_FAILED: ("Thanh toán thất bại", "Thanh toán {amount} VNĐ thất bại"),
+    MAINTENANCE_CREATED: ("Yêu cầu bảo trì mới", "Yêu cầu bảo trì mới: {title}"),
+    MAINTENANCE_ASSIGNED: ("Bảo trì đã phân công", "Bảo trì đã được phân công: {title}"),
+    MAINTENANCE_STATUS_CHANGED: ("Trạng thái bảo trì thay đổi", "Trạng thái bảo trì đã thay đổi: {title}"),
+    INVITE_SENT: ("Đã gửi lời mời", "Đã gửi lời mời đến {email}"),
+    INVITE_RECEIVED: ("Lời mời mới", "Bạn đã nhận được lời mời thuê phòng {room_number} tại {property_name}"),
+    INVITE_ACCEPTED: ("Lời mời đã chấp nhận", "Lời mời đã được chấp nhận bởi {email}"),
+    INVITE_REJECTED: ("Lời mời đã bị từ chối", "Lời mời đã bị từ chối bởi {email}"),
+    METER_READING_SUBMITTED: ("Đã gửi chỉ số", "Chỉ số điện nước phòng {room_number} kỳ {period} đã được ghi nhận"),
+    TENANCY_CREATED: ("Hợp đồng mới", "Hợp đồng thuê mới cho phòng {room_number}"),
+    ANNOUNCEMENT: ("{title}", "{message}"),
+    DIGEST: ("Tổng hợp thông báo", "Bạn có {count} thông báo mới"),
+}
+
+
+def render_message(notification):
+    """
+    Render a notification as ``(title, body)`` text.
+
+    Missing payload keys render as empty strings.
+    """
+    payload = defaultdict(str, {k: "" if v is None else v for k, v in (notification.payload or {}).items()})
+    title, body = TEMPLATE_MESSAGES.get(notification.template, (notification.template, ""))
+    return title.format_map(payload), body.format_map(payload)
+
+
+class BaseBackend:
+    """Deliver a batch of notifications of one channel"""
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, notifications):
+        """
+        Deliver notifications (with ``user`` loaded).
+
+        Returns:
+            dict: ``notification id -> error message`` for failed deliveries
+        """
+        raise NotImplementedError
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class EmailBackend(BaseBackend):
+    """Send email through Django's configured email backend over one connection per batch"""
+
+    def __init__(self):
+        self.connection = None
+
+    def open(self):
+        self.connection = get_connection(fail_silently=False)
+        self.connection.open()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def send(self, notifications):
+        errors = {}
+        for notification in notifications:
+            if not notification.user.email:
+                errors[notification.pk] = "User has no email address"
+                continue
+            title, body = render_message(notification)
+            message = EmailMessage(
+                subject=title,
+                body=body,
+                to=[notification.user.email],
+                connection=self.connection,
+            )
+            try:
+                message.send()
+            except Exception as e:
+                errors[notification.pk] = str(e) or e.__class__.__name__
+        return errors
+
+
+# Messages "pushed" by LocalPushBackend in this process (newest last, oldest dropped)
+PUSH_OUTBOX_SIZE = 1000
+push_outbox = deque(maxlen=PUSH_OUTBOX_SIZE)
+
+
+class LocalPushBackend(BaseBackend):
+    """
+    Local stand-in for a push provider.
+
+    Records the latest messages in ``push_outbox`` and logs them, so the full dispatch
+    pipeline can run without push credentials.
+    """
+
+    def send(self, notifications):
+        for notification in notifications:
+            title, body = render_message(notification)
+            push_outbox.append({"user_id": notification.user_id, "title": title, "body": body})
+            logger.info(f'Push to user {notification.user_id}: {title} - {body}')
+        return {}
+
+
+def get_backend(channel):
+    """Instantiate the backend configured for a channel"""
+    backends = {**DEFAULT_BACKENDS, **getattr(settings, 'NOTIFICATION_BACKENDS', {})}
+    return import_string(backends[channel])()
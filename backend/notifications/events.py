@@ -0,0 +1,407 @@
+"""
+Live notification events, streamed to clients as server-sent events.
+
+After a transaction commits, new notifications and unread-count changes are
+handed to the configured broadcaster (``NOTIFICATION_BROADCASTER``), which
+delivers them to the ``hub`` of every ASGI process. The hub forwards each
+message to the streams the target user has open in that process.
+
+- ``LocalBroadcaster``: in-process stand-in, enough for a single ASGI process
+  (events published by other processes, e.g. management commands, are not seen)
+- ``RedisBroadcaster``: Redis pub/sub (``REDIS_URL``) across all processes
+
+Each stream has a bounded queue. When a slow client lets it fill up, the
+backlog is dropped and the stream catches up from the database instead, the
+same way a reconnect with ``Last-Event-ID`` does, so memory stays bounded
+without losing events. Event ids are ``<created_at in microseconds>-<id>``,
+matching the replay order.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('backend')
+
+NOTIFICATION_EVENT = "notification"
+UNREAD_EVENT = "unread"
+RESYNC_EVENT = "resync"
+
+# Client reconnect delay sent in the stream
+RETRY_MILLISECONDS = 3000
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def format_event_id(cursor):
+    """SSE event id of a ``(created_at, id)`` cursor"""
+    created_at, pk = cursor
+    return f"{(created_at - EPOCH) // timedelta(microseconds=1)}-{pk}"
+
+
+def event_id(notification):
+    """SSE event id of a notification"""
+    return format_event_id((notification.created_at, notification.id))
+
+
+def parse_event_id(value):
+    """
+    Parse an SSE event id into a ``(created_at, id)`` cursor.
+
+    Returns:
+        tuple or None if the value is missing or malformed
+    """
+    try:
+        micros, pk = (value or "").split("-", 1)
+        return EPOCH + timedelta(microseconds=int(micros)), uuid.UUID(pk)
+    except ValueError:
+        return None
+
+
+class Subscription:
+    """One open stream: a bounded queue fed from any thread"""
+
+    def __init__(self, user_id, max_size):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_size)
+        self.overflowed = False
+
+    def deliver(self, message):
+        """Queue a message (thread-safe)"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # Event loop already closed: the stream is gone
+            pass
+
+    def resync(self):
+        """Make the stream catch up from the database (thread-safe)"""
+        try:
+            self.loop.call_soon_threadsafe(self._overflow)
+        except RuntimeError:
+            pass
+
+    def _put(self, message):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self._overflow()
+
+    def _overflow(self):
+        # Drop the backlog and wake the stream with an empty marker
+        self.overflowed = True
+        self.drain()
+        self.queue.put_nowait(None)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def drain(self):
+        """Pop every queued message without waiting"""
+        messages = []
+        while not self.queue.empty():
+            messages.append(self.queue.get_nowait())
+        return messages
+
+
+class Hub:
+    """Open streams of this process, by user"""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(str(user_id), _setting('NOTIFICATION_STREAM_QUEUE_SIZE', 100))
+        with self._lock:
+            self._subscriptions[subscription.user_id].add(subscription)
+        get_broadcaster().start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def subscribed(self, user_ids):
+        """The given users that have a stream open in this process"""
+        with self._lock:
+            return {str(user_id) for user_id in user_ids} & self._subscriptions.keys()
+
+    def dispatch(self, message):
+        """Forward a message to the streams of its user (thread-safe)"""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(message["user_id"], ()))
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+    def resync_all(self):
+        """Make every stream catch up from the database (after missed messages)"""
+        with self._lock:
+            subscriptions = [s for group in self._subscriptions.values() for s in group]
+        for subscription in subscriptions:
+            subscription.resync()
+
+
+hub = Hub()
+
+
+class LocalBroadcaster:
+    """In-process stand-in: messages only reach streams of the publishing process"""
+
+    def start(self):
+        pass
+
+    def audience(self, user_ids):
+        # Skip building messages nobody here listens to
+        return hub.subscribed(user_ids)
+
+    def publish(self, messages):
+        for message in messages:
+            hub.dispatch(message)
+
+
+class RedisBroadcaster:
+    """Redis pub/sub: every process publishes to and listens on one channel"""
+
+    channel = "notifications:events"
+
+    def __init__(self):
+        import redis
+
+        self.client = redis.Redis.from_url(settings.REDIS_URL)
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="notification-events", daemon=True)
+                self._listener.start()
+
+    def audience(self, user_ids):
+        return {str(user_id) for user_id in user_ids}
+
+    def publish(self, messages):
+        pipeline = self.client.pipeline(transaction=False)
+        for message in messages:
+            pipeline.publish(self.channel, json.dumps(message, cls=DjangoJSONEncoder))
+        pipeline.execute()
+
+    def _listen(self):
+        reconnect = False
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                if reconnect:
+                    # Messages published while disconnected are lost
+                    hub.resync_all()
+                for item in pubsub.listen():
+                    hub.dispatch(json.loads(item["data"]))
+            except Exception as e:
+                logger.warning(f'Notification event listener disconnected: {e}')
+                reconnect = True
+                time.sleep(1)
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster():
+    """Broadcaster configured by ``NOTIFICATION_BROADCASTER``, created on first use"""
+    global _broadcaster
+    with _broadcaster_lock:
+        if _broadcaster is None:
+            path = _setting('NOTIFICATION_BROADCASTER', 'notifications.events.LocalBroadcaster')
+            _broadcaster = import_string(path)()
+        return _broadcaster
+
+
+def publish(messages):
+    if not messages:
+        return
+    try:
+        get_broadcaster().publish(messages)
+    except Exception as e:
+        # Live events are best effort: clients catch up on reconnect
+        logger.warning(f'Could not publish notification events: {e}')
+
+
+def _notification_message(notification):
+    from .serializers import NotificationSerializer
+
+    return {
+        "user_id": str(notification.user_id),
+        "event": NOTIFICATION_EVENT,
+        "id": event_id(notification),
+        "data": NotificationSerializer(notification).data,
+    }
+
+
+def publish_notifications(notifications):
+    """Publish new notifications once the current transaction commits"""
+    if not notifications:
+        return
+
+    def send():
+        audience = get_broadcaster().audience({n.user_id for n in notifications})
+        publish([_notification_message(n) for n in notifications if str(n.user_id) in audience])
+
+    transaction.on_commit(send, robust=True)
+
+
+def publish_unread_changed(user_ids):
+    """Tell the streams of these users to send their new unread count"""
+    audience = get_broadcaster().audience(user_ids)
+    publish([{"user_id": user_id, "event": UNREAD_EVENT} for user_id in audience])
+
+
+# Streaming
+def _sse(event, data=None, message_id=None):
+    lines = [f"event: {event}"]
+    if message_id is not None:
+        lines.append(f"id: {message_id}")
+    lines.append(f"data: {json.dumps(data, cls=DjangoJSONEncoder)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _latest_cursor(user_id):
+    from .models import Notification
+
+    latest = Notification.objects.filter(user_id=user_id).order_by("-created_at", "-id").first()
+    return (latest.created_at, latest.id) if latest else None
+
+
+def _replay(user_id, cursor, limit):
+    """
+    Notifications of a user created after ``cursor``, oldest first.
+
+    Returns:
+        tuple: (SSE chunks, new cursor, replayed event ids); when more than
+               ``limit`` are missed a single ``resync`` event is returned instead
+    """
+    from django.db.models import Q
+
+    from .models import Notification
+    from .serializers import NotificationSerializer
+
+    queryset = Notification.objects.filter(user_id=user_id)
+    if cursor is None:
+        missed = []
+    else:
+        created_at, pk = cursor
+        missed = list(
+            queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+            .order_by("created_at", "id")[:limit + 1]
+        )
+    if cursor is not None and len(missed) <= limit:
+        ids = [event_id(n) for n in missed]
+        chunks = [
+            _sse(NOTIFICATION_EVENT, NotificationSerializer(n).data, message_id=message_id)
+            for n, message_id in zip(missed, ids)
+        ]
+        if missed:
+            cursor = (missed[-1].created_at, missed[-1].id)
+        return chunks, cursor, set(ids)
+
+    # Too far behind (or nothing to resume from): the client reloads its list
+    latest = _latest_cursor(user_id)
+    if latest is None:
+        return [_sse(RESYNC_EVENT, {})], None, set()
+    return [_sse(RESYNC_EVENT, {}, message_id=format_event_id(latest))], latest, set()
+
+
+async def event_stream(user_id, last_event_id=None):
+    """
+    Yield the SSE stream of a user.
+
+    Sends missed notifications after ``last_event_id``, the unread count, then
+    live ``notification``/``unread`` events with a comment line as heartbeat.
+    The stream ends after ``NOTIFICATION_STREAM_MAX_SECONDS`` so clients
+    reconnect (and re-authenticate) periodically.
+    """
+    from .counters import get_unread_count
+
+    heartbeat = _setting('NOTIFICATION_STREAM_HEARTBEAT_SECONDS', 15)
+    replay_limit = _setting('NOTIFICATION_STREAM_REPLAY_LIMIT', 100)
+    deadline = time.monotonic() + _setting('NOTIFICATION_STREAM_MAX_SECONDS', 600)
+    replay = sync_to_async(_replay)
+    unread_count = sync_to_async(get_unread_count)
+
+    subscription = hub.subscribe(user_id)
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        # Newest notification sent so far, and what the last replay sent
+        cursor = parse_event_id(last_event_id)
+        replayed = set()
+        if cursor is not None:
+            chunks, cursor, replayed = await replay(user_id, cursor, replay_limit)
+            for chunk in chunks:
+                yield chunk
+        else:
+            # Start of the live feed, so an overflow can be replayed
+            cursor = await sync_to_async(_latest_cursor)(user_id)
+        count = await unread_count(user_id)
+        yield _sse(UNREAD_EVENT, {"unread_count": count})
+
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                message = await asyncio.wait_for(subscription.get(), min(heartbeat, remaining))
+            except TimeoutError:
+                yield ": ping\n\n"
+                continue
+            # Coalesce whatever piled up meanwhile
+            messages = [message] + subscription.drain()
+
+            unread_changed = False
+            if subscription.overflowed:
+                subscription.overflowed = False
+                chunks, cursor, replayed = await replay(user_id, cursor, replay_limit)
+                for chunk in chunks:
+                    yield chunk
+                unread_changed = True
+                messages = []
+
+            for message in messages:
+                if message is None:
+                    continue
+                if message["event"] != NOTIFICATION_EVENT:
+                    unread_changed = True
+                    continue
+                if message["id"] in replayed:
+                    continue
+                yield _sse(NOTIFICATION_EVENT, message["data"], message_id=message["id"])
+                # Commits may arrive out of creation order: keep the newest
+                position = parse_event_id(message["id"])
+                if cursor is None or (position is not None and position > cursor):
+                    cursor = position
+
+            if unread_changed:
+                new_count = await unread_count(user_id)
+                if new_count != count:
+                    count = new_count
+                    yield _sse(UNREAD_EVENT, {"unread_count": count})
+    finally:
+        hub.unsubscribe(subscription)
@@ -0,0 +1,75 @@
+"""
+Management command that delivers email and push notifications from the outbox.
+
+Usage:
+    python manage.py dispatch_notifications
+    python manage.py dispatch_notifications --once
+    python manage.py dispatch_notifications --batch-size 500 --idle-sleep 2
+
+Runs as a long-lived worker (e.g. a separate process next to gunicorn) and
+polls for due notifications, including scheduled ones and retries. Several
+workers can run in parallel: rows are claimed with SELECT ... FOR UPDATE
+SKIP LOCKED and a lease, so no notification is claimed twice.
+"""
+
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from backend.metrics import CommandMetricsMixin
+from notifications.outbox import dispatch_once
+
+
+class Command(CommandMetricsMixin, BaseCommand):
+    help = 'Deliver pending email and push notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Notifications claimed per batch (default: 100)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Deliver everything currently due, then exit',
+        )
+        parser.add_argument(
+            '--idle-sleep',
+            type=float,
+            default=5.0,
+            help='Seconds to wait when nothing is due (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        self._stopping = False
+        if not options['once']:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+
+        totals = [0, 0, 0]
+        while not self._stopping:
+            close_old_connections()
+            claimed, sent, retried, failed = dispatch_once(batch_size)
+            for i, count in enumerate((sent, retried, failed)):
+                totals[i] += count
+            if claimed:
+                self.stdout.write(f'  ✓ Batch of {claimed}: {sent} sent, {retried} to retry, {failed} failed')
+            if claimed < batch_size:
+                if options['once']:
+                    break
+                time.sleep(options['idle_sleep'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Completed: {totals[0]} sent, {totals[1]} to retry, {totals[2]} failed'
+            )
+        )
+
+    def _stop(self, signum, frame):
+        # Finish the current batch, then exit
+        self._stopping = True
@@ -0,0 +1,115 @@
+"""
+Management command that archives and deletes old notifications.
+
+Usage:
+    python manage.py purge_notifications
+    python manage.py purge_notifications --days 90 --archive-dir /var/backups/notifications
+    python manage.py purge_notifications --batch-size 5000 --pause 0.5 --compact
+    python manage.py purge_notifications --dry-run
+
+Read notifications (and delivered or failed email/push copies) older than the
+retention age (settings.NOTIFICATION_RETENTION_DAYS) are deleted in bounded
+batches, oldest first. When an archive directory is given (or
+settings.NOTIFICATION_ARCHIVE_DIR is set) the rows are first appended to
+monthly gzip-compressed JSONL files. Table and index sizes are printed before
+and after. Should be run daily (e.g., via cron).
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from backend.metrics import CommandMetricsMixin
+from notifications.retention import compact_table, purge_notifications, retention_cutoff, table_stats
+
+
+def _size(value):
+    if value is None:
+        return 'n/a'
+    for unit in ('B', 'KB', 'MB'):
+        if value < 1024:
+            return f'{value:.0f} {unit}'
+        value /= 1024
+    return f'{value:.1f} GB'
+
+
+class Command(CommandMetricsMixin, BaseCommand):
+    help = 'Archive and delete old read notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Retention age in days (default: settings.NOTIFICATION_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Notifications deleted per batch (default: 1000)',
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=None,
+            help='Directory for the monthly JSONL.gz archives '
+                 '(default: settings.NOTIFICATION_ARCHIVE_DIR, empty to delete without archiving)',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help='Seconds to sleep between batches (default: 0)',
+        )
+        parser.add_argument(
+            '--compact',
+            action='store_true',
+            help='Reclaim freed space afterwards (VACUUM; REINDEX on PostgreSQL)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the notifications that would be deleted',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options['days'])
+        archive_dir = options['archive_dir']
+        if archive_dir is None:
+            archive_dir = getattr(settings, 'NOTIFICATION_ARCHIVE_DIR', '')
+
+        before = table_stats()
+        self._report('Before', before)
+
+        if options['dry_run']:
+            result = purge_notifications(cutoff, dry_run=True)
+            self.stdout.write(
+                self.style.SUCCESS(f'Dry run: {result["deleted"]} notifications older than {cutoff:%Y-%m-%d} would be deleted')
+            )
+            return
+
+        result = purge_notifications(
+            cutoff,
+            batch_size=options['batch_size'],
+            archive_dir=archive_dir or None,
+            pause=options['pause'],
+            on_batch=lambda count: self.stdout.write(f'  ✓ Deleted batch of {count}'),
+        )
+        for path in sorted(result['archives']):
+            self.stdout.write(f'  Archived to {path}')
+
+        if options['compact'] and result['deleted']:
+            self.stdout.write('Compacting table...')
+            compact_table(reindex=True)
+
+        self._report('After', table_stats())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Completed: {result["deleted"]} notifications older than {cutoff:%Y-%m-%d} deleted'
+            )
+        )
+
+    def _report(self, label, stats):
+        self.stdout.write(
+            f'{label}: {stats["rows"]} rows, table {_size(stats["table_bytes"])}, '
+            f'indexes {_size(stats["index_bytes"])}'
+        )
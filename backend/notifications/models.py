@@ -2,8 +2,32 @@ import uuid
 
 from django.conf import settings
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 
+from .counters import adjust_unread_counts, invalidate_unread_counts
+from .events import publish_notifications
+
+
+class NotificationQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if kwargs.get("ignore_conflicts"):
+            # Which rows were inserted is unknown: recount, and leave the live
+            # events to the caller (see notifications.services.write_digests)
+            invalidate_unread_counts({notification.user_id for notification in objs})
+            return objs
+        # bulk_create sends no post_save: bump the cached unread counters and
+        # publish the live events here
+        deltas = {}
+        for notification in objs:
+            if not notification.is_read:
+                deltas[notification.user_id] = deltas.get(notification.user_id, 0) + 1
+        publish_notifications(objs)
+        adjust_unread_counts(deltas)
+        return objs
+
 
 class Notification(models.Model):
     CHANNEL_CHOICES = (
@@ -34,18 +58,58 @@ class Notification(models.Model):
     related_object_type = models.CharField(max_length=50, null=True, blank=True)  # e.g., 'invoice', 'payment', 'maintenance'
     related_object_id = models.UUIDField(null=True, blank=True)
 
+    # Outbox for email/push: delivered once deliver_at has passed. The same
+    # column holds the scheduled time, the retry backoff and the claim lease
+    # of a dispatcher worker (see notifications.outbox)
+    deliver_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True)  # Gave up after max attempts
+
+    # Digest rows merge repeated events of one template per user and time
+    # window ("<template>:<window number>"); events are upserted into them
+    digest_key = models.CharField(max_length=100, null=True, blank=True)
+
+    objects = NotificationQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created_at"]
         indexes = [
-            models.Index(fields=["-created_at"]),
+            models.Index(fields=["-created_at", "-id"]),
+            models.Index(fields=["user", "-created_at", "-id"]),
             models.Index(fields=["user", "is_read"]),
             models.Index(fields=["is_read"]),
             models.Index(fields=["priority"]),
             models.Index(fields=["related_object_type", "related_object_id"]),
+            models.Index(
+                fields=["deliver_at"],
+                name="notification_outbox_idx",
+                condition=models.Q(sent_at__isnull=True, failed_at__isnull=True),
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "digest_key"],
+                name="notification_digest_uniq",
+                condition=models.Q(digest_key__isnull=False),
+            ),
         ]
 
     def __str__(self):
         return f"{self.channel} - {self.template}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the unread state as loaded, so saves can adjust the
+        # cached unread counter by a delta instead of dropping it
+        if all(name in instance.__dict__ for name in ("user_id", "is_read")):
+            instance._loaded_unread_entry = instance.unread_entry()
+        return instance
+
+    def unread_entry(self):
+        """(user_id, 1 if unread else 0) this notification contributes to its user's unread count"""
+        return (self.user_id, 0 if self.is_read else 1)
     
     def mark_as_read(self):
         """Mark notification as read."""
@@ -60,3 +124,32 @@ class Notification(models.Model):
             self.is_read = False
             self.read_at = None
             self.save(update_fields=["is_read", "read_at"])
+
+
+def _adjust_unread(old_entry, new_entry):
+    if old_entry == new_entry:
+        return
+    deltas = {new_entry[0]: new_entry[1]}
+    deltas[old_entry[0]] = deltas.get(old_entry[0], 0) - old_entry[1]
+    adjust_unread_counts(deltas)
+
+
+@receiver(post_save, sender=Notification)
+def update_unread_count_on_save(sender, instance, created, **kwargs):
+    """Keep the cached unread counter of the user in step and publish new notifications"""
+    new_entry = instance.unread_entry()
+    if created:
+        publish_notifications([instance])
+        _adjust_unread((instance.user_id, 0), new_entry)
+    elif hasattr(instance, "_loaded_unread_entry"):
+        _adjust_unread(instance._loaded_unread_entry, new_entry)
+    else:
+        # Previous state unknown: recount on the next read
+        invalidate_unread_counts([instance.user_id])
+    instance._loaded_unread_entry = new_entry
+
+
+@receiver(post_delete, sender=Notification)
+def update_unread_count_on_delete(sender, instance, **kwargs):
+    old_entry = getattr(instance, "_loaded_unread_entry", None) or instance.unread_entry()
+    _adjust_unread(old_entry, (instance.user_id, 0))
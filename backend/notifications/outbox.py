@@ -0,0 +1,147 @@
+"""
+Outbox dispatcher for email and push notifications.
+
+Undelivered email/push rows are the outbox. A single column, ``deliver_at``,
+drives the queue: it holds the scheduled send time, the retry backoff after a
+failure and the lease of the worker that claimed the row. One indexed query
+(``sent_at IS NULL AND failed_at IS NULL AND deliver_at <= now``) therefore
+finds everything due, scheduled or retried.
+
+Claiming runs in a short transaction with ``select_for_update(skip_locked)``
+(where the database supports it) and pushes ``deliver_at`` past the lease, so
+parallel workers never pick the same rows and a crashed worker's rows come
+back once the lease expires. Delivery happens outside the transaction, then
+successes are stamped with one UPDATE and failures rescheduled with
+exponential backoff in one ``bulk_update``. Both writes only touch rows that
+still hold the lease they were claimed with: a row whose lease ran out during
+delivery may have been claimed again, and its new owner records the outcome.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .delivery import get_backend
+from .models import Notification
+
+logger = logging.getLogger('backend')
+
+OUTBOX_CHANNELS = ("email", "push")
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def outbox_queryset(now=None):
+    """Email/push notifications that are due for delivery"""
+    return Notification.objects.filter(
+        channel__in=OUTBOX_CHANNELS,
+        sent_at__isnull=True,
+        failed_at__isnull=True,
+        deliver_at__lte=now or timezone.now(),
+    )
+
+
+def retry_delay(attempts):
+    """Exponential backoff: base, 2x base, 4x base, ... capped at one day"""
+    base = _setting('NOTIFICATION_RETRY_BASE_SECONDS', 60)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), 24 * 3600))
+
+
+def claim_batch(batch_size=100):
+    """
+    Lease up to ``batch_size`` due notifications to the current worker.
+
+    Returns:
+        list: Claimed notifications with ``user`` loaded
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=_setting('NOTIFICATION_CLAIM_SECONDS', 300))
+    with transaction.atomic():
+        queryset = outbox_queryset(now).select_related("user").order_by("deliver_at")
+        features = connection.features
+        if features.has_select_for_update:
+            queryset = queryset.select_for_update(
+                skip_locked=features.has_select_for_update_skip_locked,
+                of=("self",) if features.has_select_for_update_of else (),
+            )
+        notifications = list(queryset[:batch_size])
+        if notifications:
+            for notification in notifications:
+                notification.attempts += 1
+                notification.deliver_at = now + lease
+            Notification.objects.bulk_update(notifications, ["attempts", "deliver_at"])
+    return notifications
+
+
+def deliver(notifications):
+    """
+    Deliver claimed notifications and record the outcome.
+
+    Returns:
+        tuple: (sent, retried, failed) counts
+    """
+    # Rows by the lease they were claimed with (one per claimed batch)
+    by_lease = defaultdict(list)
+    by_channel = defaultdict(list)
+    for notification in notifications:
+        by_lease[notification.deliver_at].append(notification)
+        by_channel[notification.channel].append(notification)
+
+    errors = {}
+    for channel, items in by_channel.items():
+        try:
+            with get_backend(channel) as backend:
+                errors.update(backend.send(items))
+        except Exception as e:
+            # Connection or configuration failure: the whole channel batch is retried
+            logger.warning(f'Notification backend for {channel} failed: {e}')
+            errors.update({n.pk: str(e) or e.__class__.__name__ for n in items})
+
+    now = timezone.now()
+    max_attempts = _setting('NOTIFICATION_MAX_ATTEMPTS', 5)
+    sent = retried = failed = 0
+    for lease, items in by_lease.items():
+        leased = Notification.objects.filter(deliver_at=lease, sent_at__isnull=True, failed_at__isnull=True)
+        sent_ids = [n.pk for n in items if n.pk not in errors]
+        to_retry = []
+        to_fail = []
+        for notification in items:
+            if notification.pk not in errors:
+                continue
+            notification.last_error = errors[notification.pk][:1000]
+            if notification.attempts >= max_attempts:
+                notification.failed_at = now
+                to_fail.append(notification)
+            else:
+                notification.deliver_at = now + retry_delay(notification.attempts)
+                to_retry.append(notification)
+
+        if sent_ids:
+            sent += leased.filter(pk__in=sent_ids).update(sent_at=now, last_error="")
+        if to_retry:
+            retried += leased.bulk_update(to_retry, ["last_error", "deliver_at"])
+        if to_fail:
+            failed += leased.bulk_update(to_fail, ["last_error", "failed_at"])
+
+    lost = len(notifications) - sent - retried - failed
+    if lost:
+        logger.warning(f'{lost} notification(s) outlived their lease during delivery, outcome left to the next claim')
+    return sent, retried, failed
+
+
+def dispatch_once(batch_size=100):
+    """
+    Claim and deliver one batch.
+
+    Returns:
+        tuple: (claimed, sent, retried, failed) counts
+    """
+    notifications = claim_batch(batch_size)
+    if not notifications:
+        return 0, 0, 0, 0
+    return (len(notifications),) + deliver(notifications)
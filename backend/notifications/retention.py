@@ -0,0 +1,195 @@
+"""
+Retention for the Notification table.
+
+Expired notifications are read notifications, and delivered or failed
+email/push copies, older than the retention age
+(``NOTIFICATION_RETENTION_DAYS``). They are removed oldest first in small
+batches: each batch reads a page of rows through the ``created_at`` index,
+optionally appends them to a gzip-compressed JSONL file per month
+(``notifications-YYYY-MM.jsonl.gz``, one gzip member per batch) and deletes
+them with a single short DELETE, so the table is never locked for long and
+concurrent inserts keep flowing. Rows are archived, and the archive fsynced,
+before they are deleted; an interrupted run may archive a batch twice but
+never loses one.
+
+Table and index sizes are reported before and after, and ``compact_table``
+returns freed pages to the database (VACUUM/REINDEX).
+"""
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .counters import invalidate_unread_counts
+from .models import Notification
+from .outbox import OUTBOX_CHANNELS
+
+
+def retention_cutoff(days=None):
+    """Notifications created before this moment are expired"""
+    if days is None:
+        days = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 180)
+    return timezone.now() - timedelta(days=days)
+
+
+def expired_notifications(cutoff):
+    """Notifications that may be archived and deleted"""
+    finished_outbox = Q(channel__in=OUTBOX_CHANNELS) & (Q(sent_at__isnull=False) | Q(failed_at__isnull=False))
+    return Notification.objects.filter(Q(is_read=True) | finished_outbox, created_at__lt=cutoff)
+
+
+def table_stats():
+    """
+    Row count and on-disk size of the Notification table.
+
+    Returns:
+        dict: ``rows``, ``table_bytes`` and ``index_bytes`` (sizes are None
+              when the database cannot report them)
+    """
+    table = Notification._meta.db_table
+    stats = {"rows": Notification.objects.count(), "table_bytes": None, "index_bytes": None}
+    with connection.cursor() as cursor:
+        try:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT pg_relation_size(%s), pg_indexes_size(%s)", [table, table])
+                stats["table_bytes"], stats["index_bytes"] = cursor.fetchone()
+            elif connection.vendor == "mysql":
+                cursor.execute(
+                    "SELECT data_length, index_length FROM information_schema.tables "
+                    "WHERE table_schema = DATABASE() AND table_name = %s",
+                    [table],
+                )
+                stats["table_bytes"], stats["index_bytes"] = cursor.fetchone()
+            elif connection.vendor == "sqlite":
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s", [table])
+                indexes = [name for (name,) in cursor.fetchall()]
+                # dbstat is only available when SQLite is compiled with it
+                placeholders = ", ".join(["%s"] * (len(indexes) + 1))
+                cursor.execute(
+                    f"SELECT name, SUM(pgsize) FROM dbstat WHERE name IN ({placeholders}) GROUP BY name",
+                    [table, *indexes],
+                )
+                sizes = dict(cursor.fetchall())
+                stats["table_bytes"] = sizes.pop(table, 0)
+                stats["index_bytes"] = sum(sizes.values())
+        except DatabaseError:
+            pass
+    return stats
+
+
+def archive_path(archive_dir, month):
+    return os.path.join(archive_dir, f"notifications-{month}.jsonl.gz")
+
+
+def _fsync_directory(path):
+    """Persist the directory entry of a newly created file"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def archive_rows(rows, archive_dir):
+    """
+    Append rows to the monthly archive files.
+
+    Returns:
+        set: Paths written
+    """
+    by_month = defaultdict(list)
+    for row in rows:
+        by_month[row["created_at"].strftime("%Y-%m")].append(row)
+
+    os.makedirs(archive_dir, exist_ok=True)
+    paths = set()
+    for month, month_rows in by_month.items():
+        path = archive_path(archive_dir, month)
+        created = not os.path.exists(path)
+        with open(path, "ab") as raw:
+            # Appending adds a gzip member; gzip readers and zcat read all members
+            with gzip.open(raw, "at", encoding="utf-8") as archive:
+                for row in month_rows:
+                    archive.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n")
+            # The member is complete once closed: force it to disk before the rows are deleted
+            raw.flush()
+            os.fsync(raw.fileno())
+        if created:
+            _fsync_directory(archive_dir)
+        paths.add(path)
+    return paths
+
+
+def purge_notifications(cutoff, batch_size=1000, archive_dir=None, pause=0.0, dry_run=False, on_batch=None):
+    """
+    Archive (optionally) and delete expired notifications in batches.
+
+    Args:
+        cutoff: Delete expired notifications created before this moment
+        batch_size: Rows per SELECT/DELETE round trip
+        archive_dir: Write deleted rows to monthly JSONL.gz files here (None: delete only)
+        pause: Seconds to sleep between batches, to leave room for other writers
+        dry_run: Only count the expired notifications
+        on_batch: Optional callable receiving the size of each deleted batch
+
+    Returns:
+        dict: ``deleted`` count and ``archives`` (paths written)
+    """
+    expired = expired_notifications(cutoff)
+    if dry_run:
+        return {"deleted": expired.count(), "archives": set()}
+
+    result = {"deleted": 0, "archives": set()}
+    while True:
+        # Whole rows only when they are archived
+        fields = () if archive_dir else ("id", "user_id", "is_read")
+        rows = list(expired.order_by("created_at").values(*fields)[:batch_size])
+        ids = [row["id"] for row in rows]
+        if not ids:
+            break
+
+        if archive_dir:
+            result["archives"] |= archive_rows(rows, archive_dir)
+
+        with transaction.atomic():
+            # Plain DELETE: notifications are not audited and read rows do not
+            # change unread counts, so the per-row delete signals are skipped
+            Notification.objects.filter(pk__in=ids)._raw_delete(connection.alias)
+            # Unread email/push copies do count: let those users recount
+            invalidate_unread_counts({row["user_id"] for row in rows if not row["is_read"]})
+
+        result["deleted"] += len(ids)
+        if on_batch is not None:
+            on_batch(len(ids))
+        if len(ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return result
+
+
+def compact_table(reindex=False):
+    """
+    Return space freed by deletes to the database.
+
+    PostgreSQL: ``VACUUM (ANALYZE)`` on the table, plus ``REINDEX CONCURRENTLY``
+    to shrink bloated indexes. SQLite: ``VACUUM`` of the whole database file.
+    """
+    table = connection.ops.quote_name(Notification._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(f"VACUUM (ANALYZE) {table}")
+            if reindex:
+                cursor.execute(f"REINDEX TABLE CONCURRENTLY {table}")
+        elif connection.vendor == "mysql":
+            cursor.execute(f"OPTIMIZE TABLE {table}")
+        elif connection.vendor == "sqlite":
+            cursor.execute("VACUUM")
@@ -40,3 +40,10 @@ class NotificationSerializer(serializers.ModelSerializer):
     def get_is_sent(self, obj):
         return obj.sent_at is not None
 
+
+
+class AnnouncementSerializer(serializers.Serializer):
+    """Input for a landlord announcement to tenants"""
+    title = serializers.CharField(max_length=255)
+    message = serializers.CharField()
+    property = serializers.UUIDField(required=False)
@@ -1,5 +1,8 @@
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
+from .events import publish_notifications
 from .models import Notification
 from .constants import (
     INVOICE_CREATED,
@@ -17,9 +20,67 @@ from .constants import (
     INVITE_REJECTED,
     METER_READING_SUBMITTED,
     TENANCY_CREATED,
+    ANNOUNCEMENT,
+    DIGEST,
     TEMPLATE_PRIORITY,
 )
 
+# Related object ids kept in a digest payload (the count keeps going)
+DIGEST_MAX_IDS = 500
+
+
+def _related_info(related_object):
+    """``(type, id)`` of a related model instance or pair"""
+    if isinstance(related_object, tuple):
+        return related_object
+    if related_object:
+        return related_object._meta.label.split(".")[-1].lower(), related_object.pk  # e.g., "invoice"
+    return None, None
+
+
+def build_notification(
+    user,
+    template,
+    payload=None,
+    channel="inapp",
+    priority=None,
+    related_object=None,
+    sent_at=None,
+    deliver_at=None,
+):
+    """
+    Build an unsaved notification (see ``create_notification`` for arguments).
+    
+    ``user`` may also be a user id and ``related_object`` a ``(type, id)``
+    pair, so notifications can be built from ``values()`` rows without
+    loading any model instance.
+    
+    Use with ``Notification.objects.bulk_create`` to write many notifications
+    in one statement.
+    
+    Returns:
+        Notification: Unsaved notification instance
+    """
+    # Get priority from template if not provided
+    if priority is None:
+        priority = TEMPLATE_PRIORITY.get(template, "normal")
+    
+    # Extract related object info
+    related_object_type, related_object_id = _related_info(related_object)
+    
+    recipient = {"user": user} if hasattr(user, "pk") else {"user_id": user}
+    return Notification(
+        **recipient,
+        channel=channel,
+        template=template,
+        payload=payload or {},
+        priority=priority,
+        related_object_type=related_object_type,
+        related_object_id=related_object_id,
+        sent_at=sent_at or (timezone.now() if channel == "inapp" else None),
+        deliver_at=deliver_at or timezone.now(),
+    )
+
 
 def create_notification(
     user,
@@ -29,6 +90,7 @@ def create_notification(
     priority=None,
     related_object=None,
     sent_at=None,
+    deliver_at=None,
 ):
     """
     Create a notification.
@@ -41,213 +103,330 @@ def create_notification(
         priority: Priority level (low, normal, high, urgent). If None, uses template default
         related_object: Related model instance (e.g., Invoice, Payment)
         sent_at: When notification was sent (None for immediate)
+        deliver_at: Earliest delivery time for email/push (None for immediate)
     
     Returns:
         Notification: Created notification instance
     """
-    # Get priority from template if not provided
-    if priority is None:
-        priority = TEMPLATE_PRIORITY.get(template, "normal")
-    
-    # Extract related object info
-    related_object_type = None
-    related_object_id = None
-    if related_object:
-        related_object_type = related_object._meta.label.split(".")[-1].lower()  # e.g., "invoice"
-        related_object_id = related_object.pk
-    
-    notification = Notification.objects.create(
+    notification = build_notification(
         user=user,
-        channel=channel,
         template=template,
-        payload=payload or {},
+        payload=payload,
+        channel=channel,
         priority=priority,
-        related_object_type=related_object_type,
-        related_object_id=related_object_id,
-        sent_at=sent_at or (timezone.now() if channel == "inapp" else None),
+        related_object=related_object,
+        sent_at=sent_at,
+        deliver_at=deliver_at,
     )
+    notification.save(force_insert=True)
     
     return notification
 
 
+# Bulk fan-out
+def fan_out(entries, channel="inapp", deliver_at=None, batch_size=500):
+    """
+    Write many notifications with one ``bulk_create`` per batch.
+    
+    In-app events of digested templates (``NOTIFICATION_DIGEST_WINDOWS``) are
+    merged into digest notifications instead (see ``write_digests``).
+    
+    Args:
+        entries: Iterable of ``(recipient, template, payload, related_object)``
+            tuples. ``recipient`` is a User or user id, ``related_object`` a
+            model instance or ``(type, id)`` pair. Recipients of one event
+            share the same payload dict.
+        channel: Notification channel (inapp, email, push)
+        deliver_at: Earliest delivery time for email/push (None for immediate)
+        batch_size: Notifications per INSERT
+    
+    Returns:
+        int: Number of events written (as notifications or into digests)
+    """
+    count = 0
+    batch = []
+    digests = []
+    for recipient, template, payload, related_object in entries:
+        if channel == "inapp" and digest_window(template):
+            digests.append((recipient, template, payload, related_object))
+            if len(digests) >= batch_size:
+                write_digests(digests)
+                count += len(digests)
+                digests = []
+            continue
+        batch.append(build_notification(
+            user=recipient,
+            template=template,
+            payload=payload,
+            channel=channel,
+            related_object=related_object,
+            deliver_at=deliver_at,
+        ))
+        if len(batch) >= batch_size:
+            Notification.objects.bulk_create(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        Notification.objects.bulk_create(batch)
+        count += len(batch)
+    if digests:
+        write_digests(digests)
+        count += len(digests)
+    return count
+
+
+def _notify(entries):
+    """Write the notifications of a single event and return them (digests included)"""
+    notifications = []
+    digests = []
+    for entry in entries:
+        (digests if digest_window(entry[1]) else notifications).append(entry)
+    created = Notification.objects.bulk_create([
+        build_notification(user=recipient, template=template, payload=payload, related_object=related_object)
+        for recipient, template, payload, related_object in notifications
+    ])
+    return created + write_digests(digests)
+
+
+# Digests
+def digest_window(template):
+    """Seconds over which in-app events of ``template`` are merged per user (0: not digested)"""
+    return getattr(settings, 'NOTIFICATION_DIGEST_WINDOWS', {}).get(template, 0)
+
+
+def digest_key(template, now=None):
+    """Key of the digest collecting events of ``template`` at ``now``"""
+    window_number = int((now or timezone.now()).timestamp()) // digest_window(template)
+    return f"{template}:{window_number}"
+
+
+def write_digests(entries, now=None):
+    """
+    Merge events into the open digest notification of each recipient.
+    
+    Events of one template for one user within the same window end up in a
+    single ``DIGEST`` notification. Its payload holds the merged
+    ``template``, the event ``count``, the ``ids`` of the related objects and
+    the ``latest`` event payload. Missing digest rows are inserted (conflicts
+    ignored), then all affected rows are locked and updated in place: three
+    queries per call, however many events. An updated digest is unread again
+    and moves to the top of the list.
+    
+    Args:
+        entries: ``(recipient, template, payload, related_object)`` tuples of
+            digested templates
+        now: Event time (defaults to now)
+    
+    Returns:
+        list: Digest notifications written
+    """
+    now = now or timezone.now()
+    events = {}
+    for recipient, template, payload, related_object in entries:
+        key = (str(getattr(recipient, "pk", recipient)), digest_key(template, now))
+        related_type, related_id = _related_info(related_object)
+        event = events.setdefault(key, {"template": template, "related_type": related_type, "count": 0, "ids": []})
+        event["count"] += 1
+        event["latest"] = payload or {}
+        if related_id is not None:
+            event["ids"].append(str(related_id))
+    if not events:
+        return []
+
+    with transaction.atomic():
+        new_digests = []
+        for (user_id, key), event in events.items():
+            digest = build_notification(
+                user=user_id,
+                template=DIGEST,
+                payload={"template": event["template"], "count": 0, "ids": [], "latest": None},
+                priority=TEMPLATE_PRIORITY.get(event["template"], "normal"),
+                related_object=(event["related_type"], None),
+            )
+            digest.digest_key = key
+            new_digests.append(digest)
+        Notification.objects.bulk_create(new_digests, ignore_conflicts=True)
+
+        digests = []
+        for digest in Notification.objects.select_for_update().filter(
+            user_id__in={user_id for user_id, _ in events},
+            digest_key__in={key for _, key in events},
+        ):
+            event = events.get((str(digest.user_id), digest.digest_key))
+            if event is None:
+                continue
+            payload = digest.payload
+            payload["count"] += event["count"]
+            seen = set(payload["ids"])
+            for related_id in event["ids"]:
+                if related_id not in seen and len(payload["ids"]) < DIGEST_MAX_IDS:
+                    seen.add(related_id)
+                    payload["ids"].append(related_id)
+            payload["latest"] = event["latest"]
+            digest.is_read = False
+            digest.read_at = None
+            digest.created_at = now
+            digest.sent_at = now
+            digests.append(digest)
+        Notification.objects.bulk_update(digests, ["payload", "is_read", "read_at", "created_at", "sent_at"])
+    publish_notifications(digests)
+    return digests
+
+
+def _rows(model, objects, fields):
+    """
+    ``values()`` rows for a queryset, model instances or primary keys.
+    
+    Recipients and payload fields of the whole batch come from this single
+    query instead of walking foreign keys object by object.
+    """
+    if hasattr(objects, "values"):
+        queryset = objects.select_related(None).prefetch_related(None)
+    else:
+        queryset = model.objects.filter(pk__in=[getattr(obj, "pk", obj) for obj in objects])
+    return queryset.values(*fields)
+
+
 # Invoice notification helpers
+INVOICE_ROW_FIELDS = (
+    "id",
+    "period",
+    "total_amount",
+    "amount_due",
+    "due_date",
+    "tenancy__room__room_number",
+    "tenancy__tenant_id",
+    "tenancy__room__building__owner_id",
+)
+INVOICE_RECIPIENTS = {
+    "tenant": "tenancy__tenant_id",
+    "landlord": "tenancy__room__building__owner_id",
+}
+
+
+def invoice_notification_rows(invoices):
+    """Rows with everything invoice notifications need (queryset, instances or ids)"""
+    from billing.models import Invoice
+    return _rows(Invoice, invoices, INVOICE_ROW_FIELDS)
+
+
+def invoice_notification_entries(rows, template, recipients=("tenant",)):
+    """``fan_out`` entries for ``invoice_notification_rows`` rows"""
+    for row in rows:
+        payload = {
+            "invoice_id": str(row["id"]),
+            "period": row["period"],
+            # Overdue reminders show what is left to pay
+            "amount": str(row["amount_due"] if template == INVOICE_OVERDUE else row["total_amount"]),
+            "due_date": row["due_date"].isoformat() if row["due_date"] else None,
+            "room_number": row["tenancy__room__room_number"],
+        }
+        for recipient in recipients:
+            yield row[INVOICE_RECIPIENTS[recipient]], template, payload, ("invoice", row["id"])
+
+
+def notify_invoices(invoices, template, recipients=("tenant",), batch_size=500):
+    """
+    Notify about many invoices at once (overdue runs, bulk issuing, ...).
+    
+    Args:
+        invoices: Invoice queryset, instances or ids
+        template: Notification template (from constants)
+        recipients: Any of "tenant", "landlord"
+        batch_size: Invoices read and notifications written per round trip
+    
+    Returns:
+        int: Number of notifications written
+    """
+    rows = invoice_notification_rows(invoices).iterator(chunk_size=batch_size)
+    return fan_out(invoice_notification_entries(rows, template, recipients), batch_size=batch_size)
+
+
 def notify_invoice_created(invoice):
     """Notify tenant when invoice is created."""
-    tenant = invoice.tenancy.tenant
-    payload = {
-        "invoice_id": str(invoice.id),
-        "period": invoice.period,
-        "amount": str(invoice.total_amount),
-        "room_number": invoice.tenancy.room.room_number,
-    }
-    return create_notification(
-        user=tenant,
-        template=INVOICE_CREATED,
-        payload=payload,
-        related_object=invoice,
-    )
+    return _notify(invoice_notification_entries(invoice_notification_rows([invoice]), INVOICE_CREATED, ("tenant",)))
 
 
 def notify_invoice_issued(invoice):
     """Notify tenant when invoice is issued (status changes to pending)."""
-    tenant = invoice.tenancy.tenant
-    payload = {
-        "invoice_id": str(invoice.id),
-        "period": invoice.period,
-        "amount": str(invoice.total_amount),
-        "due_date": invoice.due_date.isoformat() if invoice.due_date else None,
-        "room_number": invoice.tenancy.room.room_number,
-    }
-    return create_notification(
-        user=tenant,
-        template=INVOICE_ISSUED,
-        payload=payload,
-        related_object=invoice,
-    )
+    return _notify(invoice_notification_entries(invoice_notification_rows([invoice]), INVOICE_ISSUED, ("tenant",)))
 
 
 def notify_invoice_overdue(invoice):
     """Notify tenant and landlord when invoice is overdue."""
-    tenant = invoice.tenancy.tenant
-    landlord = invoice.tenancy.room.building.owner
+    return _notify(invoice_notification_entries(invoice_notification_rows([invoice]), INVOICE_OVERDUE, ("tenant", "landlord")))
+
+
+# Payment notification helpers
+PAYMENT_ROW_FIELDS = (
+    "id",
+    "amount",
+    "method",
+    "invoice_id",
+    "invoice__period",
+    "invoice__tenancy__room__room_number",
+    "invoice__tenancy__tenant_id",
+    "invoice__tenancy__tenant__full_name",
+    "invoice__tenancy__tenant__email",
+    "invoice__tenancy__room__building__owner_id",
+)
+PAYMENT_RECIPIENTS = {
+    "tenant": "invoice__tenancy__tenant_id",
+    "landlord": "invoice__tenancy__room__building__owner_id",
+}
+
+
+def payment_notification_rows(payments):
+    """Rows with everything payment notifications need (queryset, instances or ids)"""
+    from payments.models import Payment
+    return _rows(Payment, payments, PAYMENT_ROW_FIELDS)
+
+
+def _payment_entries(rows, template, recipients):
+    for row in rows:
+        payload = {
+            "payment_id": str(row["id"]),
+            "invoice_id": str(row["invoice_id"]),
+            "amount": str(row["amount"]),
+            "method": row["method"],
+            "period": row["invoice__period"],
+            "tenant_name": row["invoice__tenancy__tenant__full_name"] or row["invoice__tenancy__tenant__email"],
+            "room_number": row["invoice__tenancy__room__room_number"],
+        }
+        for recipient in recipients:
+            yield row[PAYMENT_RECIPIENTS[recipient]], template, payload, ("payment", row["id"])
+
+
+def notify_payments(payments, template, recipients=("tenant", "landlord"), batch_size=500):
+    """
+    Notify about many payments at once (e.g. bank statement imports).
     
-    payload = {
-        "invoice_id": str(invoice.id),
-        "period": invoice.period,
-        "amount": str(invoice.amount_due),
-        "due_date": invoice.due_date.isoformat() if invoice.due_date else None,
-        "room_number": invoice.tenancy.room.room_number,
-    }
+    Args:
+        payments: Payment queryset, instances or ids
+        template: Notification template (from constants)
+        recipients: Any of "tenant", "landlord"
+        batch_size: Payments read and notifications written per round trip
     
-    notifications = []
-    # Notify tenant
-    notifications.append(
-        create_notification(
-            user=tenant,
-            template=INVOICE_OVERDUE,
-            payload=payload,
-            related_object=invoice,
-        )
-    )
-    # Notify landlord
-    notifications.append(
-        create_notification(
-            user=landlord,
-            template=INVOICE_OVERDUE,
-            payload=payload,
-            related_object=invoice,
-        )
-    )
-    return notifications
+    Returns:
+        int: Number of notifications written
+    """
+    rows = payment_notification_rows(payments).iterator(chunk_size=batch_size)
+    return fan_out(_payment_entries(rows, template, recipients), batch_size=batch_size)
 
 
-# Payment notification helpers
 def notify_payment_created(payment):
     """Notify tenant and landlord when payment is created."""
-    invoice = payment.invoice
-    tenant = invoice.tenancy.tenant
-    landlord = invoice.tenancy.room.building.owner
-    room = invoice.tenancy.room
-    
-    payload = {
-        "payment_id": str(payment.id),
-        "invoice_id": str(invoice.id),
-        "amount": str(payment.amount),
-        "method": payment.method,
-        "period": invoice.period,
-        "tenant_name": tenant.full_name or tenant.email,
-        "room_number": room.room_number,
-    }
-    
-    notifications = []
-    notifications.append(
-        create_notification(
-            user=tenant,
-            template=PAYMENT_CREATED,
-            payload=payload,
-            related_object=payment,
-        )
-    )
-    notifications.append(
-        create_notification(
-            user=landlord,
-            template=PAYMENT_CREATED,
-            payload=payload,
-            related_object=payment,
-        )
-    )
-    return notifications
+    return _notify(_payment_entries(payment_notification_rows([payment]), PAYMENT_CREATED, ("tenant", "landlord")))
 
 
 def notify_payment_received(payment):
     """Notify tenant and landlord when payment is completed."""
-    invoice = payment.invoice
-    tenant = invoice.tenancy.tenant
-    landlord = invoice.tenancy.room.building.owner
-    room = invoice.tenancy.room
-    
-    payload = {
-        "payment_id": str(payment.id),
-        "invoice_id": str(invoice.id),
-        "amount": str(payment.amount),
-        "method": payment.method,
-        "period": invoice.period,
-        "tenant_name": tenant.full_name or tenant.email,
-        "room_number": room.room_number,
-    }
-    
-    notifications = []
-    notifications.append(
-        create_notification(
-            user=tenant,
-            template=PAYMENT_RECEIVED,
-            payload=payload,
-            related_object=payment,
-        )
-    )
-    notifications.append(
-        create_notification(
-            user=landlord,
-            template=PAYMENT_RECEIVED,
-            payload=payload,
-            related_object=payment,
-        )
-    )
-    return notifications
+    return _notify(_payment_entries(payment_notification_rows([payment]), PAYMENT_RECEIVED, ("tenant", "landlord")))
 
 
 def notify_payment_failed(payment):
     """Notify tenant and landlord when payment fails."""
-    invoice = payment.invoice
-    tenant = invoice.tenancy.tenant
-    landlord = invoice.tenancy.room.building.owner
-    
-    payload = {
-        "payment_id": str(payment.id),
-        "invoice_id": str(invoice.id),
-        "amount": str(payment.amount),
-        "method": payment.method,
-        "period": invoice.period,
-    }
-    
-    notifications = []
-    notifications.append(
-        create_notification(
-            user=tenant,
-            template=PAYMENT_FAILED,
-            payload=payload,
-            related_object=payment,
-        )
-    )
-    notifications.append(
-        create_notification(
-            user=landlord,
-            template=PAYMENT_FAILED,
-            payload=payload,
-            related_object=payment,
-        )
-    )
-    return notifications
+    return _notify(_payment_entries(payment_notification_rows([payment]), PAYMENT_FAILED, ("tenant", "landlord")))
 
 
 # Maintenance notification helpers
@@ -273,9 +452,6 @@ def notify_maintenance_created(maintenance_request):
 
 def notify_maintenance_assigned(maintenance_request):
     """Notify tenant and assignee when maintenance is assigned."""
-    tenant = maintenance_request.requester
-    assignee = maintenance_request.assignee
-    
     payload = {
         "request_id": str(maintenance_request.id),
         "title": maintenance_request.title,
@@ -283,60 +459,32 @@ def notify_maintenance_assigned(maintenance_request):
         "room_number": maintenance_request.room.room_number,
     }
     
-    notifications = []
-    # Notify tenant
-    notifications.append(
-        create_notification(
-            user=tenant,
-            template=MAINTENANCE_ASSIGNED,
-            payload=payload,
-            related_object=maintenance_request,
-        )
+    # Notify tenant, and assignee if any
+    recipients = [maintenance_request.requester_id]
+    if maintenance_request.assignee_id:
+        recipients.append(maintenance_request.assignee_id)
+    return _notify(
+        (recipient, MAINTENANCE_ASSIGNED, payload, maintenance_request)
+        for recipient in recipients
     )
-    # Notify assignee
-    if assignee:
-        notifications.append(
-            create_notification(
-                user=assignee,
-                template=MAINTENANCE_ASSIGNED,
-                payload=payload,
-                related_object=maintenance_request,
-            )
-        )
-    return notifications
 
 
 def notify_maintenance_status_changed(maintenance_request, old_status):
     """Notify tenant and landlord when maintenance status changes."""
-    tenant = maintenance_request.requester
-    landlord = maintenance_request.room.building.owner
+    room = maintenance_request.room
     
     payload = {
         "request_id": str(maintenance_request.id),
         "title": maintenance_request.title,
         "old_status": old_status,
         "new_status": maintenance_request.status,
-        "room_number": maintenance_request.room.room_number,
+        "room_number": room.room_number,
     }
     
-    notifications = []
-    notifications.append(
-        create_notification(
-            user=tenant,
-            template=MAINTENANCE_STATUS_CHANGED,
-            payload=payload,
-            related_object=maintenance_request,
-        )
-    )
-    notifications.append(
-        create_notification(
-            user=landlord,
-            template=MAINTENANCE_STATUS_CHANGED,
-            payload=payload,
-            related_object=maintenance_request,
-        )
+    return _notify(
+        (recipient, MAINTENANCE_STATUS_CHANGED, payload, maintenance_request)
+        for recipient in (maintenance_request.requester_id, room.building.owner_id)
     )
-    return notifications
 
 
 # Invite notification helpers
@@ -349,9 +497,6 @@ def notify_invite_sent(invite):
     from django.contrib.auth import get_user_model
     User = get_user_model()
     
-    landlord = invite.property.owner
-    notifications = []
-    
     payload = {
         "invite_id": str(invite.id),
         "email": invite.email,
@@ -360,42 +505,28 @@ def notify_invite_sent(invite):
         "property_name": invite.property.name if invite.property else None,
     }
     
-    # Notify landlord (confirmation)
-    notifications.append(
-        create_notification(
-            user=landlord,
-            template=INVITE_SENT,
-            payload=payload,
-            related_object=invite,
-            priority="low",
-        )
-    )
+    # Notify landlord (confirmation, low priority)
+    entries = [(invite.property.owner_id, INVITE_SENT, payload, invite)]
     
     # Notify tenant (if they exist in system)
-    tenant = None
+    tenants = User.objects.filter(role="tenant").values_list("pk", flat=True)
+    tenant_id = None
     if invite.email:
-        tenant = User.objects.filter(email=invite.email, role="tenant").first()
+        tenant_id = tenants.filter(email=invite.email).first()
     elif invite.phone:
-        tenant = User.objects.filter(phone=invite.phone, role="tenant").first()
+        tenant_id = tenants.filter(phone=invite.phone).first()
     
-    if tenant:
+    if tenant_id:
         tenant_payload = {
             "invite_id": str(invite.id),
             "property_name": invite.property.name if invite.property else None,
             "room_number": invite.room.room_number if invite.room else None,
             "token": invite.token,  # Include token so tenant can accept invite
         }
-        notifications.append(
-            create_notification(
-                user=tenant,
-                template=INVITE_RECEIVED,  # Use separate template for tenant
-                payload=tenant_payload,
-                related_object=invite,
-                priority="normal",  # Higher priority for tenant
-            )
-        )
+        # Separate template for tenant, with higher (normal) priority
+        entries.append((tenant_id, INVITE_RECEIVED, tenant_payload, invite))
     
-    return notifications
+    return _notify(entries)
 
 
 def notify_invite_accepted(invite):
@@ -443,14 +574,13 @@ def notify_meter_reading_submitted(meter_reading):
     from tenancies.models import Tenancy
     
     try:
-        tenancy = Tenancy.objects.filter(
+        tenant_id = Tenancy.objects.filter(
             room=meter_reading.room,
             status="active"
-        ).first()
-        if not tenancy:
+        ).values_list("tenant_id", flat=True).first()
+        if not tenant_id:
             return None
         
-        tenant = tenancy.tenant
         payload = {
             "reading_id": str(meter_reading.id),
             "period": meter_reading.period,
@@ -459,45 +589,82 @@ def notify_meter_reading_submitted(meter_reading):
             "water_usage": str(meter_reading.water_usage) if meter_reading.water_usage else None,
         }
         
-        return create_notification(
-            user=tenant,
-            template=METER_READING_SUBMITTED,
-            payload=payload,
-            related_object=meter_reading,
-            priority="low",
-        )
+        # May be merged into the tenant's meter reading digest
+        notifications = _notify([(tenant_id, METER_READING_SUBMITTED, payload, meter_reading)])
+        return notifications[0] if notifications else None
     except Exception:
         return None
 
 
 # Tenancy notification helpers
+TENANCY_ROW_FIELDS = (
+    "id",
+    "room__room_number",
+    "room__building_id",
+    "start_date",
+    "base_rent",
+    "tenant_id",
+    "room__building__owner_id",
+)
+TENANCY_RECIPIENTS = {
+    "tenant": "tenant_id",
+    "landlord": "room__building__owner_id",
+}
+
+
+def tenancy_notification_rows(tenancies):
+    """Rows with everything tenancy notifications need (queryset, instances or ids)"""
+    from tenancies.models import Tenancy
+    return _rows(Tenancy, tenancies, TENANCY_ROW_FIELDS)
+
+
+def _tenancy_entries(rows, template, recipients):
+    for row in rows:
+        payload = {
+            "tenancy_id": str(row["id"]),
+            "room_number": row["room__room_number"],
+            "start_date": row["start_date"].isoformat() if row["start_date"] else None,
+            "base_rent": str(row["base_rent"]),
+        }
+        for recipient in recipients:
+            yield row[TENANCY_RECIPIENTS[recipient]], template, payload, ("tenancy", row["id"])
+
+
 def notify_tenancy_created(tenancy):
     """Notify tenant and landlord when tenancy is created."""
-    tenant = tenancy.tenant
-    landlord = tenancy.room.building.owner
+    return _notify(_tenancy_entries(tenancy_notification_rows([tenancy]), TENANCY_CREATED, ("tenant", "landlord")))
+
+
+def notify_announcement(tenancies, title, message, sender=None, batch_size=500):
+    """
+    Send one announcement to every tenant of the given tenancies.
+    
+    Each tenant is notified once, even with several tenancies; all recipients
+    share the same payload.
+    
+    Args:
+        tenancies: Tenancy queryset, instances or ids
+        title: Announcement title
+        message: Announcement body
+        sender: User sending the announcement (optional)
+        batch_size: Notifications written per INSERT
     
+    Returns:
+        int: Number of notifications written
+    """
     payload = {
-        "tenancy_id": str(tenancy.id),
-        "room_number": tenancy.room.room_number,
-        "start_date": tenancy.start_date.isoformat() if tenancy.start_date else None,
-        "base_rent": str(tenancy.base_rent),
+        "title": title,
+        "message": message,
+        "sender_id": str(sender.pk) if sender else None,
+        "sender_name": (sender.full_name or sender.email) if sender else None,
     }
     
-    notifications = []
-    notifications.append(
-        create_notification(
-            user=tenant,
-            template=TENANCY_CREATED,
-            payload=payload,
-            related_object=tenancy,
-        )
-    )
-    notifications.append(
-        create_notification(
-            user=landlord,
-            template=TENANCY_CREATED,
-            payload=payload,
-            related_object=tenancy,
-        )
-    )
-    return notifications
+    def entries():
+        seen = set()
+        for row in tenancy_notification_rows(tenancies).iterator(chunk_size=batch_size):
+            if row["tenant_id"] in seen:
+                continue
+            seen.add(row["tenant_id"])
+            yield row["tenant_id"], ANNOUNCEMENT, payload, ("property", row["room__building_id"])
+    
+    return fan_out(entries(), batch_size=batch_size)
@@ -1,9 +1,13 @@
+from django.urls import path
 from rest_framework import routers
 
-from .views import NotificationViewSet
+from .views import NotificationViewSet, notification_stream
 
 router = routers.DefaultRouter()
 router.register(r'notifications', NotificationViewSet, basename='notification')
 
-urlpatterns = router.urls
+urlpatterns = [
+    # Before the router, whose detail route would match "stream" as an id
+    path('notifications/stream/', notification_stream, name='notification-stream'),
+] + router.urls
 
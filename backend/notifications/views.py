@@ -1,10 +1,23 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, permissions, viewsets
+from rest_framework import filters, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
 
+from .counters import adjust_unread_counts, get_unread_count
+from .events import event_stream
 from .models import Notification
-from .serializers import NotificationSerializer
+from .serializers import AnnouncementSerializer, NotificationSerializer
+from .services import notify_announcement
 
 
 class NotificationViewSet(viewsets.ModelViewSet):
@@ -18,6 +31,8 @@ class NotificationViewSet(viewsets.ModelViewSet):
     
     Custom actions:
     - /my-notifications/ - Get current user's notifications
+    - /stream-ticket/ - Short-lived ticket for the SSE stream
+    - /announce/ - Landlord announcement to all active tenants
     """
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -83,13 +98,127 @@ class NotificationViewSet(viewsets.ModelViewSet):
             user=request.user,
             is_read=False
         ).update(is_read=True, read_at=timezone.now())
+        # update() sends no signals: adjust the cached counter directly
+        adjust_unread_counts({request.user.id: -count})
         return Response({"marked_read": count})
     
     @action(detail=False, methods=["get"])
     def unread_count(self, request):
-        """Get unread notification count for current user"""
-        count = self.get_queryset().filter(
-            user=request.user,
-            is_read=False
-        ).count()
-        return Response({"unread_count": count})
\ No newline at end of file
+        """
+        Get unread notification count for current user.
+
+        Served from the cached counter (see notifications.counters). The
+        response carries an ETag, so polling with If-None-Match gets a 304
+        while the count is unchanged.
+        """
+        count = get_unread_count(request.user.id)
+        etag = f'"unread-{request.user.id}-{count}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response({"unread_count": count})
+        response["ETag"] = etag
+        # The browser may keep the response but must revalidate every poll
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    @action(detail=False, methods=["post"], url_path="stream-ticket")
+    def stream_ticket(self, request):
+        """
+        Issue a ticket for ``/notifications/stream/?ticket=...``.
+
+        EventSource cannot send headers, so the stream takes its credentials
+        from the URL, where they end up in proxy and access logs. The ticket
+        only opens the stream and expires after
+        ``NOTIFICATION_STREAM_TICKET_SECONDS``; request a new one per connect.
+        """
+        ttl = _stream_ticket_seconds()
+        return Response({"ticket": issue_stream_ticket(request.user), "expires_in": ttl})
+
+    @action(detail=False, methods=["post"])
+    def announce(self, request):
+        """
+        Send an announcement to the active tenants of the landlord's properties.
+
+        Body: {title, message, property?: <property_id>}
+        """
+        from tenancies.models import Tenancy
+
+        user = request.user
+        if not user.is_superuser and user.role != "landlord":
+            return Response(
+                {"error": "Chỉ chủ trọ mới có thể gửi thông báo"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        serializer = AnnouncementSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        tenancies = Tenancy.objects.filter(status="active")
+        if not user.is_superuser:
+            tenancies = tenancies.filter(room__building__owner=user)
+        if data.get("property"):
+            tenancies = tenancies.filter(room__building_id=data["property"])
+
+        sent = notify_announcement(tenancies, data["title"], data["message"], sender=user)
+        return Response({"sent": sent}, status=status.HTTP_201_CREATED)
+
+
+STREAM_TICKET_SALT = "notifications.stream-ticket"
+
+
+def _stream_ticket_seconds():
+    return getattr(settings, 'NOTIFICATION_STREAM_TICKET_SECONDS', 30)
+
+
+def issue_stream_ticket(user):
+    """Signed, timestamped ticket that authenticates ``user`` on the stream only"""
+    return signing.dumps({"user": str(user.pk)}, salt=STREAM_TICKET_SALT, compress=True)
+
+
+def _stream_ticket_user(ticket):
+    try:
+        data = signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=_stream_ticket_seconds())
+    except signing.BadSignature:
+        return None
+    return get_user_model().objects.filter(pk=data.get("user"), is_active=True).first()
+
+
+def _stream_user(request):
+    """
+    Authenticate a stream request: Bearer header, ``?ticket=`` (EventSource
+    cannot send headers, see ``stream_ticket``) or the session.
+    """
+    ticket = request.GET.get("ticket")
+    if ticket:
+        return _stream_ticket_user(ticket)
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    if result is not None:
+        return result[0]
+    return request.user if request.user.is_authenticated else None
+
+
+async def notification_stream(request):
+    """
+    Server-sent events stream of the current user's notifications (ASGI only).
+
+    Events: ``notification`` (serialized Notification, with id), ``unread``
+    (``{unread_count}``) and ``resync`` (too many missed events: reload the
+    list). Reconnects resume after ``Last-Event-ID``.
+    """
+    if not isinstance(request, ASGIRequest):
+        # WSGI buffers an async stream until it ends: the client would get nothing
+        return JsonResponse({"detail": "Stream chỉ hoạt động khi chạy qua ASGI (uvicorn)."}, status=400)
+    user = await sync_to_async(_stream_user)(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    response = StreamingHttpResponse(event_stream(user.pk, last_event_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Keep reverse proxies from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,87 @@
+"""
+Management command to reconcile a bank statement against open invoices.
+
+Usage:
+    python manage.py reconcile_bank_statement statement.csv
+    python manage.py reconcile_bank_statement statement.ofx --owner landlord@example.com
+    python manage.py reconcile_bank_statement statement.csv --dry-run --report review.json
+
+Matches credits to invoices by the INVxxxxxxxx memo reference or by room
+number + amount, records matched transfers as completed payments in one
+transaction, and lists the remaining lines for manual review.
+"""
+
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from audit.buffer import audit_context
+from backend.metrics import CommandMetricsMixin
+from payments.services import reconcile_bank_statement
+
+
+class Command(CommandMetricsMixin, BaseCommand):
+    help = 'Match bank statement lines to open invoices and record them as payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'statement',
+            help='Path to the bank statement (CSV or OFX)',
+        )
+        parser.add_argument(
+            '--owner',
+            help='Only match invoices of properties owned by this landlord (email)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Match lines without creating payments',
+        )
+        parser.add_argument(
+            '--report',
+            help='Write the full reconciliation report to this JSON file',
+        )
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['owner']:
+            User = get_user_model()
+            try:
+                owner = User.objects.get(email=options['owner'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['owner']} does not exist")
+
+        try:
+            with open(options['statement'], 'rb') as f:
+                content = f.read()
+        except OSError as e:
+            raise CommandError(str(e))
+
+        try:
+            with audit_context():
+                result = reconcile_bank_statement(content, owner=owner, dry_run=options['dry_run'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING('DRY RUN: No payments were created.')
+            )
+
+        for entry in result['review']:
+            self.stdout.write(
+                f"  Review row {entry['row']}: {entry['amount']} \"{entry['description']}\" ({entry['reason']})"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{result['lines']} lines: {len(result['matched'])} matched, "
+                f"{len(result['review'])} to review, {len(result['duplicates'])} duplicates, "
+                f"{result['ignored']} ignored, {result['created']} payments created"
+            )
+        )
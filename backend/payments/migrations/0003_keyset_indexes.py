@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-16 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0008_keyset_indexes'),
+        ('payments', '0002_payment_payments_pa_status_7ad4af_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='payments_pa_created_3147e3_idx',
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['-created_at', '-id'], name='payments_pa_created_ceadf1_idx'),
+        ),
+    ]
@@ -5,10 +5,13 @@ from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 
+from audit.cascade import is_cascade_deleted
+from audit.tracking import ChangeTrackingMixin
 from billing.models import Invoice
+from billing.services import schedule_invoice_recompute
 
 
-class Payment(models.Model):
+class Payment(ChangeTrackingMixin, models.Model):
     METHOD_CHOICES = (
         ("cash", "Tiền mặt"),
         ("bank_transfer", "Chuyển khoản"),
@@ -38,24 +41,56 @@ class Payment(models.Model):
         indexes = [
             models.Index(fields=["status"]),
             models.Index(fields=["method"]),
-            models.Index(fields=["-created_at"]),
+            models.Index(fields=["-created_at", "-id"]),
         ]
 
     def __str__(self):
         return f"{self.invoice} - {self.amount:,.0f}đ"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this payment contributed to the invoice as loaded,
+        # so saves can post a delta instead of re-aggregating all payments
+        if all(name in instance.__dict__ for name in ("invoice_id", "status", "amount")):
+            instance._loaded_ledger_entry = instance.ledger_entry()
+        return instance
+
+    def ledger_entry(self):
+        """(invoice_id, amount, count) this payment contributes to its invoice's paid total"""
+        if self.status == "completed":
+            return (self.invoice_id, self.amount, 1)
+        return (self.invoice_id, 0, 0)
+
+
+def _schedule_recompute(old_entry, new_entry):
+    """Queue the invoice(s) whose paid total is affected by a payment change"""
+    if old_entry == new_entry:
+        return
+    invoice_ids = {new_entry[0]}
+    if old_entry is not None:
+        invoice_ids.add(old_entry[0])
+    schedule_invoice_recompute(invoice_ids)
+
 
 @receiver(post_save, sender=Payment)
-def update_invoice_on_payment_save(sender, instance, **kwargs):
-    """Update invoice status and amount_due when payment is created or updated"""
-    if instance.invoice:
-        # Refresh invoice from database to get latest data
-        instance.invoice.refresh_from_db()
-        instance.invoice.update_status_from_payments()
+def update_invoice_on_payment_save(sender, instance, created, **kwargs):
+    """Queue invoice totals, status and amount_due update when payment is created or updated"""
+    new_entry = instance.ledger_entry()
+    if created:
+        old_entry = (instance.invoice_id, 0, 0)
+    else:
+        # None when the previous state is unknown: always recompute
+        old_entry = getattr(instance, "_loaded_ledger_entry", None)
+    _schedule_recompute(old_entry, new_entry)
+    instance._loaded_ledger_entry = new_entry
 
 
 @receiver(post_delete, sender=Payment)
 def update_invoice_on_payment_delete(sender, instance, **kwargs):
-    """Update invoice status and amount_due when payment is deleted"""
-    if instance.invoice:
-        instance.invoice.update_status_from_payments()
+    """Queue invoice totals, status and amount_due update when payment is deleted"""
+    # The invoice goes in the same cascade: nothing to recompute
+    if is_cascade_deleted(Invoice, instance.invoice_id):
+        return
+    old_entry = getattr(instance, "_loaded_ledger_entry", None) or instance.ledger_entry()
+    _schedule_recompute(old_entry, (instance.invoice_id, 0, 0))
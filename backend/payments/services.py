@@ -0,0 +1,345 @@
+"""
+Bank statement reconciliation.
+
+A bank statement (CSV export or OFX) is parsed into credit lines. Each memo is
+normalized the way ``QRCodeGenerateView`` cleans the VietQR ``addInfo`` (the
+app embeds ``INV`` + the first 8 characters of the invoice id), and lines are
+matched against open invoices in a single pass using in-memory indexes built
+once per run:
+
+- reference: ``INVXXXXXXXX`` found in the memo
+- room + amount: room number found in the memo and exact amount due
+- amount: only used to suggest candidates for manual review
+
+Matched lines become completed bank transfer payments written with one
+``bulk_create`` and audited as creates; the affected invoices are queued for a single coalesced
+totals/status recompute at commit. Everything else is returned in the
+review report. Lines whose bank reference was already imported are skipped,
+so re-uploading a statement is harmless.
+"""
+import csv
+import hashlib
+import io
+import re
+import unicodedata
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from audit.utils import log_action
+from billing.models import Invoice
+from billing.services import schedule_invoice_recompute
+from notifications.constants import PAYMENT_RECEIVED
+from notifications.services import notify_payments
+
+from .models import Payment
+
+OPEN_INVOICE_STATUSES = ("pending", "partial", "overdue")
+
+INVOICE_REF_RE = re.compile(r"INV([0-9A-F]{8})")
+# "PHONG 101", "P101", "PHONG P101", "PHONG A02"
+ROOM_RE = re.compile(r"\b(?:PHONG\s?P?|P)\s?([A-Z]?\d{1,4}[A-Z]?)\b")
+
+# Normalized CSV header -> statement field
+CSV_COLUMNS = {
+    "date": {"date", "ngay", "ngaygd", "ngaygiaodich", "ngayhachtoan", "transactiondate", "postingdate"},
+    "amount": {"amount", "sotien", "sotiengd", "transactionamount"},
+    "credit": {"credit", "creditamount", "ghico", "sotienghico", "psco", "co"},
+    "description": {
+        "description", "memo", "noidung", "noidunggiaodich", "diengiai",
+        "motagiaodich", "addinfo", "narrative", "details",
+    },
+    "reference": {
+        "reference", "referenceno", "ref", "sothamchieu", "mathamchieu",
+        "magiaodich", "sogd", "transactionid", "fitid",
+    },
+}
+OFX_TRANSACTION_RE = re.compile(r"<STMTTRN>(.*?)(?=</STMTTRN>|<STMTTRN>|</BANKTRANLIST>|\Z)", re.S | re.I)
+OFX_TAG_RE = re.compile(r"<(TRNAMT|FITID|MEMO|NAME|DTPOSTED)>([^<\r\n]*)", re.I)
+
+
+def strip_accents(text):
+    """Remove Vietnamese diacritics (``đ`` has no decomposition and is mapped by hand)"""
+    text = text.replace("đ", "d").replace("Đ", "D")
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+
+def normalize_memo(text):
+    """Uppercase ASCII memo with every run of non-alphanumeric characters collapsed to one space"""
+    return " ".join(re.sub(r"[^A-Z0-9]+", " ", strip_accents(text or "").upper()).split())
+
+
+def extract_invoice_ref(memo):
+    """Return the 8-character invoice reference embedded in a normalized memo, or None"""
+    # Banks often split or pad the memo, so search with the spaces removed
+    match = INVOICE_REF_RE.search(memo.replace(" ", ""))
+    return match.group(1) if match else None
+
+
+def extract_room(memo):
+    match = ROOM_RE.search(memo)
+    return match.group(1) if match else None
+
+
+def _room_key(room_number):
+    return re.sub(r"[^A-Z0-9]", "", strip_accents(room_number).upper())
+
+
+def parse_amount(value):
+    """
+    Parse a bank amount such as ``1.500.000``, ``1,500,000.00`` or ``+1500000 VND``.
+
+    Returns:
+        Decimal or None if the value is empty or not a number
+    """
+    text = re.sub(r"[^0-9.,-]", "", value or "")
+    if not text.strip("-.,"):
+        return None
+    if "." in text and "," in text:
+        # The separator that comes last is the decimal one
+        thousands = "," if text.rfind(".") > text.rfind(",") else "."
+        text = text.replace(thousands, "").replace(",", ".")
+    else:
+        for sep in (".", ","):
+            if sep in text:
+                parts = text.split(sep)
+                # Repeated separators or a 3-digit tail are thousands (VND has no cents)
+                if len(parts) > 2 or len(parts[-1]) == 3:
+                    text = text.replace(sep, "")
+                else:
+                    text = text.replace(sep, ".")
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        return None
+
+
+def _decode(content):
+    if isinstance(content, str):
+        return content
+    for encoding in ("utf-8-sig", "cp1258"):
+        try:
+            return content.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return content.decode("latin-1")
+
+
+def _statement_line(row, date, amount, description, reference):
+    return {
+        "row": row,
+        "date": (date or "").strip(),
+        "amount": amount,
+        "description": (description or "").strip(),
+        "reference": (reference or "").strip(),
+    }
+
+
+def _find_csv_header(text):
+    """
+    Locate the header row and delimiter of a CSV statement.
+
+    Bank exports often start with a few lines of account info before the
+    header, which defeats ``csv.Sniffer``, so each delimiter is tried on the
+    first rows until one yields a row with amount and description columns.
+
+    Returns:
+        tuple: (delimiter, header row number, {field: column index})
+    """
+    for delimiter in (",", ";", "\t", "|"):
+        reader = csv.reader(io.StringIO(text), delimiter=delimiter)
+        for row_number, row in enumerate(reader, start=1):
+            if row_number > 30:
+                break
+            columns = {}
+            for index, header in enumerate(row):
+                key = re.sub(r"[^a-z0-9]", "", strip_accents(header).lower())
+                for field, aliases in CSV_COLUMNS.items():
+                    if key in aliases and field not in columns:
+                        columns[field] = index
+            if "description" in columns and ("amount" in columns or "credit" in columns):
+                return delimiter, row_number, columns
+    raise ValueError("Could not find amount and description columns in the statement")
+
+
+def _parse_csv(text):
+    delimiter, header_row, columns = _find_csv_header(text)
+    reader = csv.reader(io.StringIO(text), delimiter=delimiter)
+    for row_number, row in enumerate(reader, start=1):
+        if row_number <= header_row or not any(c.strip() for c in row):
+            continue
+
+        def cell(field):
+            index = columns.get(field)
+            return row[index] if index is not None and index < len(row) else ""
+
+        amount = parse_amount(cell("credit") if "credit" in columns else cell("amount"))
+        yield _statement_line(row_number, cell("date"), amount, cell("description"), cell("reference"))
+
+
+def _parse_ofx(text):
+    for row_number, block in enumerate(OFX_TRANSACTION_RE.findall(text), start=1):
+        tags = {name.upper(): value.strip() for name, value in OFX_TAG_RE.findall(block)}
+        try:
+            amount = Decimal(tags.get("TRNAMT", ""))
+        except InvalidOperation:
+            amount = None
+        yield _statement_line(
+            row_number,
+            tags.get("DTPOSTED", "")[:8],
+            amount,
+            tags.get("MEMO") or tags.get("NAME"),
+            tags.get("FITID"),
+        )
+
+
+def parse_statement(content):
+    """
+    Parse a bank statement into lines.
+
+    Args:
+        content: File content (bytes or str), CSV with a header row or OFX
+
+    Returns:
+        list: Dicts with ``row, date, amount, description, reference``
+              (``amount`` is None when it cannot be parsed)
+
+    Raises:
+        ValueError: If the file is not a recognizable statement
+    """
+    text = _decode(content)
+    if "<STMTTRN>" in text.upper():
+        return list(_parse_ofx(text))
+    return list(_parse_csv(text))
+
+
+def _provider_ref(line):
+    """Bank transaction id, or a stable hash of the line when the bank gives none"""
+    if line["reference"]:
+        return line["reference"][:255]
+    digest = hashlib.sha1(
+        f"{line['date']}|{line['amount']}|{line['description']}".encode("utf-8")
+    ).hexdigest()[:16]
+    return f"STMT-{digest}"
+
+
+def _report_entry(line, **extra):
+    entry = dict(line)
+    entry["amount"] = str(line["amount"]) if line["amount"] is not None else None
+    entry.update(extra)
+    return entry
+
+
+def reconcile_bank_statement(content, owner=None, dry_run=False, user=None):
+    """
+    Match bank statement credits to open invoices and record them as payments.
+
+    Args:
+        content: Statement file content (see ``parse_statement``)
+        owner: Only match invoices of this landlord's properties (optional)
+        dry_run: Build the report without writing payments
+        user: User the payment audit entries are attributed to (optional)
+
+    Returns:
+        dict: ``lines`` count, ``matched``/``review``/``duplicates`` entries,
+              ``ignored`` (debits/unparseable amounts) and ``created`` count
+
+    Raises:
+        ValueError: If the file is not a recognizable statement
+    """
+    lines = parse_statement(content)
+    result = {"lines": len(lines), "matched": [], "review": [], "duplicates": [], "ignored": 0, "created": 0}
+
+    with transaction.atomic():
+        invoices = Invoice.objects.filter(
+            status__in=OPEN_INVOICE_STATUSES,
+            amount_due__gt=0,
+        ).select_related("tenancy__room__building", "tenancy__tenant")
+        if owner is not None:
+            invoices = invoices.filter(tenancy__room__building__owner=owner)
+        if not dry_run:
+            # Serialize concurrent imports for the same invoices
+            invoices = invoices.select_for_update(of=("self",))
+
+        by_ref = defaultdict(list)
+        by_room_amount = defaultdict(list)
+        by_amount = defaultdict(list)
+        remaining = {}
+        for invoice in invoices:
+            by_ref[str(invoice.id)[:8].upper()].append(invoice)
+            by_room_amount[(_room_key(invoice.tenancy.room.room_number), invoice.amount_due)].append(invoice)
+            by_amount[invoice.amount_due].append(invoice)
+            remaining[invoice.id] = invoice.amount_due
+
+        refs = {_provider_ref(line) for line in lines}
+        seen_refs = set(
+            Payment.objects.filter(provider_ref__in=refs).values_list("provider_ref", flat=True)
+        )
+
+        payments = []
+        for line in lines:
+            amount = line["amount"]
+            if amount is None or amount <= 0:
+                result["ignored"] += 1
+                continue
+
+            provider_ref = _provider_ref(line)
+            if provider_ref in seen_refs:
+                result["duplicates"].append(_report_entry(line, provider_ref=provider_ref))
+                continue
+            seen_refs.add(provider_ref)
+
+            memo = normalize_memo(line["description"])
+            ref = extract_invoice_ref(memo)
+            room = extract_room(memo)
+            if ref:
+                candidates, match = by_ref.get(ref, []), "reference"
+            elif room:
+                candidates, match = by_room_amount.get((_room_key(room), amount), []), "room_amount"
+            else:
+                candidates, match = [], None
+
+            if len(candidates) != 1:
+                if len(candidates) > 1:
+                    reason = "ambiguous"
+                elif ref:
+                    reason = "reference_not_found"
+                else:
+                    reason = "no_match"
+                    candidates = by_amount.get(amount, [])
+                result["review"].append(_report_entry(
+                    line, reason=reason, candidates=[str(inv.id) for inv in candidates],
+                ))
+                continue
+
+            invoice = candidates[0]
+            if amount > remaining[invoice.id]:
+                result["review"].append(_report_entry(
+                    line, reason="amount_exceeds_due", candidates=[str(invoice.id)],
+                ))
+                continue
+            remaining[invoice.id] -= amount
+
+            payments.append(Payment(
+                invoice=invoice,
+                amount=amount,
+                method="bank_transfer",
+                status="completed",
+                provider_ref=provider_ref,
+                note=line["description"],
+            ))
+            result["matched"].append(_report_entry(
+                line, invoice_id=str(invoice.id), match=match, provider_ref=provider_ref,
+            ))
+
+        if payments and not dry_run:
+            # bulk_create skips the payment signals: audit here, queue one recompute for all invoices
+            Payment.objects.bulk_create(payments)
+            for payment in payments:
+                log_action(user=user, action_type="create", instance=payment, changes=payment.get_initial_changes())
+            schedule_invoice_recompute({payment.invoice_id for payment in payments})
+            notify_payments(payments, PAYMENT_RECEIVED)
+            result["created"] = len(payments)
+
+    return result
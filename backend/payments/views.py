@@ -1,17 +1,23 @@
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, permissions, viewsets
+from rest_framework import filters, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.response import Response
+from backend.mixins import ExportMixin
 
 from .models import Payment
 from .serializers import PaymentSerializer
+from .services import reconcile_bank_statement
 from notifications.services import (
     notify_payment_created,
     notify_payment_received,
     notify_payment_failed,
 )
-from audit.utils import log_action, store_old_instance
 
+INVOICE_TOTAL_FIELDS = ["total_paid", "completed_payment_count", "amount_due", "status", "paid_at"]
 
-class PaymentViewSet(viewsets.ModelViewSet):
+
+class PaymentViewSet(ExportMixin, viewsets.ModelViewSet):
     """
     Payment ViewSet with optimized queries and user-based filtering.
     
@@ -20,6 +26,9 @@ class PaymentViewSet(viewsets.ModelViewSet):
     - ?method=cash,bank_transfer,momo
     - ?invoice=<invoice_id>
     - ?invoice__tenancy__room__building=<property_id>
+
+    Export: GET /payments/export/?file_format=csv|xlsx (same filters)
+    Bank reconciliation: POST /payments/reconcile/ (multipart ``file``)
     
     Automatic filtering by user role:
     - Tenants: Only see payments for their own invoices (invoice__tenancy__tenant=user)
@@ -36,6 +45,21 @@ class PaymentViewSet(viewsets.ModelViewSet):
     }
     search_fields = ["provider_ref", "note"]
     ordering_fields = ["created_at", "amount", "status"]
+    export_filename = "thanh-toan"
+    export_fields = [
+        ("Mã thanh toán", "id"),
+        ("Mã hóa đơn", "invoice_id"),
+        ("Kỳ", "invoice__period"),
+        ("Tòa nhà", "invoice__tenancy__room__building__name"),
+        ("Phòng", "invoice__tenancy__room__room_number"),
+        ("Khách thuê", "invoice__tenancy__tenant__full_name"),
+        ("Số tiền", "amount"),
+        ("Phương thức", "method"),
+        ("Trạng thái", "status"),
+        ("Mã giao dịch", "provider_ref"),
+        ("Ghi chú", "note"),
+        ("Ngày tạo", "created_at"),
+    ]
 
     def get_queryset(self):
         """
@@ -66,21 +90,10 @@ class PaymentViewSet(viewsets.ModelViewSet):
         return queryset.none()
 
     def perform_create(self, serializer):
-        """Create payment, log audit, and send notification."""
+        """Create payment and send notification."""
         payment = serializer.save()
-        payment._audit_user = self.request.user
-        payment._audit_request = self.request
-        
-        # Log audit
-        try:
-            log_action(
-                user=self.request.user,
-                action_type="create",
-                instance=payment,
-                request=self.request,
-            )
-        except Exception:
-            pass
+        # Invoice totals are recomputed on commit; reload them for the response
+        payment.invoice.refresh_from_db(fields=INVOICE_TOTAL_FIELDS)
         
         # Notify when payment is created
         try:
@@ -90,29 +103,14 @@ class PaymentViewSet(viewsets.ModelViewSet):
             pass
 
     def perform_update(self, serializer):
-        """Update payment, log audit, and send notifications for status changes."""
-        old_instance = self.get_object()
-        old_status = old_instance.status
-        
-        # Store old instance for comparison
-        store_old_instance(old_instance)
+        """Update payment and send notifications for status changes."""
+        # The instance as loaded by get_object(), before the update is applied
+        old_status = serializer.instance.status
         
         payment = serializer.save()
-        payment._audit_user = self.request.user
-        payment._audit_request = self.request
+        payment.invoice.refresh_from_db(fields=INVOICE_TOTAL_FIELDS)
         new_status = payment.status
         
-        # Log audit
-        try:
-            log_action(
-                user=self.request.user,
-                action_type="update",
-                instance=payment,
-                request=self.request,
-            )
-        except Exception:
-            pass
-        
         # Notify when status changes
         if old_status != new_status:
             try:
@@ -124,19 +122,42 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 pass
 
     def perform_destroy(self, instance):
-        """Delete payment and log audit."""
-        instance._audit_user = self.request.user
-        instance._audit_request = self.request
-        
-        # Log audit
+        """Delete payment."""
+        instance.delete()
+
+    @action(detail=False, methods=["post"], parser_classes=[MultiPartParser, FormParser])
+    def reconcile(self, request):
+        """
+        Import a bank statement and record matched transfers as payments.
+
+        Body (multipart): file=<CSV or OFX statement>, dry_run?=true
+        Returns the reconciliation report (matched, review, duplicates).
+        """
+        user = request.user
+        if not user.is_superuser and user.role != "landlord":
+            return Response(
+                {"error": "Chỉ chủ trọ mới có thể đối soát sao kê ngân hàng"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"error": "Vui lòng tải lên file sao kê"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        dry_run = str(request.data.get("dry_run", "")).lower() in ("1", "true", "yes")
+
         try:
-            log_action(
-                user=self.request.user,
-                action_type="delete",
-                instance=instance,
-                request=self.request,
+            result = reconcile_bank_statement(
+                upload.read(),
+                owner=None if user.is_superuser else user,
+                dry_run=dry_run,
+                user=user,
             )
-        except Exception:
-            pass
-        
-        instance.delete()
+        except ValueError as e:
+            return Response(
+                {"error": "File sao kê không hợp lệ", "detail": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(result, status=status.HTTP_200_OK if dry_run or not result["created"] else status.HTTP_201_CREATED)
@@ -4,8 +4,10 @@ from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from audit.tracking import ChangeTrackingMixin
 
-class Property(models.Model):
+
+class Property(ChangeTrackingMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="properties")
     name = models.CharField(max_length=255)
@@ -31,7 +33,7 @@ class Property(models.Model):
         return self.rooms.filter(status="occupied").count()
 
 
-class Room(models.Model):
+class Room(ChangeTrackingMixin, models.Model):
     STATUS_CHOICES = (
         ("vacant", "Trống"),
         ("occupied", "Đang thuê"),
@@ -2,17 +2,22 @@ from django.db.models import Count, Q
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, permissions, viewsets
 
+from backend.mixins import CascadeDeleteMixin
+
 from .models import Property, Room
 from .serializers import PropertySerializer, PropertyListSerializer, RoomSerializer
 
 
-class PropertyViewSet(viewsets.ModelViewSet):
+class PropertyViewSet(CascadeDeleteMixin, viewsets.ModelViewSet):
     """
     Property ViewSet with optimized queries and room statistics.
     
     Supports filtering:
     - ?search=<name or address>
     - ?owner=<user_id>
+
+    DELETE removes the rooms, tenancies, invoices... under one audit record
+    (?background=true: 202, deleted in chunks in the background).
     
     Automatic filtering by user role:
     - Tenants: Cannot see properties (empty queryset)
@@ -61,7 +66,7 @@ class PropertyViewSet(viewsets.ModelViewSet):
         serializer.save(owner=self.request.user)
 
 
-class RoomViewSet(viewsets.ModelViewSet):
+class RoomViewSet(CascadeDeleteMixin, viewsets.ModelViewSet):
     """
     Room ViewSet with optimized queries and user-based filtering.
     
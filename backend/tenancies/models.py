@@ -4,11 +4,12 @@ from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from audit.tracking import ChangeTrackingMixin
 from files.models import FileAsset
 from properties.models import Room
 
 
-class Tenancy(models.Model):
+class Tenancy(ChangeTrackingMixin, models.Model):
     STATUS_CHOICES = (
         ("active", "Đang thuê"),
         ("expired", "Hết hạn"),
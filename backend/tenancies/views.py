@@ -4,7 +4,6 @@ from rest_framework import filters, permissions, viewsets
 from .models import Tenancy
 from .serializers import TenancySerializer
 from notifications.services import notify_tenancy_created
-from audit.utils import log_action, store_old_instance
 
 
 class TenancyViewSet(viewsets.ModelViewSet):
@@ -63,21 +62,8 @@ class TenancyViewSet(viewsets.ModelViewSet):
         return queryset.none()
 
     def perform_create(self, serializer):
-        """Create tenancy, log audit, and send notification."""
+        """Create tenancy and send notification."""
         tenancy = serializer.save()
-        tenancy._audit_user = self.request.user
-        tenancy._audit_request = self.request
-        
-        # Log audit
-        try:
-            log_action(
-                user=self.request.user,
-                action_type="create",
-                instance=tenancy,
-                request=self.request,
-            )
-        except Exception:
-            pass
         
         # Notify tenant and landlord when tenancy is created
         try:
@@ -86,40 +72,6 @@ class TenancyViewSet(viewsets.ModelViewSet):
             # Don't fail tenancy creation if notification fails
             pass
 
-    def perform_update(self, serializer):
-        """Update tenancy and log audit."""
-        old_instance = self.get_object()
-        store_old_instance(old_instance)
-        
-        tenancy = serializer.save()
-        tenancy._audit_user = self.request.user
-        tenancy._audit_request = self.request
-        
-        # Log audit
-        try:
-            log_action(
-                user=self.request.user,
-                action_type="update",
-                instance=tenancy,
-                request=self.request,
-            )
-        except Exception:
-            pass
-
     def perform_destroy(self, instance):
-        """Delete tenancy and log audit."""
-        instance._audit_user = self.request.user
-        instance._audit_request = self.request
-        
-        # Log audit
-        try:
-            log_action(
-                user=self.request.user,
-                action_type="delete",
-                instance=instance,
-                request=self.request,
-            )
-        except Exception:
-            pass
-        
+        """Delete tenancy."""
         instance.delete()